@@ -0,0 +1,290 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import numba
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+from render_backend import (mandelbrot_iterations, julia_iterations, colorize_mandelbrot, colorize_julia,
+                            INTERIOR_TESTS)
+from mariani_silver import mariani_silver_iterations
+from incremental_iterations import IncrementalMandelbrot
+from perturbation import PerturbationRenderer
+from julia_mosaic import julia_mosaic
+from numpy_engine import NumpyEngine, naive_iterations
+from frame_pipeline import FramePipeline
+from frame_sinks import FileSink
+
+# Frame sizes of every scene: "full" is the resolution of the script the scene comes from
+FRAME_SIZES = {"small": (960, 540), "full": (7680, 4320)}
+MOSAIC_SIZES = {"small": (540, 540), "full": (2160, 2160)}
+# The naive NumPy loop needs minutes for an 8K frame, so the NumPy scene stops at 1080p
+NUMPY_SIZES = {"small": (960, 540), "full": (1920, 1080)}
+
+# Palette shared by all scenes (the colors do not change the work)
+PALETTE = np.array([[(i * 7) % 256, (i * 13) % 256, (i * 29) % 256] for i in range(256)], dtype=np.uint8)
+
+# Deep zoom target of mandelbrot_zoom.py
+ZOOM_REAL = "-1.7891690186048231066744683411888387638173618368159070155822017397181006156270275749142369245820396054"
+ZOOM_IMAG = "-0.0000003393685157671825660282302661468127283482188945938569013974696942388736569110136147219176174266"
+ZOOM_CENTER = complex(float(ZOOM_REAL), float(ZOOM_IMAG))
+
+# Frames encoded per run of the encode scene
+ENCODE_FRAMES = 4
+
+
+# Scale of a view defined at 8K width, for another width
+def view_scale(scale_8k: float, width: int):
+    """
+    Returns the pixel scale that shows the same view at 'width' pixels.
+    """
+    return scale_8k * 7680 / width
+
+
+# Each scene prepares (untimed) and returns the timed run; a run returns the escape iterations and encoded bytes
+def zoom_frame(engine: str, width: int, height: int):
+    """
+    A mid-depth frame of mandelbrot_zoom.py (scale 1e-6 at 8K, 6000 iterations) on the float64 engines.
+    """
+    scale = view_scale(1e-6, width)
+
+    def run():
+        if engine == "subdivision":
+            counts = mariani_silver_iterations("mandelbrot", ZOOM_CENTER, scale, width, height, 6000)
+        else:
+            stats = np.zeros(len(INTERIOR_TESTS), dtype=np.int64) if engine == "interior" else None
+            counts = mandelbrot_iterations(ZOOM_CENTER, scale, width, height, 6000, interior_stats=stats)
+        colorize_mandelbrot(counts, 6000, PALETTE)
+        return {"iterations": int(counts.sum(dtype=np.int64))}
+    return run
+
+
+def deep_zoom_frame(engine: str, width: int, height: int):
+    """
+    A deep frame of mandelbrot_zoom.py (scale 1e-14 at 8K) on the perturbation engine; the reference orbit is prepared.
+    """
+    scale = view_scale(1e-14, width)
+    renderer = PerturbationRenderer(ZOOM_REAL, ZOOM_IMAG, deepest_scale=scale)
+    renderer.iterations(scale, 16, 9, 6000)
+
+    def run():
+        counts = renderer.iterations(scale, width, height, 6000)
+        colorize_mandelbrot(counts, 6000, PALETTE)
+        return {"iterations": int(counts.sum(dtype=np.int64))}
+    return run
+
+
+def interior_frame(engine: str, width: int, height: int):
+    """
+    The whole set at 5000 iterations, as in the late frames of mandelbrot_increase_iterations_0.py.
+    The incremental engine is timed for the step from 4999 to 5000 iterations.
+    """
+    scale = view_scale(0.001, width)
+    if engine == "incremental":
+        incremental = IncrementalMandelbrot()
+        incremental.iterations(0j, scale, width, height, 4999)
+
+    def run():
+        if engine == "incremental":
+            counts = incremental.iterations(0j, scale, width, height, 5000)
+        elif engine == "subdivision":
+            counts = mariani_silver_iterations("mandelbrot", 0j, scale, width, height, 5000)
+        else:
+            stats = np.zeros(len(INTERIOR_TESTS), dtype=np.int64) if engine == "interior" else None
+            counts = mandelbrot_iterations(0j, scale, width, height, 5000, interior_stats=stats)
+        colorize_mandelbrot(counts, 5000, PALETTE)
+        return {"iterations": int(counts.sum(dtype=np.int64))}
+    return run
+
+
+def mosaic_frame(engine: str, width: int, height: int):
+    """
+    The grid-99 frame of julia_sets_collection.py (10000 iterations) in one pass or as pasted tiles.
+    """
+    grid_size = 99
+    tile_size = width / grid_size
+    margin = (width - tile_size * grid_size) / 2
+    scale = 4.0 / tile_size
+    axis = np.linspace(-2, 2, grid_size)
+    c_values = [complex(real, imag) for imag in axis for real in axis]
+
+    def run():
+        if engine == "tiles":
+            image = Image.new("RGB", (width, height))
+            for index, c in enumerate(c_values):
+                counts = julia_iterations(c, scale, int(tile_size + 1), int(tile_size + 1), 10000)
+                tile = Image.fromarray(colorize_julia(counts, 10000, PALETTE))
+                image.paste(tile, (int(margin + (index % grid_size) * tile_size), int(margin + (index // grid_size) * tile_size)))
+        else:
+            julia_mosaic(c_values, grid_size, tile_size, margin, margin, scale, width, height, 10000, PALETTE,
+                         symmetric=engine == "mosaic")
+        return {"iterations": None}
+    return run
+
+
+def text_overlay_frame(engine: str, width: int, height: int):
+    """
+    A frame of julia_change_c_animation.py with its coordinate text: kernel, colors, RGBA conversion, text and RGB.
+    """
+    c = complex(0.6 * np.cos(2.2), 0.6 * np.sin(2.2))  # Frame 220 of the animation
+    scale = view_scale(0.001, width)
+    try:
+        font = ImageFont.truetype("arial.ttf", 125 * width // 7680)
+    except IOError:
+        font = ImageFont.load_default()
+
+    def run():
+        counts = julia_iterations(c, scale, width, height, 6000)
+        image = Image.fromarray(colorize_julia(counts, 6000, PALETTE)).convert("RGBA")
+        draw = ImageDraw.Draw(image)
+        text = f"c = {c.real:.5f} + {c.imag:.5f}i"
+        text_bbox = draw.textbbox((0, 0), text, font=font)
+        draw.text((width - (text_bbox[2] - text_bbox[0]) - 20, 20), text, fill=(0, 255, 0), font=font)
+        image.convert("RGB")
+        return {"iterations": int(counts.sum(dtype=np.int64))}
+    return run
+
+
+def numpy_frame(engine: str, width: int, height: int):
+    """
+    A detailed frame of mandelbrot_increase_iterations_1.py (300 iterations) on the Numba-free engines:
+    the naive vectorized loop over the whole frame or NumpyEngine with active-set compaction (escape counts only).
+    """
+    scale = view_scale(0.000035, width)
+    engine_instance = NumpyEngine()
+
+    def run():
+        if engine == "naive":
+            counts = naive_iterations("mandelbrot", complex(-1.19, -0.25), scale, width, height, 300)
+        else:
+            counts = engine_instance.mandelbrot_iterations(complex(-1.19, -0.25), scale, width, height, 300)
+        return {"iterations": int(counts.sum(dtype=np.int64))}
+    return run
+
+
+def encode_frames(engine: str, width: int, height: int):
+    """
+    ENCODE_FRAMES detailed frames (mandelbrot_increase_iterations_1.py) through the PNG pipeline or into a raw Y4M file.
+    """
+    scale = view_scale(0.000035, width)
+    frame = colorize_mandelbrot(mandelbrot_iterations(complex(-1.19, -0.25), scale, width, height, 300), 300, PALETTE)
+    folder = tempfile.mkdtemp()
+
+    def run():
+        if engine == "png":
+            pipeline = FramePipeline(encoders=4, queue_size=4)
+            for index in range(ENCODE_FRAMES):
+                pipeline.submit(os.path.join(folder, f"{index:05d}.png"), frame)
+            pipeline.close()
+            output_bytes = pipeline.bytes_written
+        else:
+            sink = FileSink(os.path.join(folder, "frames.y4m"), width, height, framerate=60)
+            for index in range(ENCODE_FRAMES):
+                sink.submit(None, frame)
+            sink.close()
+            output_bytes = os.path.getsize(os.path.join(folder, "frames.y4m"))
+        for name in os.listdir(folder):
+            os.remove(os.path.join(folder, name))
+        os.rmdir(folder)
+        return {"iterations": None, "encoded_bytes": frame.nbytes * ENCODE_FRAMES, "output_bytes": output_bytes}
+    return run
+
+
+# Scene name -> (prepare function, engines, sizes)
+SCENES = {
+    "zoom": (zoom_frame, ("kernel", "interior", "subdivision"), FRAME_SIZES),
+    "deep_zoom": (deep_zoom_frame, ("perturbation",), FRAME_SIZES),
+    "interior": (interior_frame, ("kernel", "interior", "subdivision", "incremental"), FRAME_SIZES),
+    "mosaic_99": (mosaic_frame, ("mosaic", "mosaic_direct", "tiles"), MOSAIC_SIZES),
+    "text_overlay": (text_overlay_frame, ("kernel",), FRAME_SIZES),
+    "numpy": (numpy_frame, ("naive", "compacted"), NUMPY_SIZES),
+    "encode": (encode_frames, ("png", "y4m"), FRAME_SIZES),
+}
+
+
+def peak_rss_bytes():
+    """
+    Peak resident set size of this process, or None where the resource module is missing (Windows).
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+# One measurement, run in its own process so the peak RSS belongs to it alone
+def measure(scene: str, engine: str, size: str):
+    """
+    Warms up the JIT-compiled kernels on a tiny frame, then times one run of the scene at the given size.
+    """
+    prepare, _, sizes = SCENES[scene]
+    prepare(engine, 64, 64 * sizes[size][1] // sizes[size][0])()
+    width, height = sizes[size]
+    run = prepare(engine, width, height)
+    start = time.perf_counter()
+    result = run()
+    seconds = time.perf_counter() - start
+    frames = ENCODE_FRAMES if scene == "encode" else 1
+    record = {"scene": scene, "engine": engine, "size": size, "width": width, "height": height, "seconds": round(seconds, 4),
+              "mpixels_per_second": round(width * height * frames / seconds / 1e6, 2),
+              "iterations_per_second": round(result["iterations"] / seconds) if result["iterations"] is not None else None,
+              "encode_mb_per_second": round(result["encoded_bytes"] / seconds / 1e6, 1) if "encoded_bytes" in result else None,
+              "output_bytes": result.get("output_bytes"), "peak_rss_bytes": peak_rss_bytes()}
+    return record
+
+
+def environment():
+    """
+    Versions and machine details stored with the results, so runs on different versions can be compared.
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"commit": commit, "python": platform.python_version(), "numpy": np.__version__, "numba": numba.__version__,
+            "platform": platform.platform(), "processor": platform.processor(), "cpu_count": os.cpu_count(),
+            "threads": numba.config.NUMBA_NUM_THREADS, "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU benchmark of the render engines on scenes from the animation scripts")
+    parser.add_argument("--scenes", nargs="+", default=list(SCENES), choices=list(SCENES))
+    parser.add_argument("--sizes", nargs="+", default=["small", "full"], choices=["small", "full"])
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON file for the results")
+    parser.add_argument("--measure", nargs=3, metavar=("SCENE", "ENGINE", "SIZE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.measure:
+        print(json.dumps(measure(*args.measure)))
+        return
+    # The benchmark always runs on the CPU
+    child_environment = dict(os.environ, FRACTAL_BACKEND="cpu")
+    results = []
+    for scene in args.scenes:
+        for engine in SCENES[scene][1]:
+            for size in args.sizes:
+                process = subprocess.run([sys.executable, os.path.abspath(__file__), "--measure", scene, engine, size],
+                                         capture_output=True, text=True, env=child_environment)
+                if process.returncode != 0:
+                    print(f"{scene}/{engine}/{size} failed:\n{process.stderr}")
+                    continue
+                record = json.loads(process.stdout.strip().splitlines()[-1])
+                results.append(record)
+                rss = f"{record['peak_rss_bytes'] / 1024**2:.0f} MB" if record["peak_rss_bytes"] else "n/a"
+                iterations = f", {record['iterations_per_second'] / 1e9:.2f} G iterations/s" if record["iterations_per_second"] else ""
+                encode = f", {record['encode_mb_per_second']} MB/s encoded" if record["encode_mb_per_second"] else ""
+                print(f"{scene}/{engine}/{size}: {record['seconds']:.2f} s, {record['mpixels_per_second']} Mpixel/s"
+                      f"{iterations}{encode}, peak RSS {rss}")
+    with open(args.output, "w") as file:
+        json.dump({"environment": environment(), "results": results}, file, indent=1)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+import threading
+import numpy as np
+from numba import cuda
+from render_backend import INTERIOR_TESTS, select_backend, mandelbrot_iterations, colorize_mandelbrot, downsample
+
+
+class FrameBufferPool:
+    """
+    Reuses frame buffers across frames, so the render loop stops allocating once the first frames are out.
+    Frames handed out by acquire() travel through the output stage and come back with release(), which
+    FramePipeline and the stream sinks call once a frame is encoded. Scratch buffers (escape counts) and
+    device buffers are owned by the pool and reused by name. On the CUDA backend host frames are pinned,
+    palettes are uploaded once and every frame costs one explicit device-to-host copy.
+    """
+
+    def __init__(self, backend: str = "cpu"):
+        self.backend = backend
+        self.free = {}
+        self.scratch_buffers = {}
+        self.device_buffers = {}
+        self.device_palettes = {}
+        self.lock = threading.Lock()
+        self.host_allocations = 0
+        self.device_allocations = 0
+        self.transfers = 0
+
+    # Frames for the output stage
+    def acquire(self, shape, dtype=np.uint8):
+        """
+        Returns a free host buffer of the given shape, allocating one only when none has been released.
+        """
+        key = (tuple(shape), np.dtype(dtype))
+        with self.lock:
+            buffers = self.free.get(key)
+            if buffers:
+                return buffers.pop()
+            self.host_allocations += 1
+        if self.backend == "cuda":
+            return cuda.pinned_array(shape, dtype=dtype)
+        return np.empty(shape, dtype=dtype)
+
+    def release(self, buffer):
+        """
+        Returns a buffer from acquire() to the pool. Safe to call from the output threads.
+        """
+        with self.lock:
+            self.free.setdefault((buffer.shape, buffer.dtype), []).append(buffer)
+
+    # Buffers that never leave the compute stage
+    def scratch(self, name: str, shape, dtype=np.int32):
+        """
+        Returns the host buffer kept under 'name', reallocating it only when the shape or dtype changes.
+        """
+        buffer = self.scratch_buffers.get(name)
+        if buffer is None or buffer.shape != tuple(shape) or buffer.dtype != dtype:
+            buffer = np.empty(shape, dtype=dtype)
+            self.scratch_buffers[name] = buffer
+            self.host_allocations += 1
+        return buffer
+
+    def device(self, name: str, shape, dtype=np.uint8):
+        """
+        Returns the device buffer kept under 'name', reallocating it only when the shape or dtype changes.
+        """
+        buffer = self.device_buffers.get(name)
+        if buffer is None or buffer.shape != tuple(shape) or buffer.dtype != dtype:
+            buffer = cuda.device_array(shape, dtype=dtype)
+            self.device_buffers[name] = buffer
+            self.device_allocations += 1
+        return buffer
+
+    def device_rows(self, name: str, shape, dtype=np.int32):
+        """
+        Returns a device array of the given shape that is the leading rows of the buffer kept under 'name'. The buffer
+        only grows (to twice the rows asked for) when it is too small, so data whose length changes from frame to
+        frame, such as the refined pixels of adaptive anti-aliasing, stops allocating after the first frames.
+        """
+        shape = tuple(shape)
+        buffer = self.device_buffers.get(name)
+        if buffer is None or buffer.shape[1:] != shape[1:] or buffer.dtype != dtype or buffer.shape[0] < shape[0]:
+            buffer = cuda.device_array((max(2 * shape[0], 1),) + shape[1:], dtype=dtype)
+            self.device_buffers[name] = buffer
+            self.device_allocations += 1
+        return buffer[:shape[0]]
+
+    def upload(self, device_buffer, host_buffer):
+        """
+        Copies a contiguous host array into a device buffer of the same shape and returns the device buffer.
+        """
+        device_buffer.copy_to_device(host_buffer)
+        self.transfers += 1
+        return device_buffer
+
+    def copy_to_host(self, device_buffer, host_buffer):
+        """
+        Copies a device buffer into a contiguous host array of the same shape (e.g. a slice of a scratch buffer)
+        and returns the host array.
+        """
+        device_buffer.copy_to_host(host_buffer)
+        self.transfers += 1
+        return host_buffer
+
+    def palette(self, palette):
+        """
+        Returns the device copy of a palette array, uploading it the first time it is used.
+        """
+        entry = self.device_palettes.get(id(palette))
+        if entry is None:
+            # The host array is kept with its copy so its id cannot be reused by another palette
+            entry = (palette, cuda.to_device(palette))
+            self.device_palettes[id(palette)] = entry
+            self.device_allocations += 1
+            self.transfers += 1
+        return entry[1]
+
+    def download(self, device_buffer):
+        """
+        Copies a device frame into an acquired host buffer and returns it.
+        """
+        host_buffer = self.acquire(device_buffer.shape, device_buffer.dtype)
+        device_buffer.copy_to_host(host_buffer)
+        self.transfers += 1
+        return host_buffer
+
+    def downsample(self, samples, factor: int):
+        """
+        Averages acquired samples into an acquired frame (see render_backend.downsample) and releases the samples.
+        """
+        if factor == 1:
+            return samples
+        image = downsample(samples, factor, out=self.acquire((samples.shape[0] // factor, samples.shape[1] // factor, 3)))
+        self.release(samples)
+        return image
+
+    def summary(self):
+        """
+        Returns a line with the allocation and transfer counters.
+        """
+        return f"{self.host_allocations} host / {self.device_allocations} device buffers allocated, {self.transfers} transfers"
+
+
+# Check of the steady state: no buffer is allocated after the first frame
+def check_steady_state(frames: int = 8, width: int = 480, height: int = 270, supersampling: int = 2, backend: str = "cpu",
+                       interior_checks: bool = False):
+    """
+    Renders 'frames' frames of a Mandelbrot zoom through a pool the way the zoom scripts do (escape counts in a scratch
+    buffer, colors in an acquired frame, downsampled, released once "encoded") and returns the number of buffers
+    allocated after every frame. On the CUDA backend every device allocation of the driver is counted, including the
+    ones Numba makes on its own for host arrays passed to a kernel. Raises AssertionError when a frame after the first
+    allocated a buffer.
+    """
+    pool = FrameBufferPool(backend)
+    palette = (np.arange(256 * 3) % 256).astype(np.uint8).reshape(256, 3)
+    interior_stats = np.zeros(len(INTERIOR_TESTS), dtype=np.int64) if interior_checks else None
+    sample_width, sample_height = width * supersampling, height * supersampling
+    device_allocations = [0]
+    if backend == "cuda":
+        from numba.cuda.cudadrv import driver
+        context_class = driver.Context
+        memalloc = context_class.memalloc
+
+        def counting_memalloc(context, bytesize):
+            device_allocations[0] += 1
+            return memalloc(context, bytesize)
+
+        context_class.memalloc = counting_memalloc
+    allocations = []
+    try:
+        for frame in range(frames):
+            scale = 3.0 / sample_width / 1.1**frame
+            counts = mandelbrot_iterations(complex(-0.75, 0.1), scale, sample_width, sample_height, 256,
+                                           counts=pool.scratch("counts", (sample_height, sample_width)), backend=backend,
+                                           interior_stats=interior_stats, buffers=pool)
+            image = colorize_mandelbrot(counts, 256, palette, out=pool.acquire((sample_height, sample_width, 3)))
+            image = pool.downsample(image, supersampling)
+            # The output stage hands the frame back once it is encoded
+            pool.release(image)
+            allocations.append(pool.host_allocations + device_allocations[0])
+    finally:
+        if backend == "cuda":
+            context_class.memalloc = memalloc
+    if any(count != allocations[0] for count in allocations):
+        raise AssertionError(f"Buffers allocated after the first frame: {allocations}")
+    return allocations
+
+
+if __name__ == "__main__":
+    backend = select_backend("auto")
+    for interior_checks in (False, True):
+        allocations = check_steady_state(backend=backend, interior_checks=interior_checks)
+        print(f"{len(allocations)} frames{' with interior checks' if interior_checks else ''}: {allocations[0]} buffers "
+              f"allocated for the first frame and none after it ({backend})")
@@ -0,0 +1,167 @@
+import math
+import numpy as np
+from numba import njit, prange
+
+
+# CPU kernel rendering rows of the log-polar strip into a ring buffer
+@njit(parallel=True, cache=True)
+def strip_kernel(center_real, center_imag, outer_radius, row_step, first_row, num_rows, max_iterations, strip):
+    """
+    Row k of the strip samples the circle of radius outer_radius * exp(-k * row_step) around the center
+    at strip.shape[1] equally spaced angles. Rows are stored at k % strip.shape[0].
+    """
+    capacity, columns = strip.shape
+    for k in prange(num_rows):
+        row = first_row + k
+        radius = outer_radius * math.exp(-row * row_step)
+        for j in range(columns):
+            angle = 2.0 * math.pi * j / columns
+            c_real = center_real + radius * math.cos(angle)
+            c_imag = center_imag + radius * math.sin(angle)
+            z_real = 0.0
+            z_imag = 0.0
+            iteration = 0
+            while z_real * z_real + z_imag * z_imag <= 4.0 and iteration < max_iterations:
+                z_real_new = z_real * z_real - z_imag * z_imag + c_real
+                z_imag = 2.0 * z_real * z_imag + c_imag
+                z_real = z_real_new
+                iteration += 1
+            strip[row % capacity, j] = iteration
+
+
+# CPU kernel resampling the strip into a frame
+@njit(parallel=True, cache=True)
+def resample_kernel(strip, outer_radius, row_step, scale, width, height, disc_pixels, clamp_disc, counts):
+    """
+    Looks up the nearest strip sample for every pixel of a frame at the given scale.
+    Pixels closer than disc_pixels to the center are marked with -1, or with clamp_disc
+    take the sample at the same angle on the innermost ring.
+    """
+    capacity, columns = strip.shape
+    log_outer = math.log(outer_radius)
+    for y in prange(height):
+        dy = height / 2 - y
+        for x in range(width):
+            dx = x - width / 2
+            distance = math.sqrt(dx * dx + dy * dy)
+            if distance < disc_pixels:
+                if not clamp_disc:
+                    counts[y, x] = -1
+                    continue
+                distance = disc_pixels
+            row = int(round((log_outer - math.log(scale * distance)) / row_step))
+            angle = math.atan2(dy, dx)
+            if angle < 0.0:
+                angle += 2.0 * math.pi
+            column = int(round(angle / (2.0 * math.pi) * columns)) % columns
+            counts[y, x] = strip[row % capacity, column]
+
+
+# CPU kernel rendering the central disc of a frame directly
+@njit(parallel=True, cache=True)
+def disc_kernel(center_real, center_imag, scale, width, height, max_iterations, counts):
+    """
+    Computes the escape count of every pixel marked with -1, with the arithmetic of mandelbrot_kernel.
+    """
+    for y in prange(height):
+        for x in range(width):
+            if counts[y, x] != -1:
+                continue
+            c_real = center_real + scale * (x - width / 2)
+            c_imag = center_imag + scale * (height / 2 - y)
+            z_real = 0.0
+            z_imag = 0.0
+            iteration = 0
+            while z_real * z_real + z_imag * z_imag <= 4.0 and iteration < max_iterations:
+                z_real_new = z_real * z_real - z_imag * z_imag + c_real
+                z_imag = 2.0 * z_real * z_imag + c_imag
+                z_real = z_real_new
+                iteration += 1
+            counts[y, x] = iteration
+
+
+class ExponentialMapZoom:
+    """
+    Renders a constant-center zoom once as a log-polar strip and resamples every frame from it.
+    Iteration work scales with the zoom depth (number of strip rows) instead of the number of frames.
+    Only the rows one frame needs are kept, in a ring buffer, so zooming in and out both work.
+    The disc of disc_pixels around the center, where one frame would need ever deeper rows,
+    is either rendered directly (render_center=True) or filled from the innermost ring the frame uses.
+    """
+
+    def __init__(self, center: complex, min_scale: float, max_scale: float, width: int, height: int,
+                 max_iterations: int, disc_pixels: float = 64, density: float = 1.0, render_center: bool = True):
+        self.center = center
+        self.width = width
+        self.height = height
+        self.max_iterations = max_iterations
+        self.disc_pixels = disc_pixels
+        self.render_center = render_center
+
+        # One strip column per pixel of arc length on the frame corners, the same spacing along the radius
+        half_diagonal = math.hypot(width, height) / 2 + 1
+        self.columns = int(math.ceil(2 * math.pi * half_diagonal * density))
+        self.row_step = 2 * math.pi / self.columns
+        self.outer_radius = max_scale * half_diagonal
+        self.total_rows = self.row_for(min_scale * disc_pixels) + 2
+        self.capacity = self.row_for(max_scale * disc_pixels) + 8
+        dtype = np.uint16 if max_iterations <= np.iinfo(np.uint16).max else np.int32
+        self.strip = np.zeros((self.capacity, self.columns), dtype=dtype)
+        self.first_valid = 0
+        self.end_valid = 0
+        self.strip_samples = 0
+        self.frame_pixels = 0
+
+    def row_for(self, radius: float):
+        """
+        Returns the (rounded up) strip row that samples the given radius.
+        """
+        return int(math.ceil((math.log(self.outer_radius) - math.log(radius)) / self.row_step))
+
+    def render_rows(self, first_row: int, end_row: int):
+        """
+        Renders strip rows [first_row, end_row) into the ring buffer.
+        """
+        if end_row > first_row:
+            strip_kernel(self.center.real, self.center.imag, self.outer_radius, self.row_step,
+                         first_row, end_row - first_row, self.max_iterations, self.strip)
+            self.strip_samples += (end_row - first_row) * self.columns
+
+    # Make sure the ring buffer holds the given rows, rendering only the missing ones
+    def ensure_rows(self, first_row: int, end_row: int):
+        """
+        Extends the valid row range towards [first_row, end_row) and drops rows that fall out of the buffer.
+        """
+        if first_row >= self.first_valid and end_row <= self.end_valid:
+            return
+        if end_row <= self.first_valid or first_row >= self.end_valid:
+            self.render_rows(first_row, end_row)
+            self.first_valid, self.end_valid = first_row, end_row
+            return
+        if end_row > self.end_valid:
+            self.render_rows(self.end_valid, end_row)
+            self.end_valid = end_row
+            self.first_valid = max(self.first_valid, end_row - self.capacity)
+        if first_row < self.first_valid:
+            self.render_rows(first_row, self.first_valid)
+            self.first_valid = first_row
+            self.end_valid = min(self.end_valid, first_row + self.capacity)
+
+    # Escape counts for one frame of the zoom
+    def iterations(self, scale: float):
+        """
+        Returns the int32 (height, width) escape counts of the frame at the given scale.
+        """
+        first_row = max(self.row_for(scale * math.hypot(self.width, self.height) / 2) - 2, 0)
+        end_row = self.row_for(scale * self.disc_pixels) + 2
+        if end_row > self.total_rows:
+            raise ValueError(f"Scale {scale} is outside the range of this exponential map")
+        self.ensure_rows(first_row, end_row)
+
+        counts = np.empty((self.height, self.width), dtype=np.int32)
+        resample_kernel(self.strip, self.outer_radius, self.row_step, scale,
+                        self.width, self.height, self.disc_pixels, not self.render_center, counts)
+        if self.render_center:
+            disc_kernel(self.center.real, self.center.imag, scale, self.width, self.height, self.max_iterations, counts)
+        self.frame_pixels += self.width * self.height
+        return counts
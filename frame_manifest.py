@@ -0,0 +1,230 @@
+import hashlib
+import json
+import os
+import socket
+import time
+from contextlib import contextmanager
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Name of the manifest (and its lock file) inside an output folder
+MANIFEST_NAME = "manifest.json"
+
+# Seconds between checks while the remaining frames are leased by other workers
+POLL_SECONDS = 2.0
+
+
+# Exclusive lock on a file, held by the OS for this process only (released automatically if the process dies)
+@contextmanager
+def file_lock(path: str):
+    """
+    Blocks until the lock on 'path' is acquired, then holds it for the duration of the with-block.
+    """
+    with open(path, "a+b") as file:
+        if fcntl is not None:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+        else:
+            file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    pass  # LK_LOCK gives up after about 10 seconds; keep waiting
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+            else:
+                file.seek(0)
+                msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+# JSON-friendly form of a scene or frame parameter
+def json_value(value):
+    """
+    Arrays (e.g. the palette) become a SHA-1 of their bytes, complex numbers a [real, imag] pair, NumPy scalars plain numbers.
+    """
+    if isinstance(value, np.ndarray):
+        return hashlib.sha1(np.ascontiguousarray(value).tobytes()).hexdigest()
+    if isinstance(value, (complex, np.complexfloating)):
+        return [float(value.real), float(value.imag)]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+class FrameManifest:
+    """
+    Crash-safe record of the finished frames of one output folder, stored as manifest.json next to the frames.
+    Each entry holds the frame's parameters, file size and SHA-1, and the manifest is rewritten atomically
+    (temporary file, then rename) under a file lock after every frame. On restart, frames whose file still matches
+    are skipped; missing, truncated or unrecorded files are rendered again, and a changed scene starts over.
+    Several worker processes can run the same script at once: each leases ranges of frames, and a lease that
+    has not recorded progress for lease_seconds expires so another worker can take over the frames of a dead one.
+    With a schedule (see frame_scheduler.py) frames are leased one at a time in the scheduled order instead.
+    """
+
+    def __init__(self, folder: str, scene: dict, resume: bool = True, lease_size: int = 8, lease_seconds: float = 900,
+                 verify_hashes: bool = False):
+        self.folder = folder
+        self.path = os.path.join(folder, MANIFEST_NAME)
+        self.scene = {key: json_value(value) for key, value in scene.items()}
+        self.resume = resume
+        self.lease_size = lease_size
+        self.lease_seconds = lease_seconds
+        self.worker = f"{socket.gethostname()}:{os.getpid()}"
+        self.pending = {}
+        if resume:
+            os.makedirs(folder, exist_ok=True)
+            self.check_frames(verify_hashes)
+
+    @contextmanager
+    def update(self):
+        """
+        Locks the manifest and yields its contents; changes to the dict are written back atomically.
+        """
+        with file_lock(self.path + ".lock"):
+            try:
+                with open(self.path, "r") as file:
+                    manifest = json.load(file)
+            except (FileNotFoundError, json.JSONDecodeError):
+                manifest = {}
+            if manifest.get("scene") != self.scene:
+                manifest = {"scene": self.scene, "frames": {}, "leases": [], "order": []}
+            yield manifest
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "w") as file:
+                json.dump(manifest, file, indent=1)
+            os.replace(temp_path, self.path)
+
+    # Startup check of the recorded frames
+    def check_frames(self, verify_hashes: bool):
+        """
+        Drops entries whose file is missing or differs in size (or SHA-1 with verify_hashes) and deletes
+        temporary files that no live worker can still be writing.
+        """
+        with self.update() as manifest:
+            for index, entry in list(manifest["frames"].items()):
+                filename = os.path.join(self.folder, entry["file"])
+                try:
+                    intact = os.path.getsize(filename) == entry["bytes"]
+                    if intact and verify_hashes:
+                        with open(filename, "rb") as file:
+                            intact = hashlib.sha1(file.read()).hexdigest() == entry["sha1"]
+                except FileNotFoundError:
+                    intact = False
+                if not intact:
+                    print(f"Frame {entry['file']} is missing or incomplete and will be rendered again")
+                    del manifest["frames"][index]
+            for name in os.listdir(self.folder):
+                filename = os.path.join(self.folder, name)
+                if name.endswith(".tmp") and name != MANIFEST_NAME + ".tmp":
+                    if time.time() - os.path.getmtime(filename) > self.lease_seconds:
+                        os.remove(filename)
+
+    # Lease the next range of frames that are neither finished nor leased by a live worker
+    def lease(self, start: int, stop: int):
+        """
+        Returns (frames, wait): the leased frame indices, or None and the seconds until another worker's lease
+        expires (None when every frame is finished or leased by this worker).
+        """
+        now = time.time()
+        with self.update() as manifest:
+            leases = [lease for lease in manifest["leases"] if lease["expires"] > now]
+            manifest["leases"] = leases
+            leased = {}
+            for lease in leases:
+                for index in lease["frames"]:
+                    leased[index] = lease
+            # Scheduled frames first, one per lease, then the rest in index order
+            order = [index for index in manifest.get("order", []) if start <= index < stop]
+            lease_size = 1 if order else self.lease_size
+            scheduled = set(order)
+            frames = []
+            for index in order + [index for index in range(start, stop) if index not in scheduled]:
+                if str(index) in manifest["frames"]:
+                    if frames:
+                        break
+                    continue
+                if index in leased:
+                    if frames:
+                        break
+                    continue
+                frames.append(index)
+                if len(frames) == lease_size:
+                    break
+            if frames:
+                leases.append({"frames": frames, "worker": self.worker, "expires": now + self.lease_seconds})
+                return frames, None
+            waiting = [lease["expires"] - now for index, lease in leased.items()
+                       if lease["worker"] != self.worker and str(index) not in manifest["frames"] and start <= index < stop]
+            return None, (min(waiting) if waiting else None)
+
+    def leased_frames(self, start: int, stop: int):
+        """
+        Yields the indices in [start, stop) this worker should render, lease by lease, skipping finished frames.
+        Once only frames leased by other workers are left, it waits until they are finished or their leases expire.
+        """
+        if not self.resume:
+            yield from range(start, stop)
+            return
+        while True:
+            frames, wait = self.lease(start, stop)
+            if frames is None:
+                if wait is None:
+                    return
+                time.sleep(min(wait, POLL_SECONDS))
+                continue
+            yield from frames
+
+    def begin(self, index: int, filename: str, **params):
+        """
+        Remembers which frame and parameters the file being rendered belongs to, for record().
+        """
+        self.pending[filename] = (index, {key: json_value(value) for key, value in params.items()})
+
+    def record(self, filename: str, data: bytes):
+        """
+        Marks a frame as finished once its file is written (called by the FramePipeline writer) and renews its lease.
+        """
+        if not self.resume or filename not in self.pending:
+            return
+        index, params = self.pending.pop(filename)
+        now = time.time()
+        with self.update() as manifest:
+            manifest["frames"][str(index)] = {"file": os.path.basename(filename), "bytes": len(data),
+                                              "sha1": hashlib.sha1(data).hexdigest(), "params": params,
+                                              "worker": self.worker, "time": now}
+            for lease in manifest["leases"]:
+                if lease["worker"] == self.worker and index in lease["frames"]:
+                    lease["expires"] = now + self.lease_seconds
+
+    def schedule(self, order):
+        """
+        Stores the order in which the workers lease the unfinished frames (e.g. most expensive first).
+        """
+        with self.update() as manifest:
+            manifest["order"] = [int(index) for index in order]
+
+    def unfinished_frames(self, start: int, stop: int):
+        """
+        Returns the indices in [start, stop) that are not recorded as finished (all of them without resume).
+        """
+        if not self.resume:
+            return list(range(start, stop))
+        with self.update() as manifest:
+            return [index for index in range(start, stop) if str(index) not in manifest["frames"]]
+
+    def finished_frames(self):
+        """
+        Returns the number of frames recorded as finished.
+        """
+        with self.update() as manifest:
+            return len(manifest["frames"])
@@ -0,0 +1,135 @@
+import io
+import os
+import queue
+import threading
+import time
+import numpy as np
+from PIL import Image
+
+# Marks the end of the stream in the stage queues
+_DONE = object()
+
+
+class FramePipeline:
+    """
+    Overlaps frame computation with PNG encoding and disk writes.
+    The caller is the compute stage and hands finished frames to submit(); a pool of encoder threads
+    deflates them to PNG and a single writer thread stores the files. The stages are joined by bounded
+    queues, so a slow encoder or disk blocks submit() instead of letting frames pile up in memory.
+    Pillow releases the GIL while it compresses, so the encoders run in parallel with the compute stage.
+    With a FrameTimer, the conversion, deflate and write time of every frame is reported to it.
+    """
+
+    def __init__(self, encoders: int = None, queue_size: int = 4, compress_level: int = 6, timer=None):
+        self.compress_level = compress_level
+        self.timer = timer
+        self.frames = queue.Queue(maxsize=queue_size)
+        self.encoded = queue.Queue(maxsize=queue_size)
+        self.error = None
+        self.frames_written = 0
+        self.bytes_written = 0
+        encoders = encoders or min(4, os.cpu_count() or 1)
+        if timer is not None:
+            timer.threads.update(to_image=encoders, deflate=encoders)
+        self.encoders = [threading.Thread(target=self.encode_frames, daemon=True) for _ in range(encoders)]
+        self.writer = threading.Thread(target=self.write_frames, daemon=True)
+        for thread in self.encoders + [self.writer]:
+            thread.start()
+
+    # Compute stage entry point
+    def submit(self, filename: str, image, release=None, written=None, failed=None):
+        """
+        Queues a frame (RGB array or PIL image) to be saved as 'filename'. Blocks while the queue is full.
+        release(image) is called once the frame is encoded, so its buffer can be reused (see FrameBufferPool),
+        and written(filename, data) once the file is in place (see FrameManifest.record).
+        If the frame cannot be encoded or written, or written() raises, failed(filename, error) is called and the
+        pipeline carries on with the next frame; without a failed callback the error stops the pipeline and is
+        re-raised by the next submit() and by close().
+        """
+        if self.error is not None:
+            raise self.error
+        self.frames.put((filename, image, release, written, failed))
+
+    # Error of one frame
+    def frame_failed(self, filename: str, error, failed):
+        """
+        Hands the error to the frame's failed callback, or keeps it as the pipeline's error when there is none
+        (or the callback raises too).
+        """
+        if failed is not None:
+            try:
+                failed(filename, error)
+                return
+            except Exception as callback_error:
+                error = callback_error
+        if self.error is None:
+            self.error = error
+
+    # Encoder workers
+    def encode_frames(self):
+        """
+        Converts queued frames to PNG bytes until the end marker arrives.
+        """
+        while True:
+            item = self.frames.get()
+            if item is _DONE:
+                return
+            filename, frame, release, written, failed = item
+            try:
+                start = time.perf_counter()
+                image = Image.fromarray(frame) if isinstance(frame, np.ndarray) else frame
+                converted = time.perf_counter()
+                buffer = io.BytesIO()
+                image.save(buffer, format="PNG", compress_level=self.compress_level)
+                timings = {"to_image": converted - start, "deflate": time.perf_counter() - converted}
+                self.encoded.put((filename, buffer.getvalue(), written, failed, timings))
+            except Exception as error:
+                self.frame_failed(filename, error, failed)
+            finally:
+                if release is not None:
+                    release(frame)
+
+    # Writer stage
+    def write_frames(self):
+        """
+        Writes encoded frames atomically (temporary file, then rename) so no partial PNG is ever left behind.
+        """
+        while True:
+            item = self.encoded.get()
+            if item is _DONE:
+                return
+            filename, data, written, failed, timings = item
+            try:
+                start = time.perf_counter()
+                temp_filename = filename + ".tmp"
+                with open(temp_filename, "wb") as file:
+                    file.write(data)
+                os.replace(temp_filename, filename)
+                self.frames_written += 1
+                self.bytes_written += len(data)
+                if written is not None:
+                    written(filename, data)
+                if self.timer is not None:
+                    self.timer.output_done(filename, dict(timings, write=time.perf_counter() - start), len(data))
+            except Exception as error:
+                self.frame_failed(filename, error, failed)
+
+    # Drain the stages and stop the threads
+    def close(self):
+        """
+        Waits until every submitted frame is written, then re-raises the first error of any stage.
+        """
+        for _ in self.encoders:
+            self.frames.put(_DONE)
+        for thread in self.encoders:
+            thread.join()
+        self.encoded.put(_DONE)
+        self.writer.join()
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,141 @@
+import os
+import time
+from iteration_cache import cache_key
+from render_backend import (mandelbrot_iterations, julia_iterations, colorize_mandelbrot, colorize_julia, megapixels_per_second,
+                            downsample_to, view_symmetry, symmetric_rows, mirror_frame, mirror_julia_frame)
+
+# Threads per block of the fused coloring kernels
+BLOCK_DIM = (16, 16)
+
+
+class FrameRenderer:
+    """
+    The frame path of the animation scripts. A frame is rendered as a sample grid of supersampling times its
+    resolution at 1/supersampling of the pixel spacing. On the GPU, frames of the plain formula are colored on the
+    device by the script's fused kernel (symmetric views only compute the upper half and mirror it); otherwise the
+    escape counts come from the iteration cache or from 'iterations' and are colorized on the host, where adaptive
+    anti-aliasing can refine the edges. render() writes the proxy frames from the samples, averages them down to the
+    output resolution and queues the frame on the pipeline; every stage is timed by the FrameTimer.
+    """
+
+    def __init__(self, formula: str, palette, backend: str, buffers, timer, kernel=None, supersampling: int = 1,
+                 iterations=None, engine=None, interior_stats=None, cache=None, edge_aa=None, pipeline=None, written=None,
+                 proxy_sizes=None, proxy_pipeline=None, output_folder: str = None):
+        """
+        kernel(c_real, c_imag, scale, width, height, max_iterations, image, palette) is the script's fused CUDA kernel.
+        iterations(param, scale, width, height, max_iterations) replaces the render_backend kernels for the counts, and
+        engine(scale, max_iterations) names the engine of a frame (the cache key formula); only frames named after the
+        plain formula use the fused kernel. 'written' is passed to the pipeline with every frame (see FrameManifest.record).
+        """
+        self.formula = formula
+        self.palette = palette
+        self.backend = backend
+        self.buffers = buffers
+        self.timer = timer
+        self.kernel = kernel
+        self.supersampling = supersampling
+        self.iterations = iterations
+        self.engine = engine
+        self.interior_stats = interior_stats
+        self.cache = cache
+        self.edge_aa = edge_aa
+        self.pipeline = pipeline
+        self.written = written
+        self.proxy_sizes = proxy_sizes or {}
+        self.proxy_pipeline = proxy_pipeline
+        self.output_folder = output_folder
+
+    # Engine of a frame
+    def frame_engine(self, scale: float, max_iterations: int):
+        """
+        Returns the name of the engine computing a frame; interior checks can settle a pixel differently from the plain kernels.
+        """
+        if self.engine is not None:
+            return self.engine(scale, max_iterations)
+        return f"{self.formula}-interior" if self.interior_stats is not None else self.formula
+
+    # Escape counts of the sample grid
+    def frame_iterations(self, param: complex, scale: float, width: int, height: int, max_iterations: int):
+        """
+        Returns the escape counts from 'iterations', or from the render_backend kernels into the pool's counts buffer.
+        """
+        if self.iterations is not None:
+            return self.iterations(param, scale, width, height, max_iterations)
+        counts = self.buffers.scratch("counts", (height, width))
+        if self.formula == "mandelbrot":
+            return mandelbrot_iterations(param, scale, width, height, max_iterations, counts=counts, backend=self.backend,
+                                         interior_stats=self.interior_stats, buffers=self.buffers)
+        return julia_iterations(param, scale, width, height, max_iterations, counts=counts, backend=self.backend, buffers=self.buffers)
+
+    # Fused kernel on the GPU
+    def fused_samples(self, param: complex, scale: float, width: int, height: int, max_iterations: int):
+        """
+        Colors the sample grid on the device and downloads it once; the lower half of symmetric views is mirrored on the host.
+        """
+        image = self.buffers.device("image", (height, width, 3))  # 3 channels for RGB, kept on the device
+        symmetry = view_symmetry(self.formula, param)
+        griddim = (width // BLOCK_DIM[0] + 1, symmetric_rows(height, symmetry) // BLOCK_DIM[1] + 1)
+        self.kernel[griddim, BLOCK_DIM](param.real, param.imag, scale, width, height, max_iterations, image,
+                                        self.buffers.palette(self.palette))
+        self.timer.lap("kernel")
+        image = self.buffers.download(image)
+        if self.formula == "julia":
+            # Column 0 has no mirror partner under point symmetry and is computed on the host
+            image = mirror_julia_frame(image, param, scale, max_iterations, self.palette)
+        else:
+            image = mirror_frame(image, symmetry)
+        self.timer.lap("transfer")
+        self.timer.count(pixels=width * height)
+        return image
+
+    def samples(self, param: complex, scale: float, width: int, height: int, max_iterations: int):
+        """
+        Returns the RGB sample grid of a frame from the frame buffers (release it once written);
+        width, height and scale are those of the output frame.
+        """
+        width, height, scale = width * self.supersampling, height * self.supersampling, scale / self.supersampling
+        engine = self.frame_engine(scale, max_iterations)
+        if self.cache is not None:
+            # Escape counts come from the cache when this frame was rendered before, so palette changes only recolor
+            key = cache_key(engine, param, scale, width, height, max_iterations)
+            counts = self.cache.get(key)
+            self.timer.lap("cache")
+            if counts is None:
+                counts = self.frame_iterations(param, scale, width, height, max_iterations)
+                self.timer.lap("kernel")
+                self.cache.put(key, counts)
+                self.timer.lap("cache")
+        elif self.backend == "cuda" and self.kernel is not None and engine == self.formula and self.edge_aa is None:
+            return self.fused_samples(param, scale, width, height, max_iterations)
+        else:
+            counts = self.frame_iterations(param, scale, width, height, max_iterations)
+            self.timer.lap("kernel")
+        colorize = colorize_mandelbrot if self.formula == "mandelbrot" else colorize_julia
+        image = colorize(counts, max_iterations, self.palette, out=self.buffers.acquire((height, width, 3)))
+        self.timer.lap("colorize")
+        self.timer.count(counts)
+        if self.edge_aa is not None:
+            self.edge_aa.refine(self.formula, param, scale, counts, image, max_iterations, self.palette)
+            self.timer.lap("edge_aa")
+        return image
+
+    def render(self, param: complex, scale: float, width: int, height: int, max_iterations: int, filename: str):
+        """
+        Renders a frame and queues it on the pipeline as 'filename', with its proxy_sizes frames averaged from the same
+        samples. Returns the render throughput in Mpixel/s.
+        """
+        start = time.perf_counter()
+        self.timer.start(filename)
+        image = self.samples(param, scale, width, height, max_iterations)
+        for name, size in self.proxy_sizes.items():
+            proxy = downsample_to(image, size, out=self.buffers.acquire((size[1], size[0], 3)))
+            self.proxy_pipeline.submit(os.path.join(f"{self.output_folder}_{name}", os.path.basename(filename)), proxy,
+                                       release=self.buffers.release)
+            self.timer.lap("proxies")
+        image = self.buffers.downsample(image, self.supersampling)
+        self.timer.lap("downsample")
+        rate = megapixels_per_second(width * self.supersampling, height * self.supersampling, time.perf_counter() - start)
+        # Encoded and written in the background, then reused; 'written' records the frame once its file is in place
+        self.pipeline.submit(filename, image, release=self.buffers.release, written=self.written)
+        self.timer.lap("submit")
+        return rate
@@ -0,0 +1,108 @@
+import os
+import subprocess
+import sys
+import time
+import numpy as np
+from numba import njit, prange
+from render_backend import mandelbrot_iterations, julia_iterations
+
+# Environment variable that marks a worker process started by run_frame_workers
+WORKER_VARIABLE = "FRACTAL_WORKER"
+
+# Width of the low-resolution probe frames used to estimate the cost of a frame
+PROBE_WIDTH = 64
+
+# Pixels per side of the probe of every tile of a Julia mosaic
+PROBE_TILE_PIXELS = 4
+
+
+# Cost estimates: every pixel costs one unit plus its escape iterations
+def mandelbrot_cost(center: complex, scale: float, width: int, height: int, max_iterations: int):
+    """
+    Estimates the work of a Mandelbrot frame from a probe about PROBE_WIDTH pixels wide covering the same view.
+    """
+    factor = max(1, width // PROBE_WIDTH)
+    counts = mandelbrot_iterations(center, scale * factor, width // factor, height // factor, max_iterations)
+    return (counts.size + float(counts.sum(dtype=np.int64))) * factor * factor
+
+
+def julia_cost(c: complex, scale: float, width: int, height: int, max_iterations: int):
+    """
+    Estimates the work of a Julia frame from a probe about PROBE_WIDTH pixels wide covering the same view.
+    """
+    factor = max(1, width // PROBE_WIDTH)
+    counts = julia_iterations(c, scale * factor, width // factor, height // factor, max_iterations)
+    return (counts.size + float(counts.sum(dtype=np.int64))) * factor * factor
+
+
+# CPU kernel probing every tile of a Julia mosaic on a tiny grid, one tile per parallel iteration
+@njit(parallel=True, cache=True)
+def julia_tile_iterations(c_real, c_imag, probe_pixels, max_iterations):
+    """
+    Returns the sum of the escape counts of a probe_pixels x probe_pixels grid over (-2, 2) for every c.
+    """
+    totals = np.zeros(c_real.shape[0], dtype=np.int64)
+    scale = 4.0 / probe_pixels
+    for tile in prange(c_real.shape[0]):
+        total = 0
+        for y in range(probe_pixels):
+            for x in range(probe_pixels):
+                z_real = scale * (x + 0.5 - probe_pixels / 2)
+                z_imag = scale * (probe_pixels / 2 - y - 0.5)
+                iteration = 0
+                while z_real * z_real + z_imag * z_imag <= 4.0 and iteration < max_iterations:
+                    z_real_new = z_real * z_real - z_imag * z_imag + c_real[tile]
+                    z_imag = 2.0 * z_real * z_imag + c_imag[tile]
+                    z_real = z_real_new
+                    iteration += 1
+                total += iteration
+        totals[tile] = total
+    return totals
+
+
+def julia_mosaic_cost(c_values, tile_size: float, max_iterations: int):
+    """
+    Estimates the work of a Julia mosaic from a PROBE_TILE_PIXELS-wide probe of every tile.
+    """
+    values = np.asarray(c_values, dtype=np.complex128)
+    totals = julia_tile_iterations(np.ascontiguousarray(values.real), np.ascontiguousarray(values.imag),
+                                   PROBE_TILE_PIXELS, max_iterations)
+    tile_pixels = int(tile_size + 1) ** 2
+    return len(values) * tile_pixels + float(totals.sum()) * tile_pixels / PROBE_TILE_PIXELS**2
+
+
+def is_worker():
+    """
+    True in a worker process started by run_frame_workers.
+    """
+    return os.environ.get(WORKER_VARIABLE) is not None
+
+
+# Longest-processing-time-first scheduling over worker processes
+def run_frame_workers(manifest, frames: range, cost, workers: int):
+    """
+    Probes the unfinished frames with cost(index), stores them in the manifest most expensive first and runs
+    'workers' copies of the running script, which lease the frames one at a time in that order, so the long
+    frames start early and every worker finishes at about the same time. Numba threads are split between
+    the workers. Returns once they have exited; in a worker process it returns immediately.
+    The caller's own frame loop then finds nothing left, except frames of a worker that failed.
+    """
+    if workers <= 1 or is_worker():
+        return
+    start_time = time.time()
+    costs = {index: cost(index) for index in manifest.unfinished_frames(frames.start, frames.stop)}
+    if not costs:
+        return
+    manifest.schedule(sorted(costs, key=costs.get, reverse=True))
+    print(f"Probed {len(costs)} frames in {time.time() - start_time:.1f} s, "
+          f"most expensive {max(costs.values()) / max(min(costs.values()), 1):.1f}x the cheapest")
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    script = os.path.abspath(sys.argv[0])
+    processes = []
+    for worker in range(workers):
+        environment = dict(os.environ, **{WORKER_VARIABLE: str(worker), "NUMBA_NUM_THREADS": str(threads)})
+        processes.append(subprocess.Popen([sys.executable, script], env=environment))
+    for worker, process in enumerate(processes):
+        if process.wait() != 0:
+            print(f"Worker {worker} exited with code {process.returncode}; its frames are rendered here")
+    print(f"{workers} workers finished in {time.time() - start_time:.1f} s")
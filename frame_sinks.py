@@ -0,0 +1,184 @@
+import queue
+import shutil
+import subprocess
+import threading
+import time
+import numpy as np
+
+# Marks the end of the stream in the sink queue
+_DONE = object()
+
+# Stream formats a sink can write
+STREAM_FORMATS = ("rgb24", "y4m")
+
+
+# ffmpeg command line equivalent to the README workflow, reading raw RGB frames from stdin
+def ffmpeg_command(output: str, width: int, height: int, framerate: int, output_size=None, crf: int = 18, preset: str = "slow"):
+    """
+    Returns the argument list that encodes rgb24 frames of width x height from stdin into 'output' with libx264.
+    output_size=(w, h) adds the scale filter the README applies to the 8K PNG sequences.
+    """
+    command = ["ffmpeg", "-y", "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}",
+               "-framerate", str(framerate), "-i", "-"]
+    if output_size is not None:
+        command += ["-vf", f"scale={output_size[0]}:{output_size[1]}"]
+    command += ["-c:v", "libx264", "-crf", str(crf), "-preset", preset, "-pix_fmt", "yuv420p", output]
+    return command
+
+
+# RGB to 8-bit BT.601 limited-range YCbCr planes for Y4M output
+def rgb_to_yuv444(image):
+    """
+    Returns the Y, Cb and Cr planes (uint8) of an RGB frame.
+    """
+    rgb = image.astype(np.float32) / 255.0
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    y = 16.0 + 65.481 * r + 128.553 * g + 24.966 * b
+    cb = 128.0 - 37.797 * r - 74.203 * g + 112.0 * b
+    cr = 128.0 + 112.0 * r - 93.786 * g - 18.214 * b
+    return [np.clip(np.rint(plane), 0, 255).astype(np.uint8) for plane in (y, cb, cr)]
+
+
+class StreamSink:
+    """
+    Writes frames in submission order to a binary stream, as raw rgb24 or as a Y4M (C444) video,
+    from a background thread behind a bounded queue. Exposes the same submit()/close() interface as
+    FramePipeline, so the scripts can use either; the filenames passed to submit() are ignored.
+    """
+
+    def __init__(self, stream, width: int, height: int, framerate: int, stream_format: str = "rgb24", queue_size: int = 4,
+                 timer=None):
+        if stream_format not in STREAM_FORMATS:
+            raise ValueError(f"Unknown stream format '{stream_format}', expected one of {STREAM_FORMATS}")
+        self.stream = stream
+        self.width = width
+        self.height = height
+        self.stream_format = stream_format
+        self.timer = timer
+        self.frames = queue.Queue(maxsize=queue_size)
+        self.error = None
+        self.frames_written = 0
+        self.bytes_written = 0
+        if stream_format == "y4m":
+            self.write_bytes(f"YUV4MPEG2 W{width} H{height} F{framerate}:1 Ip A1:1 C444\n".encode())
+        self.writer = threading.Thread(target=self.write_frames, daemon=True)
+        self.writer.start()
+
+    def write_bytes(self, data):
+        self.stream.write(data)
+        self.bytes_written += len(data)
+
+    def submit(self, filename: str, image, release=None, written=None, failed=None):
+        """
+        Queues a frame (RGB array or PIL image) for the stream. Blocks while the queue is full.
+        release(image) is called once the frame is written, so its buffer can be reused (see FrameBufferPool).
+        'written' is accepted for FramePipeline compatibility; a stream has no per-frame files to report.
+        failed(filename, error) is called if the frame cannot be written to the stream. A partly written stream
+        cannot be resumed, so the error also ends it: the frames still queued are reported as failed too, and the
+        next submit() and close() re-raise it.
+        """
+        if self.error is not None:
+            raise self.error
+        frame = np.asarray(image)
+        if frame.shape != (self.height, self.width, 3):
+            raise ValueError(f"Frame of shape {frame.shape} does not match the stream ({self.height}, {self.width}, 3)")
+        self.frames.put((filename, frame, image, release, failed))
+
+    def write_frames(self):
+        """
+        Writes queued frames until the end marker arrives.
+        """
+        while True:
+            item = self.frames.get()
+            if item is _DONE:
+                return
+            filename, frame, image, release, failed = item
+            try:
+                if self.error is not None:
+                    self.frame_failed(filename, self.error, failed)
+                    continue
+                start = time.perf_counter()
+                bytes_before = self.bytes_written
+                if self.stream_format == "y4m":
+                    self.write_bytes(b"FRAME\n")
+                    for plane in rgb_to_yuv444(frame):
+                        self.write_bytes(plane.tobytes())
+                else:
+                    self.write_bytes(np.ascontiguousarray(frame, dtype=np.uint8).tobytes())
+                self.frames_written += 1
+                if self.timer is not None:
+                    self.timer.output_done(filename, {"stream": time.perf_counter() - start},
+                                           self.bytes_written - bytes_before)
+            except Exception as error:
+                self.error = error
+                self.frame_failed(filename, error, failed)
+            finally:
+                if release is not None:
+                    release(image)
+
+    # Error of one frame
+    def frame_failed(self, filename: str, error, failed):
+        """
+        Hands the error to the frame's failed callback; an error raised by the callback is kept if the stream has none.
+        """
+        if failed is None:
+            return
+        try:
+            failed(filename, error)
+        except Exception as callback_error:
+            if self.error is None:
+                self.error = callback_error
+
+    def close(self):
+        """
+        Waits until every submitted frame is written and closes the stream.
+        """
+        self.frames.put(_DONE)
+        self.writer.join()
+        self.stream.close()
+        if self.error is not None:
+            raise self.error
+
+
+class PipeSink(StreamSink):
+    """
+    Streams frames into the stdin of an encoder process (ffmpeg or any command that reads the stream).
+    """
+
+    def __init__(self, command, width: int, height: int, framerate: int, stream_format: str = "rgb24", queue_size: int = 4,
+                 timer=None):
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE)
+        super().__init__(self.process.stdin, width, height, framerate, stream_format, queue_size, timer)
+
+    def close(self):
+        """
+        Ends the stream and waits for the encoder process to finish.
+        """
+        try:
+            super().close()
+        finally:
+            return_code = self.process.wait()
+        if return_code != 0:
+            raise RuntimeError(f"Encoder command exited with status {return_code}")
+
+
+class FileSink(StreamSink):
+    """
+    Writes the stream to a local file: Y4M for a '.y4m' path, raw rgb24 otherwise.
+    """
+
+    def __init__(self, path: str, width: int, height: int, framerate: int, queue_size: int = 4, timer=None):
+        stream_format = "y4m" if path.endswith(".y4m") else "rgb24"
+        super().__init__(open(path, "wb"), width, height, framerate, stream_format, queue_size, timer)
+
+
+# Encoder pipe when its program is installed, a local file otherwise
+def open_video_sink(command, fallback_path: str, width: int, height: int, framerate: int, timer=None):
+    """
+    Returns a PipeSink for the command if its executable is on the PATH,
+    otherwise a FileSink writing to fallback_path (e.g. 'frames.y4m', which ffmpeg can encode later).
+    """
+    if shutil.which(command[0]) is not None:
+        return PipeSink(command, width, height, framerate, timer=timer)
+    print(f"'{command[0]}' not found, writing the frames to {fallback_path} instead")
+    return FileSink(fallback_path, width, height, framerate, timer=timer)
@@ -0,0 +1,149 @@
+import json
+import threading
+import time
+import numpy as np
+from numba import cuda
+
+
+# h:mm:ss for progress lines
+def format_duration(seconds: float):
+    """
+    Formats a duration in seconds as h:mm:ss.
+    """
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+class FrameTimer:
+    """
+    Opt-in per-stage timing of the frame loop. The compute stage marks the end of each of its steps with lap(name);
+    FramePipeline and the stream sinks report the encode and write steps of the same frame from their threads.
+    Once a frame is written, one JSON line with its stage durations, pixels, escape iterations and bytes is
+    appended to log_path. Progress lines get the frame number and an ETA, and summary() names the stage that
+    limits the frame rate. A disabled timer (log_path None) only prints the progress lines.
+    """
+
+    def __init__(self, log_path: str = None, num_frames: int = None, backend: str = "cpu"):
+        self.enabled = log_path is not None
+        self.log_path = log_path
+        self.num_frames = num_frames
+        self.synchronize = backend == "cuda"
+        self.lock = threading.Lock()
+        self.frames = {}
+        self.totals = {}
+        self.threads = {}
+        self.frames_done = 0
+        self.first_start = None
+        self.filename = None
+
+    # Compute stage
+    def start(self, filename: str):
+        """
+        Starts the record of a frame; the following laps belong to it until the next start().
+        """
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self.first_start is None:
+            self.first_start = now
+        self.filename = filename
+        self.last_lap = now
+        with self.lock:
+            self.frames[filename] = {"frame": filename, "stages": {}, "pixels": 0, "iterations": None, "bytes": 0,
+                                     "computed": False, "written": False}
+
+    def lap(self, stage: str):
+        """
+        Adds the time since the previous lap (or start) to 'stage'. On the GPU it waits for queued kernels first,
+        so their time is not booked on the following transfer.
+        """
+        if not self.enabled:
+            return
+        if self.synchronize:
+            cuda.synchronize()
+        now = time.perf_counter()
+        self.add_stage(self.frames[self.filename], stage, now - self.last_lap)
+        self.last_lap = now
+
+    def count(self, counts=None, pixels: int = 0):
+        """
+        Adds the pixels (and escape iterations, when the counts are given) rendered for the current frame.
+        """
+        if not self.enabled:
+            return
+        record = self.frames[self.filename]
+        if counts is not None:
+            record["pixels"] += counts.size
+            record["iterations"] = (record["iterations"] or 0) + int(counts.sum(dtype=np.int64))
+        record["pixels"] += pixels
+
+    def add_stage(self, record, stage: str, seconds: float):
+        """
+        Books 'seconds' on a stage of a frame record and on the run totals.
+        """
+        with self.lock:
+            record["stages"][stage] = record["stages"].get(stage, 0.0) + seconds
+            self.totals[stage] = self.totals.get(stage, 0.0) + seconds
+
+    def done(self, message: str):
+        """
+        Ends the compute stage of the current frame and prints its progress line, with the ETA when enabled.
+        """
+        if not self.enabled:
+            print(message)
+            return
+        self.frames_done += 1
+        elapsed = time.perf_counter() - self.first_start
+        progress = f"frame {self.frames_done}"
+        if self.num_frames:
+            remaining = max(self.num_frames - self.frames_done, 0)
+            progress += f"/{self.num_frames}, ETA {format_duration(elapsed / self.frames_done * remaining)}"
+        print(f"{message} [{progress}]")
+        with self.lock:
+            record = self.frames[self.filename]
+            record["computed"] = True
+            self.write_record(record)
+
+    # Output stage, called from the FramePipeline or stream sink threads
+    def output_done(self, filename: str, stages: dict, written_bytes: int):
+        """
+        Adds the encode/write durations and the bytes written for a frame.
+        """
+        record = self.frames.get(filename)
+        if record is None:
+            return
+        for stage, seconds in stages.items():
+            self.add_stage(record, stage, seconds)
+        with self.lock:
+            record["bytes"] += written_bytes
+            record["written"] = True
+            self.write_record(record)
+
+    def write_record(self, record):
+        """
+        Appends the JSON line of a frame once both its compute and output stages are done (called with the lock held).
+        """
+        if not (record["computed"] and record["written"]):
+            return
+        del self.frames[record["frame"]]
+        line = {key: value for key, value in record.items() if key not in ("computed", "written")}
+        line["stages"] = {stage: round(seconds, 6) for stage, seconds in record["stages"].items()}
+        line["time"] = time.time()
+        with open(self.log_path, "a") as file:
+            file.write(json.dumps(line) + "\n")
+
+    def summary(self):
+        """
+        Returns the total time of every stage and the critical one: stages that run on several threads
+        (see FramePipeline) count with their total divided by the number of threads; the time the compute
+        stage waited in submit() means the output stage could not keep up.
+        """
+        if not self.enabled or not self.totals:
+            return "no frames timed"
+        effective = {stage: seconds / self.threads.get(stage, 1) for stage, seconds in self.totals.items() if stage != "submit"}
+        critical = max(effective, key=effective.get)
+        parts = []
+        for stage, seconds in sorted(self.totals.items(), key=lambda item: -item[1]):
+            threads = self.threads.get(stage, 1)
+            parts.append(f"{stage} {seconds:.1f} s" + (f" on {threads} threads" if threads > 1 else ""))
+        return f"{self.frames_done} frames, {', '.join(parts)}; critical stage: {critical}"
@@ -0,0 +1,83 @@
+import numpy as np
+from numba import njit, prange
+from render_backend import view_symmetry, symmetric_rows, mirror_frame
+
+
+# CPU kernel that continues the Mandelbrot iteration of the live pixels up to a new cap
+@njit(parallel=True, cache=True)
+def advance_kernel(center_real, center_imag, scale, width, height, max_iterations, live, z_real, z_imag, counts, escaped):
+    """
+    Resumes the escape loop of every pixel listed in 'live' from its stored z and iteration count.
+    Uses the same arithmetic as mandelbrot_kernel, so the counts match a full render at max_iterations.
+    """
+    for k in prange(live.shape[0]):
+        index = live[k]
+        y = index // width
+        x = index - y * width
+        c_real = center_real + scale * (x - width / 2)
+        c_imag = center_imag + scale * (height / 2 - y)
+        zr = z_real[index]
+        zi = z_imag[index]
+        iteration = counts[index]
+        while zr * zr + zi * zi <= 4.0 and iteration < max_iterations:
+            zr_new = zr * zr - zi * zi + c_real
+            zi = 2.0 * zr * zi + c_imag
+            zr = zr_new
+            iteration += 1
+        z_real[index] = zr
+        z_imag[index] = zi
+        counts[index] = iteration
+        escaped[index] = zr * zr + zi * zi > 4.0
+
+
+class IncrementalMandelbrot:
+    """
+    Keeps the per-pixel state (z, escape count, escaped flag) of one Mandelbrot view between frames.
+    Raising max_iterations only advances the pixels that have not escaped yet; changing the view starts over.
+    Views centered on the real axis keep state for the upper half only and mirror it into the frame.
+    """
+
+    def __init__(self):
+        self.view = None
+        self.max_iterations = 0
+        self.resets = 0
+        self.iterated_pixels = 0
+
+    # Start over from z = 0 for a new view
+    def reset(self, center: complex, scale: float, width: int, height: int):
+        """
+        Allocates fresh state for the given view with every pixel live at iteration 0.
+        """
+        self.view = (center, scale, width, height)
+        self.symmetry = view_symmetry("mandelbrot", center)
+        self.rows = symmetric_rows(height, self.symmetry)
+        self.z_real = np.zeros(width * self.rows, dtype=np.float64)
+        self.z_imag = np.zeros(width * self.rows, dtype=np.float64)
+        self.counts = np.zeros(width * self.rows, dtype=np.int32)
+        self.escaped = np.zeros(width * self.rows, dtype=np.bool_)
+        self.live = np.arange(width * self.rows, dtype=np.int64)
+        self.frame = np.zeros((height, width), dtype=np.int32)
+        self.max_iterations = 0
+        self.resets += 1
+
+    # Escape counts for the view at the requested cap
+    def iterations(self, center: complex, scale: float, width: int, height: int, max_iterations: int):
+        """
+        Returns the (height, width) escape counts for the view, identical to mandelbrot_iterations.
+        Only pixels that are still live are iterated from the previous cap up to max_iterations.
+        """
+        if self.view != (center, scale, width, height):
+            self.reset(center, scale, width, height)
+        if max_iterations > self.max_iterations:
+            self.iterated_pixels += len(self.live)
+            advance_kernel(center.real, center.imag, scale, width, height, max_iterations,
+                           self.live, self.z_real, self.z_imag, self.counts, self.escaped)
+            self.live = self.live[~self.escaped[self.live]]
+            self.max_iterations = max_iterations
+            self.frame[:self.rows] = self.counts.reshape(self.rows, width)
+            mirror_frame(self.frame, self.symmetry)
+        counts = self.frame
+        if max_iterations < self.max_iterations:
+            # A lower cap is a clamp of the counts that are already known
+            return np.minimum(counts, max_iterations)
+        return counts
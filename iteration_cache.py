@@ -0,0 +1,92 @@
+import hashlib
+import os
+import numpy as np
+
+
+# Cache key for one frame of escape counts
+def cache_key(formula: str, center: complex, scale: float, width: int, height: int, max_iterations: int):
+    """
+    Builds the text key that identifies a frame of escape counts.
+    Julia frames should include c in the formula, e.g. f"julia({c.real!r},{c.imag!r})".
+    """
+    center = complex(center)
+    return (f"{formula}|{center.real!r}|{center.imag!r}|{float(scale)!r}|"
+            f"{int(width)}|{int(height)}|{int(max_iterations)}")
+
+
+class IterationCache:
+    """
+    On-disk store of raw per-pixel escape counts with size-bounded LRU eviction.
+    Frames are stored as compressed .npz files in the smallest unsigned dtype that holds max_iterations,
+    so changing the palette only needs the colorize pass instead of a full recompute.
+    """
+
+    def __init__(self, folder: str, max_bytes: int):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(folder, exist_ok=True)
+
+    def path(self, key: str):
+        """
+        Returns the file that holds the entry for a key.
+        """
+        return os.path.join(self.folder, hashlib.sha1(key.encode()).hexdigest() + ".npz")
+
+    # Look up a frame and mark it as recently used
+    def get(self, key: str):
+        """
+        Returns the cached int32 escape counts for the key, or None if the frame is not cached.
+        """
+        path = self.path(key)
+        try:
+            with np.load(path) as entry:
+                if str(entry["key"]) != key:
+                    self.misses += 1
+                    return None
+                counts = entry["counts"].astype(np.int32)
+        except (OSError, KeyError, ValueError):
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)  # Last access time for the LRU order
+        except FileNotFoundError:
+            pass  # Evicted by another process in the meantime
+        self.hits += 1
+        return counts
+
+    # Store a frame and evict the least recently used frames above the size limit
+    def put(self, key: str, counts):
+        """
+        Writes the escape counts for the key atomically, then trims the cache to max_bytes.
+        """
+        dtype = np.uint16 if counts.max(initial=0) <= np.iinfo(np.uint16).max else np.uint32
+        path = self.path(key)
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as file:
+            np.savez_compressed(file, key=np.array(key), counts=counts.astype(dtype))
+        os.replace(temp_path, path)
+        self.evict()
+
+    def evict(self):
+        """
+        Deletes the least recently used entries until the cache fits into max_bytes.
+        """
+        entries = []
+        for name in os.listdir(self.folder):
+            if name.endswith(".npz"):
+                try:
+                    stat = os.stat(os.path.join(self.folder, name))
+                except FileNotFoundError:
+                    continue  # Several worker processes can share one cache
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.folder, name))
+            except FileNotFoundError:
+                pass
+            total -= size
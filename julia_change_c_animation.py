@@ -1,9 +1,18 @@
 import math
 import os
+import time
 import numpy as np
 from PIL import Image, ImageDraw, ImageFont
 from numba import cuda
 from scipy.interpolate import interp1d
+from frame_pipeline import FramePipeline
+from frame_sinks import ffmpeg_command, open_video_sink
+from buffer_pool import FrameBufferPool
+from frame_manifest import FrameManifest
+from frame_timing import FrameTimer
+from frame_render import FrameRenderer
+from frame_scheduler import run_frame_workers, julia_cost
+from render_backend import select_backend, megapixels_per_second, downsample_to
 
 # Gradient creation function
 def make_gradient(colors, interpolation):
@@ -31,8 +40,8 @@ num_colors = 256
 palette = [gradient(i / num_colors) for i in range(num_colors)]
 palette_array = np.array(palette, dtype=np.uint8)
 
-# Copy the palette array to the GPU
-palette_array_gpu = cuda.to_device(palette_array)
+# Render backend: "auto" uses the GPU when available, otherwise the multi-core CPU engine ("cuda" or "cpu" to force one)
+backend = select_backend("auto")
 
 # GPU Kernel for Julia set calculation
 @cuda.jit
@@ -64,18 +73,25 @@ def julia_kernel(c_real, c_imag, scale, width, height, max_iterations, image, pa
 # Generate a single frame for the Julia set
 def generate_frame(c, scale: float, width: int, height: int, max_iterations: int, filename: str):
     """
-    Generates a Julia set image frame, displays the complex number 'c', and saves the image.
+    Generates a Julia set image frame, displays the complex number 'c', and queues the image to be saved.
+    Returns the render throughput in Mpixel/s.
+    Each output pixel averages supersampling x supersampling samples; proxy_sizes frames are averaged from the finished frame.
     """
-    image = np.zeros((height, width, 3), dtype=np.uint8)  # 3 channels for RGB
-    blockdim = (16, 16)
-    griddim = (width // blockdim[0] + 1, height // blockdim[1] + 1)
-    julia_kernel[griddim, blockdim](c.real, c.imag, scale, width, height, max_iterations, image, palette_array_gpu)
-    image = Image.fromarray(image).convert("RGBA")  # Convert to RGBA for transparency support
-
-    # Display the coordinates of 'c' in the top right corner
+    start = time.perf_counter()
+    frame_timer.start(filename)
+    frame = frame_buffers.downsample(frame_renderer.samples(c, scale, width, height, max_iterations), supersampling)
+    frame_timer.lap("downsample")
+    rate = megapixels_per_second(width * supersampling, height * supersampling, time.perf_counter() - start)
+    width = frame.shape[1]  # The coordinates of 'c' are drawn at the output resolution
+    image = Image.fromarray(frame).convert("RGBA")  # Convert to RGBA for transparency support
+    frame_buffers.release(frame)
+    frame_timer.lap("to_image")
+
+    # Display the coordinates of 'c' in the top right corner, sized relative to the 8K frame so every resolution
+    # (and supersampled output) matches the 8K render scaled down
     draw = ImageDraw.Draw(image)
     try:
-        font = ImageFont.truetype("arial.ttf", 125)  # Use a large font size
+        font = ImageFont.truetype("arial.ttf", 125 * width // 7680)  # Use a large font size
     except IOError:
         font = ImageFont.load_default()  # Fallback if the font is unavailable
 
@@ -83,10 +99,19 @@ def generate_frame(c, scale: float, width: int, height: int, max_iterations: int
     text = f"c = {c.real:.5f} + {c.imag:.5f}i"
     text_bbox = draw.textbbox((0, 0), text, font=font)
     text_width = text_bbox[2] - text_bbox[0]
-    draw.text((width - text_width - 20, 20), text, fill=green, font=font)
+    margin = 20 * width // 7680
+    draw.text((width - text_width - margin, margin), text, fill=green, font=font)
+
+    frame_timer.lap("text")
 
     image = image.convert("RGB")  # Convert back to RGB before saving
-    image.save(filename)
+    frame_timer.lap("to_rgb")
+    frame_pipeline.submit(filename, image, written=frame_manifest.record)  # Encoded and written in the background
+    frame_timer.lap("submit")
+    for name, size in proxy_sizes.items():
+        proxy_pipeline.submit(os.path.join(f"{output_folder}_{name}", os.path.basename(filename)), downsample_to(np.asarray(image), size))
+        frame_timer.lap("proxies")
+    return rate
 
 # Parameters
 # Maximum iterations for Julia set calculation
@@ -100,23 +125,80 @@ print('Total frames: ',num_frames)
 # Image resolution
 width, height = 7680, 4320
 
+# Supersampling: every output pixel averages supersampling x supersampling samples, so width, height = 3840, 2160
+# with supersampling = 2 gives the 4K frames of the README without the 8K files and the FFmpeg scale pass (1 disables it)
+supersampling = 1
+
+# Proxy frames averaged from each finished frame, written as PNG sequences to <output_folder>_<name>
+# (e.g. {"1080p": (1920, 1080), "720p": (1280, 720)}; each size must divide the frame resolution)
+proxy_sizes = {}
+
 # Fixed scale for Julia set
 scale = 0.001
 
+# Frame output: None writes the PNG sequence, an encoder command receives the raw RGB frames on its stdin instead,
+# e.g. ffmpeg_command("julia_change_c_animation.mp4", width, height, 60, output_size=(3840, 2160))
+# (if that program is not installed, the frames are written to julia_change_c_animation.y4m instead)
+encoder_command = None
+
+# Frame buffers reused across frames (pinned host and device buffers on the GPU, palette uploaded once)
+frame_buffers = FrameBufferPool(backend)
+
 # Prepare the output directory
 output_folder = "julia_change_c_animation"
 os.makedirs(output_folder, exist_ok=True)
-
-# Generate frames for specific values of 'c' in the Julia set
-frame_count = 0
-
+for name in proxy_sizes:
+    os.makedirs(f"{output_folder}_{name}", exist_ok=True)
+
+# Manifest of the finished frames (output_folder/manifest.json): a restarted run skips them and re-renders missing or
+# partial files, and several processes started on the same folder share the frames through leases
+# (PNG sequences only; a stream to an encoder always starts from the first frame)
+frame_scene = dict(max_iterations=max_iterations, n=n, num_frames=num_frames, scale=scale,
+                   width=width, height=height, supersampling=supersampling, palette=palette_array)
+frame_manifest = FrameManifest(output_folder, frame_scene, resume=encoder_command is None)
+
+# Per-stage timing: True appends a JSON line per frame (stage durations, pixels, escape iterations, bytes written)
+# to julia_change_c_animation_timing.jsonl, adds the frame count and an ETA to the progress lines and ends with the critical stage
+frame_timing = False
+frame_timer = FrameTimer("julia_change_c_animation_timing.jsonl" if frame_timing else None,
+                         len(frame_manifest.unfinished_frames(0, num_frames)), backend)
+
+# Encode and write frames on background threads while the next frame is computed
+if encoder_command is None:
+    frame_pipeline = FramePipeline(encoders=4, queue_size=4, timer=frame_timer)
+else:
+    frame_pipeline = open_video_sink(encoder_command, "julia_change_c_animation.y4m", width, height, framerate=60, timer=frame_timer)
+proxy_pipeline = FramePipeline(encoders=2, queue_size=4) if proxy_sizes else None
+
+# Sample grids of the frames: the fused kernel on the GPU, escape counts colorized on the host otherwise
+# (the frames are labeled with 'c' before they are queued, so generate_frame submits them itself)
+frame_renderer = FrameRenderer("julia", palette_array, backend, frame_buffers, frame_timer, kernel=julia_kernel,
+                               supersampling=supersampling)
+
+# Worker processes rendering the frames concurrently, most expensive first by a low-resolution cost probe
+# (1 renders every frame in this process; CPU backend and PNG sequences only)
+frame_workers = 1
+if frame_workers > 1 and backend == "cpu" and encoder_command is None:
+    run_frame_workers(frame_manifest, range(num_frames),
+                      lambda frame_count: julia_cost(complex(0.6 * math.cos((frame_count + 1) / n), 0.6 * math.sin((frame_count + 1) / n)),
+                                                     scale, width, height, max_iterations),
+                      frame_workers)
+
+# Generate frames for specific values of 'c' in the Julia set (frame_count numbers the files from 0)
 # Generate frames in a cycle for values of 'c' on a circular path
-for i in range(1, num_frames + 1):
+for frame_count in frame_manifest.leased_frames(0, num_frames):
+    i = frame_count + 1
     angle = i / n
     c = complex(0.6 * math.cos(angle), 0.6 * math.sin(angle))
     filename = os.path.join(output_folder, f"{frame_count:05d}.png")
-    generate_frame(c, scale, width, height, max_iterations, filename)
-    frame_count += 1
-    print(f"Generated frame {frame_count} for c = {c}")
-
+    frame_manifest.begin(frame_count, filename, c=c, scale=scale, max_iterations=max_iterations)
+    rate = generate_frame(c, scale, width, height, max_iterations, filename)
+    frame_timer.done(f"Generated frame {frame_count + 1} for c = {c} ({rate:.1f} Mpixel/s, {backend})")
+
+frame_pipeline.close()
+if proxy_pipeline is not None:
+    proxy_pipeline.close()
+print(f"Frame buffers: {frame_buffers.summary()}")
 print("All frames generated.")
+if frame_timer.enabled:
+    print(f"Frame timing: {frame_timer.summary()}")
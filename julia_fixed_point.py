@@ -1,8 +1,15 @@
 import os
+import time
 import numpy as np
 from PIL import Image
 from numba import cuda
 from scipy.interpolate import interp1d
+from render_backend import (select_backend, julia_iterations, colorize_julia, megapixels_per_second,
+                            symmetric_rows, mirror_julia_frame)
+from mariani_silver import mariani_silver_iterations
+from tiled_still import render_still
+from progressive import render_progressive
+from adaptive_aa import AdaptiveAntialiasing
 
 # Gradient creation function
 def make_gradient(colors, interpolation):
@@ -29,6 +36,9 @@ num_colors = 256
 palette = [gradient(i / num_colors) for i in range(num_colors)]
 palette_array = np.array(palette, dtype=np.uint8)
 
+# Render backend: "auto" uses the GPU when available, otherwise the multi-core CPU engine ("cuda" or "cpu" to force one)
+backend = select_backend("auto")
+
 # GPU Kernel for Julia set calculation
 @cuda.jit
 def julia_kernel(c_real, c_imag, scale, width, height, max_iterations, image, palette):
@@ -60,14 +70,29 @@ def julia_kernel(c_real, c_imag, scale, width, height, max_iterations, image, pa
 def generate_frame(c, scale: float, width: int, height: int, max_iterations: int, filename: str):
     """
     Generates a Julia set image frame and saves the image.
+    Returns the render throughput in Mpixel/s.
     """
-    image = np.zeros((height, width, 3), dtype=np.uint8)  # 3 channels for RGB
-    blockdim = (16, 16)
-    griddim = (width // blockdim[0] + 1, height // blockdim[1] + 1)
-    julia_kernel[griddim, blockdim](c.real, c.imag, scale, width, height, max_iterations, image, palette_array)
+    start = time.perf_counter()
+    if subdivision:
+        counts = mariani_silver_iterations("julia", c, scale, width, height, max_iterations)
+        image = colorize_julia(counts, max_iterations, palette_array)
+    elif backend == "cuda" and edge_aa is None:
+        image = np.zeros((height, width, 3), dtype=np.uint8)  # 3 channels for RGB
+        blockdim = (16, 16)
+        # Julia sets are point-symmetric: only the upper half is computed, the rest is mirrored
+        griddim = (width // blockdim[0] + 1, symmetric_rows(height, "point") // blockdim[1] + 1)
+        julia_kernel[griddim, blockdim](c.real, c.imag, scale, width, height, max_iterations, image, palette_array)
+        mirror_julia_frame(image, c, scale, max_iterations, palette_array)
+    else:
+        counts = julia_iterations(c, scale, width, height, max_iterations, backend=backend)
+        image = colorize_julia(counts, max_iterations, palette_array)
+    if edge_aa is not None:
+        edge_aa.refine("julia", c, scale, counts, image, max_iterations, palette_array)
+    rate = megapixels_per_second(width, height, time.perf_counter() - start)
     image = Image.fromarray(image).convert("RGBA")  # Convert to RGBA for transparency support
     image = image.convert("RGB")  # Convert back to RGB before saving
     image.save(filename)
+    return rate
 
 # Parameters
 # Maximum iterations for Julia set calculation
@@ -79,6 +104,24 @@ width, height = 7680, 4320
 # Fixed scale for Julia set
 scale = 0.001
 
+# Mariani-Silver subdivision: only rectangle borders are iterated and uniform rectangles are filled
+# (an opt-in CPU engine that may differ from brute force on a few pixels around tiny features, see verify_subdivision;
+# False keeps the output identical to the kernels)
+subdivision = False
+
+# Out-of-core rendering for prints (e.g. width, height = 65536, 65536): the still is computed in strips into a
+# memory-mapped file next to the PNG, and an interrupted render resumes with the first missing strip (False renders it in memory)
+tiled = False
+
+# Progressive preview for choosing 'c': the PNG is written after a thumbnail-sized first pass (a fraction of a second)
+# and rewritten as every pass doubles the resolution; Ctrl+C keeps the last pass (False renders the frame in one piece)
+progressive = False
+
+# Edge-adaptive anti-aliasing: True re-samples only the pixels on edges of the escape counts with 2x2 jittered samples
+# and prints how many were refined and their cost against supersampling the whole image 2x2
+adaptive_aa = False
+edge_aa = AdaptiveAntialiasing(backend=backend) if adaptive_aa else None
+
 # Prepare the output directory
 output_folder = "julia_fixed_point"
 os.makedirs(output_folder, exist_ok=True)
@@ -90,8 +133,15 @@ frame_count = 0
 c = complex( -0.549047586, -0.562183818)
 
 filename = os.path.join(output_folder, f"{frame_count:05d}.png")
-generate_frame(c, scale, width, height, max_iterations, filename)
+if tiled:
+    rate = render_still("julia", c, scale, width, height, max_iterations, palette_array, filename, backend=backend)
+elif progressive:
+    rate = render_progressive("julia", c, scale, width, height, max_iterations, palette_array, filename, backend=backend)
+else:
+    rate = generate_frame(c, scale, width, height, max_iterations, filename)
 frame_count += 1
-print(f"Generated frame {frame_count} for c = {c}")
+print(f"Generated frame {frame_count} for c = {c} ({rate:.1f} Mpixel/s, {backend})")
+if edge_aa is not None:
+    print(f"Adaptive anti-aliasing: {edge_aa.summary()}")
 
 print("All frames generated.")
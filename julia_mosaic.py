@@ -0,0 +1,244 @@
+import numpy as np
+from numba import cuda, njit, prange, parallel_chunksize
+from render_backend import ROW_CHUNK
+
+
+# Which tile, and which pixel inside it, lands on every output column (or row)
+def tile_lookup(margin: float, tile_size: float, grid_size: int, length: int):
+    """
+    Returns two int32 arrays of the given length: the grid index of the tile that is visible at each position
+    (-1 where no tile covers it) and the position inside that tile. Tiles are int(tile_size + 1) pixels wide and
+    placed at int(margin + j * tile_size) like the pasted tiles, so a later tile covers the overlap with an earlier one.
+    """
+    tile_pixels = int(tile_size + 1)
+    tiles = np.full(length, -1, dtype=np.int32)
+    local = np.zeros(length, dtype=np.int32)
+    for j in range(grid_size):
+        start = int(margin + j * tile_size)
+        end = min(start + tile_pixels, length)
+        tiles[start:end] = j
+        local[start:end] = np.arange(end - start)
+    return tiles, local
+
+
+# CPU kernel for a whole mosaic, one output row per parallel iteration
+@njit(parallel=True, cache=True)
+def mosaic_kernel_cpu(c_real, c_imag, grid_size, column_tiles, column_local, row_tiles, row_local, tile_pixels, scale,
+                      max_iterations, palette, image):
+    """
+    Every pixel takes c from its tile and z from its position inside the tile, with the arithmetic of julia_kernel.
+    Pixels outside the grid are black, like the background of the pasted image.
+    """
+    height, width = image.shape[0], image.shape[1]
+    num_colors = palette.shape[0]
+    for y in prange(height):
+        for x in range(width):
+            if row_tiles[y] < 0 or column_tiles[x] < 0:
+                for channel in range(3):
+                    image[y, x, channel] = 0
+                continue
+            tile = row_tiles[y] * grid_size + column_tiles[x]
+            z_real = scale * (column_local[x] - tile_pixels / 2)
+            z_imag = scale * (tile_pixels / 2 - row_local[y])
+            iteration = 0
+            while z_real * z_real + z_imag * z_imag <= 4.0 and iteration < max_iterations:
+                z_real_new = z_real * z_real - z_imag * z_imag + c_real[tile]
+                z_imag = 2.0 * z_real * z_imag + c_imag[tile]
+                z_real = z_real_new
+                iteration += 1
+            for channel in range(3):
+                image[y, x, channel] = 255 if iteration == max_iterations else palette[iteration % num_colors, channel]
+
+
+# GPU kernel for a whole mosaic, one thread per output pixel
+@cuda.jit
+def mosaic_kernel(c_real, c_imag, grid_size, column_tiles, column_local, row_tiles, row_local, tile_pixels, scale,
+                  max_iterations, palette, image):
+    """
+    Same per-pixel work as mosaic_kernel_cpu.
+    """
+    x, y = cuda.grid(2)
+    if x < image.shape[1] and y < image.shape[0]:
+        if row_tiles[y] < 0 or column_tiles[x] < 0:
+            for channel in range(3):
+                image[y, x, channel] = 0
+            return
+        tile = row_tiles[y] * grid_size + column_tiles[x]
+        z_real = scale * (column_local[x] - tile_pixels / 2)
+        z_imag = scale * (tile_pixels / 2 - row_local[y])
+        iteration = 0
+        while z_real * z_real + z_imag * z_imag <= 4.0 and iteration < max_iterations:
+            z_real_new = z_real * z_real - z_imag * z_imag + c_real[tile]
+            z_imag = 2.0 * z_real * z_imag + c_imag[tile]
+            z_real = z_real_new
+            iteration += 1
+        for channel in range(3):
+            image[y, x, channel] = 255 if iteration == max_iterations else palette[iteration % palette.shape[0], channel]
+
+
+# CPU kernel for the unique part of every tile of a symmetric mosaic, one tile row per parallel iteration
+@njit(parallel=True, cache=True)
+def tile_counts_kernel_cpu(c_real, c_imag, tile_pixels, scale, max_iterations, tile_counts):
+    """
+    tile_counts[t, r, x] receives the escape count of pixel (x, r) of tile t for the upper rows r < tile_pixels // 2 + 1.
+    The extra last row holds column 0 of the remaining rows, which point symmetry cannot provide.
+    """
+    tiles, rows, columns = tile_counts.shape
+    half = rows - 1
+    for k in prange(tiles * rows):
+        tile = k // rows
+        row = k - tile * rows
+        for x in range(columns if row < half else tile_pixels - half):
+            local_x, local_y = (x, row) if row < half else (0, half + x)
+            z_real = scale * (local_x - tile_pixels / 2)
+            z_imag = scale * (tile_pixels / 2 - local_y)
+            iteration = 0
+            while z_real * z_real + z_imag * z_imag <= 4.0 and iteration < max_iterations:
+                z_real_new = z_real * z_real - z_imag * z_imag + c_real[tile]
+                z_imag = 2.0 * z_real * z_imag + c_imag[tile]
+                z_real = z_real_new
+                iteration += 1
+            tile_counts[tile, row, x] = iteration
+
+
+# CPU kernel assembling a symmetric mosaic from the tile counts, one output row per parallel iteration
+@njit(parallel=True, cache=True)
+def mirror_mosaic_kernel_cpu(grid_size, column_tiles, column_local, row_tiles, row_local, tile_pixels, tile_counts,
+                             max_iterations, palette, image):
+    """
+    Pixel (x, y) of a tile in the lower half takes the count of (tile_pixels - x, tile_pixels - y), which is -z.
+    """
+    height, width = image.shape[0], image.shape[1]
+    half = tile_counts.shape[1] - 1
+    num_colors = palette.shape[0]
+    for y in prange(height):
+        for x in range(width):
+            if row_tiles[y] < 0 or column_tiles[x] < 0:
+                for channel in range(3):
+                    image[y, x, channel] = 0
+                continue
+            tile = row_tiles[y] * grid_size + column_tiles[x]
+            local_x = column_local[x]
+            local_y = row_local[y]
+            if local_y < half:
+                iteration = tile_counts[tile, local_y, local_x]
+            elif local_x == 0:
+                iteration = tile_counts[tile, half, local_y - half]
+            else:
+                iteration = tile_counts[tile, tile_pixels - local_y, tile_pixels - local_x]
+            for channel in range(3):
+                image[y, x, channel] = 255 if iteration == max_iterations else palette[iteration % num_colors, channel]
+
+
+# GPU kernel for the unique part of every tile of a symmetric mosaic, one thread per tile pixel
+@cuda.jit
+def tile_counts_kernel(c_real, c_imag, tile_pixels, scale, max_iterations, tile_counts):
+    """
+    Same per-pixel work as tile_counts_kernel_cpu; the second grid dimension runs over tiles and their rows.
+    """
+    x, k = cuda.grid(2)
+    tiles, rows, columns = tile_counts.shape
+    half = rows - 1
+    if k < tiles * rows:
+        tile = k // rows
+        row = k - tile * rows
+        if x < (columns if row < half else tile_pixels - half):
+            if row < half:
+                local_x = x
+                local_y = row
+            else:
+                local_x = 0
+                local_y = half + x
+            z_real = scale * (local_x - tile_pixels / 2)
+            z_imag = scale * (tile_pixels / 2 - local_y)
+            iteration = 0
+            while z_real * z_real + z_imag * z_imag <= 4.0 and iteration < max_iterations:
+                z_real_new = z_real * z_real - z_imag * z_imag + c_real[tile]
+                z_imag = 2.0 * z_real * z_imag + c_imag[tile]
+                z_real = z_real_new
+                iteration += 1
+            tile_counts[tile, row, x] = iteration
+
+
+# GPU kernel assembling a symmetric mosaic from the tile counts, one thread per output pixel
+@cuda.jit
+def mirror_mosaic_kernel(grid_size, column_tiles, column_local, row_tiles, row_local, tile_pixels, tile_counts,
+                         max_iterations, palette, image):
+    """
+    Same per-pixel work as mirror_mosaic_kernel_cpu.
+    """
+    x, y = cuda.grid(2)
+    if x < image.shape[1] and y < image.shape[0]:
+        if row_tiles[y] < 0 or column_tiles[x] < 0:
+            for channel in range(3):
+                image[y, x, channel] = 0
+            return
+        tile = row_tiles[y] * grid_size + column_tiles[x]
+        half = tile_counts.shape[1] - 1
+        local_x = column_local[x]
+        local_y = row_local[y]
+        if local_y < half:
+            iteration = tile_counts[tile, local_y, local_x]
+        elif local_x == 0:
+            iteration = tile_counts[tile, half, local_y - half]
+        else:
+            iteration = tile_counts[tile, tile_pixels - local_y, tile_pixels - local_x]
+        for channel in range(3):
+            image[y, x, channel] = 255 if iteration == max_iterations else palette[iteration % palette.shape[0], channel]
+
+
+# A grid of Julia sets rendered in one pass
+def julia_mosaic(c_values, grid_size: int, tile_size: float, x_margin: float, y_margin: float, scale: float,
+                 width: int, height: int, max_iterations: int, palette, backend: str = "cpu", buffers=None, symmetric: bool = True):
+    """
+    Returns the (height, width, 3) uint8 frame of a grid_size x grid_size mosaic of Julia sets, c_values given row by row.
+    The result is pixel-identical to rendering every tile with julia_kernel and pasting it at the same position.
+    Every tile is point-symmetric, so only its upper half is iterated and the frame is assembled from the tile counts
+    (symmetric=False iterates every output pixel directly).
+    With a FrameBufferPool as 'buffers' the frame is acquired from it and device buffers are reused.
+    """
+    values = np.asarray(c_values, dtype=np.complex128)
+    c_real = np.ascontiguousarray(values.real)
+    c_imag = np.ascontiguousarray(values.imag)
+    column_tiles, column_local = tile_lookup(x_margin, tile_size, grid_size, width)
+    row_tiles, row_local = tile_lookup(y_margin, tile_size, grid_size, height)
+    tile_pixels = int(tile_size + 1)
+    # Upper rows of every tile plus one row for column 0 of the lower rows
+    counts_shape = (grid_size * grid_size, tile_pixels // 2 + 2, tile_pixels)
+    if backend == "cuda":
+        if buffers is not None:
+            image = buffers.device("mosaic", (height, width, 3))
+            palette = buffers.palette(palette)
+        else:
+            image = cuda.device_array((height, width, 3), dtype=np.uint8)
+            palette = cuda.to_device(palette)
+        blockdim = (16, 16)
+        griddim = (width // blockdim[0] + 1, height // blockdim[1] + 1)
+        if symmetric:
+            if buffers is not None:
+                tile_counts = buffers.device("mosaic_counts", counts_shape, np.int32)
+            else:
+                tile_counts = cuda.device_array(counts_shape, dtype=np.int32)
+            tile_griddim = (tile_pixels // blockdim[0] + 1, counts_shape[0] * counts_shape[1] // blockdim[1] + 1)
+            tile_counts_kernel[tile_griddim, blockdim](c_real, c_imag, tile_pixels, scale, max_iterations, tile_counts)
+            mirror_mosaic_kernel[griddim, blockdim](grid_size, column_tiles, column_local, row_tiles, row_local, tile_pixels,
+                                                    tile_counts, max_iterations, palette, image)
+        else:
+            mosaic_kernel[griddim, blockdim](c_real, c_imag, grid_size, column_tiles, column_local, row_tiles, row_local,
+                                             tile_pixels, scale, max_iterations, palette, image)
+        return buffers.download(image) if buffers is not None else image.copy_to_host()
+    image = buffers.acquire((height, width, 3)) if buffers is not None else np.empty((height, width, 3), dtype=np.uint8)
+    if symmetric:
+        if buffers is not None:
+            tile_counts = buffers.scratch("mosaic_counts", counts_shape, np.int32)
+        else:
+            tile_counts = np.empty(counts_shape, dtype=np.int32)
+        tile_counts_kernel_cpu(c_real, c_imag, tile_pixels, scale, max_iterations, tile_counts)
+        with parallel_chunksize(ROW_CHUNK):
+            mirror_mosaic_kernel_cpu(grid_size, column_tiles, column_local, row_tiles, row_local, tile_pixels,
+                                     tile_counts, max_iterations, palette, image)
+        return image
+    with parallel_chunksize(ROW_CHUNK):
+        mosaic_kernel_cpu(c_real, c_imag, grid_size, column_tiles, column_local, row_tiles, row_local,
+                          tile_pixels, scale, max_iterations, palette, image)
+    return image
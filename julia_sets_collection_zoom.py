@@ -3,6 +3,13 @@ import numpy as np
 from PIL import Image
 from numba import cuda
 from scipy.interpolate import interp1d
+from frame_pipeline import FramePipeline
+from frame_sinks import ffmpeg_command, open_video_sink
+from buffer_pool import FrameBufferPool
+from frame_manifest import FrameManifest
+from frame_timing import FrameTimer
+from julia_mosaic import julia_mosaic
+from render_backend import select_backend, julia_iterations, colorize_julia
 
 # Gradient creation function with color values in the 0-255 RGB range
 def make_gradient(colors, interpolation):
@@ -30,8 +37,12 @@ num_colors = 256
 palette = [gradient(i / num_colors) for i in range(num_colors)]
 palette_array = np.array(palette, dtype=np.uint8)
 
+# Render backend: "auto" uses the GPU when available, otherwise the multi-core CPU engine ("cuda" or "cpu" to force one)
+backend = select_backend("auto")
+
 # Copy the palette array to the GPU
-palette_array_gpu = cuda.to_device(palette_array)
+if backend == "cuda":
+    palette_array_gpu = cuda.to_device(palette_array)
 
 # GPU Kernel for Julia set
 @cuda.jit
@@ -65,11 +76,22 @@ def generate_julia_tile(c, scale: float, tile_size: int, max_iterations: int):
     """
     Generates a Julia set tile for a specific value of 'c' and returns it as an image.
     """
-    image = np.zeros((tile_size, tile_size, 3), dtype=np.uint8)  # 3 channels for RGB
-    blockdim = (16, 16)
-    griddim = (tile_size // blockdim[0] + 1, tile_size // blockdim[1] + 1)
-    julia_kernel[griddim, blockdim](c.real, c.imag, scale, tile_size, tile_size, max_iterations, image, palette_array_gpu)
-    return Image.fromarray(image).convert("RGB")
+    if backend == "cuda":
+        image = np.zeros((tile_size, tile_size, 3), dtype=np.uint8)  # 3 channels for RGB
+        blockdim = (16, 16)
+        griddim = (tile_size // blockdim[0] + 1, tile_size // blockdim[1] + 1)
+        julia_kernel[griddim, blockdim](c.real, c.imag, scale, tile_size, tile_size, max_iterations, image, palette_array_gpu)
+        frame_timer.lap("kernel")
+        frame_timer.count(pixels=tile_size * tile_size)
+    else:
+        counts = julia_iterations(c, scale, tile_size, tile_size, max_iterations)
+        frame_timer.lap("kernel")
+        image = colorize_julia(counts, max_iterations, palette_array)
+        frame_timer.lap("colorize")
+        frame_timer.count(counts)
+    tile = Image.fromarray(image).convert("RGB")
+    frame_timer.lap("to_image")
+    return tile
 
 # Function to generate the grid of c-values (center of each grid cell)
 def generate_c_values(grid_size, real_range=(-2, 2), imag_range=(-2, 2)):
@@ -88,14 +110,54 @@ max_iterations = 6000
 output_width = 2160
 output_height = 2160
 
-# Start the numbering from 0
-image_counter = 0
+# Frame output: None writes the PNG sequence, an encoder command receives the raw RGB frames on its stdin instead,
+# e.g. ffmpeg_command("julia_sets_collection_zoom.mp4", output_width, output_height, 40)
+# (if that program is not installed, the frames are written to julia_sets_collection_zoom.y4m instead)
+encoder_command = None
+
+# Render each frame's grid in one pass with the mosaic engine (False renders and pastes every tile separately)
+mosaic = True
+
+# Frame buffers reused across frames (pinned host and device buffers on the GPU, palette uploaded once)
+frame_buffers = FrameBufferPool(backend)
 
 grid_size = 31
 
+# Zoom factor of every frame, shrinking by 2.5% per frame (kept as a running product, so skipped frames match a full run)
+zoom_factors = []
 s = 0.975
-# Loop to generate frames
 for frame in range(1, 300):
+    zoom_factors.append(s)
+    s *= 0.975
+
+# Create output folder if it doesn't exist
+output_folder = "julia_sets_collection_zoom"
+os.makedirs(output_folder, exist_ok=True)
+
+# Manifest of the finished frames (output_folder/manifest.json): a restarted run skips them and re-renders missing or
+# partial files, and several processes started on the same folder share the frames through leases
+# (PNG sequences only; a stream to an encoder always starts from the first frame)
+frame_scene = dict(max_iterations=max_iterations, output_width=output_width, output_height=output_height,
+                   grid_size=grid_size, palette=palette_array)
+frame_manifest = FrameManifest(output_folder, frame_scene, resume=encoder_command is None)
+
+# Per-stage timing: True appends a JSON line per frame (stage durations, pixels, escape iterations, bytes written)
+# to julia_sets_collection_zoom_timing.jsonl, adds the frame count and an ETA to the progress lines and ends with the critical stage
+frame_timing = False
+frame_timer = FrameTimer("julia_sets_collection_zoom_timing.jsonl" if frame_timing else None,
+                         len(frame_manifest.unfinished_frames(0, len(zoom_factors))), backend)
+
+# Encode and write frames on background threads while the next frame is computed
+if encoder_command is None:
+    frame_pipeline = FramePipeline(encoders=4, queue_size=4, timer=frame_timer)
+else:
+    frame_pipeline = open_video_sink(encoder_command, "julia_sets_collection_zoom.y4m", output_width, output_height, framerate=40, timer=frame_timer)
+
+# Loop to generate frames, numbered from 0
+for image_counter in frame_manifest.leased_frames(0, len(zoom_factors)):
+    s = zoom_factors[image_counter]
+    file_name = f"{output_folder}/{str(image_counter).zfill(5)}.png"
+    frame_timer.start(file_name)
     # Calculate the size of each tile based on the grid size and the 2160x2160 resolution
     scale_factor = 0.99  # Scaling the grid to be 1% smaller
     tile_size = (output_width / grid_size) * scale_factor  # Apply scale factor for the grid
@@ -107,41 +169,44 @@ for frame in range(1, 300):
     # Calculate the appropriate scale for the Julia sets to fit exactly in each tile
     scale = 4.0 / tile_size * s  # Ensure the Julia set fits within the (-2, 2) range of the complex plane
 
-    # Adjust the scaling factor `s` to zoom in further for the next frame
-    s *= 0.975
-
-    # Prepare the output image (2160x2160 image with all Julia sets)
-    output_image = Image.new("RGB", (output_width, output_height))
-
     # Generate c-values for each grid point (center of each tile)
     c_values = generate_c_values(grid_size)
 
-    # Loop through each position in the grid and generate the corresponding Julia set
-    for i in range(grid_size):
-        for j in range(grid_size):
-            idx = i * grid_size + j
-            c = c_values[idx]
-
-            # Generate the Julia set tile for this specific c-value
-            julia_tile = generate_julia_tile(c, scale=scale, tile_size=int(tile_size + 1), max_iterations=max_iterations)
-
-            # Calculate the position with the margin applied
-            x_pos = int(x_margin + j * tile_size)
-            y_pos = int(y_margin + i * tile_size)
-
-            # Paste the tile in the correct position in the output image
-            output_image.paste(julia_tile, (x_pos, y_pos))
-
-    # Create output folder if it doesn't exist
-    output_folder = "julia_sets_collection_zoom"
-    os.makedirs(output_folder, exist_ok=True)
+    if mosaic:
+        # Render the whole grid in one pass, looking up each tile's c, straight into one frame buffer
+        output_image = julia_mosaic(c_values, grid_size, tile_size, x_margin, y_margin, scale, output_width, output_height,
+                                    max_iterations, palette_array, backend=backend, buffers=frame_buffers)
+        frame_timer.lap("mosaic")
+        frame_timer.count(pixels=output_width * output_height)
+    else:
+        # Prepare the output image (2160x2160 image with all Julia sets)
+        output_image = Image.new("RGB", (output_width, output_height))
+
+        # Loop through each position in the grid and generate the corresponding Julia set
+        for i in range(grid_size):
+            for j in range(grid_size):
+                idx = i * grid_size + j
+                c = c_values[idx]
+
+                # Generate the Julia set tile for this specific c-value
+                julia_tile = generate_julia_tile(c, scale=scale, tile_size=int(tile_size + 1), max_iterations=max_iterations)
+
+                # Calculate the position with the margin applied
+                x_pos = int(x_margin + j * tile_size)
+                y_pos = int(y_margin + i * tile_size)
+
+                # Paste the tile in the correct position in the output image
+                output_image.paste(julia_tile, (x_pos, y_pos))
+                frame_timer.lap("paste")
 
     # Save the final image in the specified folder with the appropriate filename (zero-padded)
-    file_name = f"{output_folder}/{str(image_counter).zfill(5)}.png"
-    output_image.save(file_name)
-    print(f"Image saved: {file_name}")
-
-    # Increment the counter for the next image
-    image_counter += 1
+    frame_manifest.begin(image_counter, file_name, scale=scale)
+    frame_pipeline.submit(file_name, output_image, release=frame_buffers.release if mosaic else None,
+                          written=frame_manifest.record)  # Encoded and written in the background
+    frame_timer.lap("submit")
+    frame_timer.done(f"Image saved: {file_name}")
 
+frame_pipeline.close()
 print("All Julia set images generated and saved.")
+if frame_timer.enabled:
+    print(f"Frame timing: {frame_timer.summary()}")
@@ -1,8 +1,16 @@
 import os
 import numpy as np
-from PIL import Image
 from numba import cuda
 from scipy.interpolate import interp1d
+from frame_pipeline import FramePipeline
+from frame_sinks import ffmpeg_command, open_video_sink
+from buffer_pool import FrameBufferPool
+from frame_manifest import FrameManifest
+from frame_timing import FrameTimer
+from frame_render import FrameRenderer
+from frame_scheduler import run_frame_workers, mandelbrot_cost
+from render_backend import select_backend, INTERIOR_TESTS, format_interior_stats
+from incremental_iterations import IncrementalMandelbrot
 
 # Gradient creation function
 def make_gradient(colors, interpolation):
@@ -29,6 +37,9 @@ num_colors = 300
 palette = [gradient(i / num_colors) for i in range(num_colors)]
 palette_array = np.array(palette, dtype=np.uint8)
 
+# Render backend: "auto" uses the GPU when available, otherwise the multi-core CPU engine ("cuda" or "cpu" to force one)
+backend = select_backend("auto")
+
 # GPU Kernel to calculate Mandelbrot set for each pixel
 @cuda.jit
 def mandelbrot_kernel(center_real, center_imag, scale, width, height, max_iterations, image, palette):
@@ -60,18 +71,6 @@ def mandelbrot_kernel(center_real, center_imag, scale, width, height, max_iterat
             image[y, x, 1] = color[1]  # G
             image[y, x, 2] = color[2]  # B
 
-# Generate a single frame
-def generate_frame(center: complex, scale: float, width: int, height: int, max_iterations: int, filename: str):
-    """
-    Generates a Mandelbrot set image frame and saves it to the specified filename.
-    """
-    image = np.zeros((height, width, 3), dtype=np.uint8)  # 3 channels for RGB
-    blockdim = (16, 16)
-    griddim = (width // blockdim[0] + 1, height // blockdim[1] + 1)
-    mandelbrot_kernel[griddim, blockdim](center.real, center.imag, scale, width, height, max_iterations, image, palette_array)
-    image = Image.fromarray(image)
-    image.save(filename)
-
 # Parameters for generating frames
 # Fixed center for the Mandelbrot set
 center = complex(-1.19, -0.25)
@@ -79,21 +78,96 @@ initial_scale = 0.000035
 final_scale = 0.0001
 num_frames = 300
 
+# Keep per-pixel state between frames and only advance the pixels that have not escaped yet
+# (a CPU engine, so the GPU keeps rendering every frame with its kernel; it starts over whenever the view changes,
+# so it is only used while center and scale stay fixed, and this sequence zooms through the scale)
+incremental = backend == "cpu" and initial_scale == final_scale
+incremental_engine = IncrementalMandelbrot() if incremental else None
+
+# Resolve interior pixels early with the cardioid/bulb tests and orbit periodicity detection
+# (opt-in: periodicity detection can classify a rare pixel differently from brute force, and on the GPU the frame is
+# then computed as escape counts instead of with the fused coloring kernel; only used when the incremental engine is off)
+interior_checks = False
+interior_stats = np.zeros(len(INTERIOR_TESTS), dtype=np.int64) if interior_checks else None
+
 # Frame resolution (8K) — adjust if rendering performance is slow (e.g., 1920, 1080 for Full HD)
 width, height = 7680, 4320
 
+# Supersampling: every output pixel averages supersampling x supersampling samples, so width, height = 3840, 2160
+# with supersampling = 2 gives the 4K frames of the README without the 8K files and the FFmpeg scale pass (1 disables it)
+supersampling = 1
+
+# Proxy frames averaged from the same samples, written as PNG sequences to <output_folder>_<name>
+# (e.g. {"1080p": (1920, 1080), "720p": (1280, 720)}; each size must divide the sample resolution)
+proxy_sizes = {}
+
+# Frame output: None writes the PNG sequence, an encoder command receives the raw RGB frames on its stdin instead,
+# e.g. ffmpeg_command("mandelbrot_increase_iterations_1.mp4", width, height, 30, output_size=(3840, 2160))
+# (if that program is not installed, the frames are written to mandelbrot_increase_iterations_1.y4m instead)
+encoder_command = None
+
+# Frame buffers reused across frames (pinned host and device buffers on the GPU, palette uploaded once)
+frame_buffers = FrameBufferPool(backend)
+
 # Prepare the output directory
 output_folder = "mandelbrot_increase_iterations_1"
 os.makedirs(output_folder, exist_ok=True)
+for name in proxy_sizes:
+    os.makedirs(f"{output_folder}_{name}", exist_ok=True)
+
+# Manifest of the finished frames (output_folder/manifest.json): a restarted run skips them and re-renders missing or
+# partial files, and several processes started on the same folder share the frames through leases
+# (PNG sequences only; a stream to an encoder always starts from the first frame)
+frame_scene = dict(center=center, initial_scale=initial_scale, final_scale=final_scale, num_frames=num_frames,
+                   width=width, height=height, supersampling=supersampling, palette=palette_array)
+frame_manifest = FrameManifest(output_folder, frame_scene, resume=encoder_command is None)
+
+# Per-stage timing: True appends a JSON line per frame (stage durations, pixels, escape iterations, bytes written)
+# to mandelbrot_increase_iterations_1_timing.jsonl, adds the frame count and an ETA to the progress lines and ends with the critical stage
+frame_timing = False
+frame_timer = FrameTimer("mandelbrot_increase_iterations_1_timing.jsonl" if frame_timing else None,
+                         len(frame_manifest.unfinished_frames(0, num_frames)), backend)
+
+# Encode and write frames on background threads while the next frame is computed
+if encoder_command is None:
+    frame_pipeline = FramePipeline(encoders=4, queue_size=4, timer=frame_timer)
+else:
+    frame_pipeline = open_video_sink(encoder_command, "mandelbrot_increase_iterations_1.y4m", width, height, framerate=30, timer=frame_timer)
+proxy_pipeline = FramePipeline(encoders=2, queue_size=4) if proxy_sizes else None
+
+# Frame path: the fused kernel on the GPU, otherwise escape counts (from the incremental engine when it is on) colorized
+# on the host; then the proxies, the downsampling and the pipeline
+frame_renderer = FrameRenderer("mandelbrot", palette_array, backend, frame_buffers, frame_timer, kernel=mandelbrot_kernel,
+                               supersampling=supersampling, interior_stats=interior_stats,
+                               iterations=incremental_engine.iterations if incremental_engine is not None else None,
+                               pipeline=frame_pipeline, written=frame_manifest.record,
+                               proxy_sizes=proxy_sizes, proxy_pipeline=proxy_pipeline, output_folder=output_folder)
 
 # Interpolating scales
 scales = np.geomspace(initial_scale, final_scale, num_frames)
 
+# Worker processes rendering the frames concurrently, most expensive first by a low-resolution cost probe
+# (1 renders every frame in this process; CPU backend and PNG sequences only)
+frame_workers = 1
+if frame_workers > 1 and backend == "cpu" and encoder_command is None:
+    run_frame_workers(frame_manifest, range(num_frames),
+                      lambda i: mandelbrot_cost(center, scales[i], width, height, i),
+                      frame_workers)
+
 # Generate each frame with a fixed center and interpolated scale
-for i in range(num_frames):
+for i in frame_manifest.leased_frames(0, num_frames):
     scale = scales[i]
     filename = os.path.join(output_folder, f"{i:05d}.png")
-    generate_frame(center, scale, width, height, i, filename)
-    print(f"Generated {filename} at center {center} with scale {scale}")
+    frame_manifest.begin(i, filename, center=center, scale=scale, max_iterations=i)
+    rate = frame_renderer.render(center, scale, width, height, i, filename)
+    frame_timer.done(f"Generated {filename} at center {center} with scale {scale} ({rate:.1f} Mpixel/s, {backend})")
 
+frame_pipeline.close()
+if proxy_pipeline is not None:
+    proxy_pipeline.close()
+print(f"Frame buffers: {frame_buffers.summary()}")
 print("All frames generated.")
+if frame_timer.enabled:
+    print(f"Frame timing: {frame_timer.summary()}")
+if interior_stats is not None:
+    print(f"Interior checks: {format_interior_stats(interior_stats)}")
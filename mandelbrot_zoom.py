@@ -1,8 +1,22 @@
 import os
 import numpy as np
-from PIL import Image
 from numba import cuda
 from scipy.interpolate import interp1d
+from frame_pipeline import FramePipeline
+from frame_sinks import ffmpeg_command, open_video_sink
+from buffer_pool import FrameBufferPool
+from frame_manifest import FrameManifest
+from frame_timing import FrameTimer
+from frame_render import FrameRenderer
+from frame_scheduler import run_frame_workers, mandelbrot_cost
+from render_backend import select_backend, mandelbrot_iterations, INTERIOR_TESTS, format_interior_stats
+from iteration_cache import IterationCache
+from exponential_map import ExponentialMapZoom
+from iteration_budget import IterationBudget
+from perturbation import PerturbationRenderer
+from precision_tiers import PrecisionTiers
+from mariani_silver import mariani_silver_iterations
+from progressive import render_progressive
 
 # Gradient creation function
 def make_gradient(colors, interpolation):
@@ -29,6 +43,9 @@ num_colors = 256
 palette = [gradient(i / num_colors) for i in range(num_colors)]
 palette_array = np.array(palette, dtype=np.uint8)
 
+# Render backend: "auto" uses the GPU when available, otherwise the multi-core CPU engine ("cuda" or "cpu" to force one)
+backend = select_backend("auto")
+
 # GPU Kernel to calculate Mandelbrot set for each pixel
 @cuda.jit
 def mandelbrot_kernel(center_real, center_imag, scale, width, height, max_iterations, image, palette):
@@ -60,25 +77,48 @@ def mandelbrot_kernel(center_real, center_imag, scale, width, height, max_iterat
             image[y, x, 1] = color[1]  # G
             image[y, x, 2] = color[2]  # B
 
-# Generate a single frame
-def generate_frame(center: complex, scale: float, width: int, height: int, max_iterations: int, filename: str):
+# Which engine renders a frame: perturbation for deep frames, the exponential map or subdivision when enabled, else the kernels
+def frame_formula(scale: float, max_iterations: int):
+    """
+    Returns the name of the engine that renders a frame at the given scale and iteration count; it is also the formula in the cache key.
+    """
+    if scale < perturbation_scale:
+        return f"mandelbrot-perturbation({center_real},{center_imag})"
+    if frame_precision is not None:
+        return f"mandelbrot-{frame_precision.tier(scale, width * supersampling, height * supersampling, max_iterations)}"
+    if zoom_map is not None:
+        return f"mandelbrot-expmap({zoom_map.columns},{zoom_map.disc_pixels})"
+    if subdivision:
+        return "mandelbrot-subdivision"
+    # Periodicity detection can settle a pixel differently, so its counts are cached apart from the plain kernels'
+    return "mandelbrot-interior" if interior_stats is not None else "mandelbrot"
+
+# Escape counts for a frame from the engine chosen by frame_formula
+def frame_iterations(center: complex, scale: float, width: int, height: int, max_iterations: int):
     """
-    Generates a Mandelbrot set image frame and saves it to the specified filename.
+    Returns the escape counts of a frame from the perturbation engine below perturbation_scale, from the precision tiers,
+    the exponential map or rectangle subdivision when enabled, or from the float64 kernels.
     """
-    image = np.zeros((height, width, 3), dtype=np.uint8)  # 3 channels for RGB
-    blockdim = (16, 16)
-    griddim = (width // blockdim[0] + 1, height // blockdim[1] + 1)
-    mandelbrot_kernel[griddim, blockdim](center.real, center.imag, scale, width, height, max_iterations, image, palette_array)
-    image = Image.fromarray(image)
-    image.save(filename)
+    if scale < perturbation_scale:
+        return deep_zoom.iterations(scale, width, height, max_iterations)
+    if frame_precision is not None:
+        return frame_precision.iterations(scale, width, height, max_iterations)
+    if zoom_map is not None:
+        return zoom_map.iterations(scale)
+    if subdivision:
+        return mariani_silver_iterations("mandelbrot", center, scale, width, height, max_iterations)
+    return mandelbrot_iterations(center, scale, width, height, max_iterations,
+                                 counts=frame_buffers.scratch("counts", (height, width)), backend=backend, interior_stats=interior_stats,
+                                 buffers=frame_buffers)
 
 # Parameters for generating frames
 # Maximum iterations for Mandelbrot calculation
 max_iterations = 6000
 
-# Fixed center coordinates for the Mandelbrot set
-center = complex(-1.7891690186048231066744683411888387638173618368159070155822017397181006156270275749142369245820396054,
-                 -0.0000003393685157671825660282302661468127283482188945938569013974696942388736569110136147219176174266)
+# Fixed center coordinates for the Mandelbrot set (kept as text so deep frames can use every digit)
+center_real = "-1.7891690186048231066744683411888387638173618368159070155822017397181006156270275749142369245820396054"
+center_imag = "-0.0000003393685157671825660282302661468127283482188945938569013974696942388736569110136147219176174266"
+center = complex(float(center_real), float(center_imag))
 
 # Zoom scales (initial and final) for the transformation
 initial_scale = 0.001
@@ -87,21 +127,147 @@ final_scale = 1e-15
 # Number of frames in the zoom sequence
 num_frames = 1200
 
+# Frames with a smaller scale are rendered with perturbation theory from one shared high-precision reference orbit
+perturbation_scale = 1e-12
+deep_zoom = PerturbationRenderer(center_real, center_imag, deepest_scale=final_scale)
+
+# Precision tiers: True renders the frames above perturbation_scale in the cheapest arithmetic that resolves them
+# for max_iterations (float64 down to about 3e-8 at 6000 iterations, then double-double, which reaches about 1e-23 when
+# perturbation_scale is lowered; float32 only for shallow frames with a few hundred iterations at most);
+# validate_precision also renders every frame one tier up, reports frames whose counts differ and keeps the better ones
+precision_tiers = False
+validate_precision = False
+frame_precision = PrecisionTiers("mandelbrot", (center_real, center_imag), backend, validate=validate_precision) if precision_tiers else None
+
+# Resolve interior pixels early with the cardioid/bulb tests and orbit periodicity detection
+# (opt-in: periodicity detection can classify a rare pixel differently from brute force, and on the GPU the frame is
+# then computed as escape counts instead of with the fused coloring kernel)
+interior_checks = False
+interior_stats = np.zeros(len(INTERIOR_TESTS), dtype=np.int64) if interior_checks else None
+
 # Frame resolution (8K) — adjust if rendering performance is slow (e.g., 1920, 1080 for Full HD)
 width, height = 7680, 4320
 
+# Supersampling: every output pixel averages supersampling x supersampling samples, so width, height = 3840, 2160
+# with supersampling = 2 gives the 4K frames of the README without the 8K files and the FFmpeg scale pass (1 disables it)
+supersampling = 1
+
+# Proxy frames averaged from the same samples, written as PNG sequences to <output_folder>_<name>
+# (e.g. {"1080p": (1920, 1080), "720p": (1280, 720)}; each size must divide the sample resolution)
+proxy_sizes = {}
+
+# Render the zoom once as a log-polar strip around the center and resample every frame from it
+# (iteration work then grows with the zoom depth instead of the frame count; False renders every frame)
+exponential_map = False
+zoom_map = ExponentialMapZoom(center, max(final_scale, perturbation_scale) / supersampling, initial_scale / supersampling,
+                              width * supersampling, height * supersampling, max_iterations) if exponential_map else None
+
+# Per-frame iteration cap: True picks the smallest cap up to max_iterations that keeps the escaped/interior classification
+# of a sparse pixel sample, except for an iteration_tolerance fraction of it, and records it in the frame manifest
+# (not with the exponential map, whose frames all come from one strip rendered at max_iterations)
+auto_iterations = False
+iteration_tolerance = 0.001
+iteration_budget = IterationBudget(max_iterations, tolerance=iteration_tolerance) if auto_iterations and zoom_map is None else None
+
+# Mariani-Silver subdivision: only rectangle borders are iterated and uniform rectangles are filled
+# (an opt-in CPU engine that may differ from brute force on a few pixels around tiny features, see verify_subdivision;
+# False keeps the output identical to the kernels, and interior_checks only applies to the kernels)
+subdivision = False
+
+# Cache of raw escape counts (opt-in, e.g. IterationCache("mandelbrot_zoom_iterations", max_bytes=32 * 1024**3), which
+# stores up to 32 GB of frames); re-runs with a new palette then only recolor the frames (None renders every frame)
+iteration_cache = None
+
+# Frame output: None writes the PNG sequence, an encoder command receives the raw RGB frames on its stdin instead,
+# e.g. ffmpeg_command("mandelbrot_zoom.mp4", width, height, 60, output_size=(3840, 2160))
+# (if that program is not installed, the frames are written to mandelbrot_zoom.y4m instead)
+encoder_command = None
+
+# Frame buffers reused across frames (pinned host and device buffers on the GPU, palette uploaded once)
+frame_buffers = FrameBufferPool(backend)
+
 # Prepare the output directory
 output_folder = "mandelbrot_zoom"
 os.makedirs(output_folder, exist_ok=True)
+for name in proxy_sizes:
+    os.makedirs(f"{output_folder}_{name}", exist_ok=True)
+
+# Manifest of the finished frames (output_folder/manifest.json): a restarted run skips them and re-renders missing or
+# partial files, and several processes started on the same folder share the frames through leases
+# (PNG sequences only; a stream to an encoder always starts from the first frame)
+frame_scene = dict(center_real=center_real, center_imag=center_imag, initial_scale=initial_scale, final_scale=final_scale,
+                   num_frames=num_frames, max_iterations=max_iterations, auto_iterations=auto_iterations,
+                   iteration_tolerance=iteration_tolerance, perturbation_scale=perturbation_scale, precision_tiers=precision_tiers,
+                   exponential_map=exponential_map, subdivision=subdivision, interior_checks=interior_checks,
+                   width=width, height=height, supersampling=supersampling, palette=palette_array)
+frame_manifest = FrameManifest(output_folder, frame_scene, resume=encoder_command is None)
+
+# Per-stage timing: True appends a JSON line per frame (stage durations, pixels, escape iterations, bytes written)
+# to mandelbrot_zoom_timing.jsonl, adds the frame count and an ETA to the progress lines and ends with the critical stage
+frame_timing = False
+frame_timer = FrameTimer("mandelbrot_zoom_timing.jsonl" if frame_timing else None,
+                         len(frame_manifest.unfinished_frames(0, num_frames)), backend)
+
+# Encode and write frames on background threads while the next frame is computed
+if encoder_command is None:
+    frame_pipeline = FramePipeline(encoders=4, queue_size=4, timer=frame_timer)
+else:
+    frame_pipeline = open_video_sink(encoder_command, "mandelbrot_zoom.y4m", width, height, framerate=60, timer=frame_timer)
+proxy_pipeline = FramePipeline(encoders=2, queue_size=4) if proxy_sizes else None
+
+# Frame path: the fused kernel on the GPU for the float64 frames, otherwise escape counts from the engine chosen by
+# frame_formula (or the iteration cache) colorized on the host; then the proxies, the downsampling and the pipeline
+frame_renderer = FrameRenderer("mandelbrot", palette_array, backend, frame_buffers, frame_timer, kernel=mandelbrot_kernel,
+                               supersampling=supersampling, iterations=frame_iterations, engine=frame_formula,
+                               interior_stats=interior_stats, cache=iteration_cache,
+                               pipeline=frame_pipeline, written=frame_manifest.record,
+                               proxy_sizes=proxy_sizes, proxy_pipeline=proxy_pipeline, output_folder=output_folder)
 
 # Interpolate scales for smooth zoom
 scales = np.geomspace(initial_scale, final_scale, num_frames)
 
+# Progressive preview for choosing the center: e.g. preview_frame = num_frames - 1 writes that frame coarse-to-fine to
+# <output_folder>_preview.png, refining it pass by pass (Ctrl+C keeps the last pass), and stops before the sequence
+# (None renders the sequence; the preview uses the float64 kernels, so only frames above perturbation_scale)
+preview_frame = None
+if preview_frame is not None:
+    render_progressive("mandelbrot", center, scales[preview_frame] / supersampling, width * supersampling, height * supersampling,
+                       max_iterations, palette_array, f"{output_folder}_preview.png", backend=backend)
+    raise SystemExit
+
+# Worker processes rendering the frames concurrently, most expensive first by a low-resolution cost probe
+# (1 renders every frame in this process; CPU backend, PNG sequences and exponential_map = False only)
+frame_workers = 1
+if frame_workers > 1 and backend == "cpu" and encoder_command is None and zoom_map is None:
+    run_frame_workers(frame_manifest, range(num_frames),
+                      lambda i: mandelbrot_cost(center, scales[i], width, height, max_iterations),
+                      frame_workers)
+
 # Generate each frame with a fixed center and interpolated scale
-for i in range(num_frames):
+for i in frame_manifest.leased_frames(0, num_frames):
     scale = scales[i]
     filename = os.path.join(output_folder, f"{i:05d}.png")
-    generate_frame(center, scale, width, height, max_iterations, filename)
-    print(f"Generated {filename} at center {center} with scale {scale}")
+    frame_max_iterations = max_iterations
+    if iteration_budget is not None:
+        # Frames below perturbation_scale sample their pixels with the perturbation engine that renders them
+        frame_max_iterations = iteration_budget.frame_cap(center, scale / supersampling, width * supersampling, height * supersampling,
+                                                          deep_zoom.iterations if scale / supersampling < perturbation_scale else None)
+    frame_manifest.begin(i, filename, center=center, scale=scale, max_iterations=frame_max_iterations,
+                         engine=frame_formula(scale / supersampling, frame_max_iterations))
+    rate = frame_renderer.render(center, scale, width, height, frame_max_iterations, filename)
+    frame_timer.done(f"Generated {filename} at center {center} with scale {scale} and {frame_max_iterations} iterations "
+                     f"({rate:.1f} Mpixel/s, {backend})")
 
+frame_pipeline.close()
+if proxy_pipeline is not None:
+    proxy_pipeline.close()
+print(f"Frame buffers: {frame_buffers.summary()}")
+if frame_precision is not None:
+    print(f"Precision tiers: {frame_precision.summary()}")
 print("All frames generated.")
+if frame_timer.enabled:
+    print(f"Frame timing: {frame_timer.summary()}")
+if iteration_budget is not None:
+    print(f"Iteration budget: {iteration_budget.summary()}")
+if interior_stats is not None:
+    print(f"Interior checks: {format_interior_stats(interior_stats)}")
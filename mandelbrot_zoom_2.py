@@ -1,8 +1,20 @@
 import os
 import numpy as np
-from PIL import Image
 from numba import cuda
 from scipy.interpolate import interp1d
+from frame_pipeline import FramePipeline
+from frame_sinks import ffmpeg_command, open_video_sink
+from buffer_pool import FrameBufferPool
+from frame_manifest import FrameManifest
+from frame_timing import FrameTimer
+from frame_render import FrameRenderer
+from frame_scheduler import run_frame_workers, mandelbrot_cost
+from render_backend import select_backend, mandelbrot_iterations, INTERIOR_TESTS, format_interior_stats
+from iteration_cache import IterationCache
+from exponential_map import ExponentialMapZoom
+from iteration_budget import IterationBudget
+from progressive import render_progressive
+from adaptive_aa import AdaptiveAntialiasing
 
 # Gradient creation function
 def make_gradient(colors, interpolation):
@@ -31,6 +43,9 @@ num_colors = 1000
 palette = [gradient(i / num_colors) for i in range(num_colors)]
 palette_array = np.array(palette, dtype=np.uint8)
 
+# Render backend: "auto" uses the GPU when available, otherwise the multi-core CPU engine ("cuda" or "cpu" to force one)
+backend = select_backend("auto")
+
 # GPU Kernel to calculate Mandelbrot set for each pixel
 @cuda.jit
 def mandelbrot_kernel(center_real, center_imag, scale, width, height, max_iterations, image, palette):
@@ -62,17 +77,26 @@ def mandelbrot_kernel(center_real, center_imag, scale, width, height, max_iterat
             image[y, x, 1] = color[1]  # G
             image[y, x, 2] = color[2]  # B
 
-# Generate a single frame
-def generate_frame(center: complex, scale: float, width: int, height: int, max_iterations: int, filename: str):
+# Which engine renders a frame: the exponential map when enabled, else the kernels
+def frame_formula(scale: float):
     """
-    Generates a Mandelbrot set image frame and saves it to the specified filename.
+    Returns the name of the engine that renders a frame at the given scale; it is also the formula in the cache key.
     """
-    image = np.zeros((height, width, 3), dtype=np.uint8)  # 3 channels for RGB
-    blockdim = (16, 16)
-    griddim = (width // blockdim[0] + 1, height // blockdim[1] + 1)
-    mandelbrot_kernel[griddim, blockdim](center.real, center.imag, scale, width, height, max_iterations, image, palette_array)
-    image = Image.fromarray(image)
-    image.save(filename)
+    if zoom_map is not None:
+        return f"mandelbrot-expmap({zoom_map.columns},{zoom_map.disc_pixels})"
+    # Periodicity detection can settle a pixel differently, so its counts are cached apart from the plain kernels'
+    return "mandelbrot-interior" if interior_stats is not None else "mandelbrot"
+
+# Escape counts for a frame from the engine chosen by frame_formula
+def frame_iterations(center: complex, scale: float, width: int, height: int, max_iterations: int):
+    """
+    Returns the escape counts of a frame from the exponential map when it is enabled, or from the float64 kernels.
+    """
+    if zoom_map is not None:
+        return zoom_map.iterations(scale)
+    return mandelbrot_iterations(center, scale, width, height, max_iterations,
+                                 counts=frame_buffers.scratch("counts", (height, width)), backend=backend, interior_stats=interior_stats,
+                                 buffers=frame_buffers)
 
 # Parameters for generating frames
 # Maximum iterations for Mandelbrot calculation
@@ -89,21 +113,132 @@ final_scale = 1e-5
 # Number of frames in the zoom sequence
 num_frames = 3500
 
+# Resolve interior pixels early with the cardioid/bulb tests and orbit periodicity detection
+# (opt-in: periodicity detection can classify a rare pixel differently from brute force, and on the GPU the frame is
+# then computed as escape counts instead of with the fused coloring kernel)
+interior_checks = False
+interior_stats = np.zeros(len(INTERIOR_TESTS), dtype=np.int64) if interior_checks else None
+
 # Frame resolution (8K) — adjust if rendering performance is slow (e.g., 1920, 1080 for Full HD)
 width, height = 7680, 4320
 
+# Supersampling: every output pixel averages supersampling x supersampling samples, so width, height = 3840, 2160
+# with supersampling = 2 gives the 4K frames of the README without the 8K files and the FFmpeg scale pass (1 disables it)
+supersampling = 1
+
+# Edge-adaptive anti-aliasing: True re-samples only the pixels on edges of the escape counts with 2x2 jittered samples
+# (usually with supersampling = 1; at 1/3 to 1/2 of the iterations of supersampling = 2 on typical frames)
+adaptive_aa = False
+edge_aa = AdaptiveAntialiasing(backend=backend) if adaptive_aa else None
+
+# Proxy frames averaged from the same samples, written as PNG sequences to <output_folder>_<name>
+# (e.g. {"1080p": (1920, 1080), "720p": (1280, 720)}; each size must divide the sample resolution)
+proxy_sizes = {}
+
+# Render the zoom once as a log-polar strip around the center and resample every frame from it
+# (iteration work then grows with the zoom depth instead of the frame count; False renders every frame)
+exponential_map = False
+zoom_map = ExponentialMapZoom(center, min(initial_scale, final_scale) / supersampling, max(initial_scale, final_scale) / supersampling,
+                              width * supersampling, height * supersampling, max_iterations) if exponential_map else None
+
+# Per-frame iteration cap: True picks the smallest cap up to max_iterations that keeps the escaped/interior classification
+# of a sparse pixel sample, except for an iteration_tolerance fraction of it, and records it in the frame manifest
+# (not with the exponential map, whose frames all come from one strip rendered at max_iterations)
+auto_iterations = False
+iteration_tolerance = 0.001
+iteration_budget = IterationBudget(max_iterations, tolerance=iteration_tolerance) if auto_iterations and zoom_map is None else None
+
+# Cache of raw escape counts (opt-in, e.g. IterationCache("mandelbrot_zoom_2_iterations", max_bytes=32 * 1024**3), which
+# stores up to 32 GB of frames); re-runs with a new palette then only recolor the frames (None renders every frame)
+iteration_cache = None
+
+# Frame output: None writes the PNG sequence, an encoder command receives the raw RGB frames on its stdin instead,
+# e.g. ffmpeg_command("mandelbrot_zoom_2.mp4", width, height, 60, output_size=(3840, 2160))
+# (if that program is not installed, the frames are written to mandelbrot_zoom_2.y4m instead)
+encoder_command = None
+
+# Frame buffers reused across frames (pinned host and device buffers on the GPU, palette uploaded once)
+frame_buffers = FrameBufferPool(backend)
+
 # Prepare the output directory
 output_folder = "mandelbrot_zoom_2"
 os.makedirs(output_folder, exist_ok=True)
+for name in proxy_sizes:
+    os.makedirs(f"{output_folder}_{name}", exist_ok=True)
+
+# Manifest of the finished frames (output_folder/manifest.json): a restarted run skips them and re-renders missing or
+# partial files, and several processes started on the same folder share the frames through leases
+# (PNG sequences only; a stream to an encoder always starts from the first frame)
+frame_scene = dict(center=center, initial_scale=initial_scale, final_scale=final_scale, num_frames=num_frames,
+                   max_iterations=max_iterations, auto_iterations=auto_iterations, iteration_tolerance=iteration_tolerance,
+                   exponential_map=exponential_map, interior_checks=interior_checks, adaptive_aa=adaptive_aa,
+                   width=width, height=height, supersampling=supersampling, palette=palette_array)
+frame_manifest = FrameManifest(output_folder, frame_scene, resume=encoder_command is None)
+
+# Per-stage timing: True appends a JSON line per frame (stage durations, pixels, escape iterations, bytes written)
+# to mandelbrot_zoom_2_timing.jsonl, adds the frame count and an ETA to the progress lines and ends with the critical stage
+frame_timing = False
+frame_timer = FrameTimer("mandelbrot_zoom_2_timing.jsonl" if frame_timing else None,
+                         len(frame_manifest.unfinished_frames(0, num_frames)), backend)
+
+# Encode and write frames on background threads while the next frame is computed
+if encoder_command is None:
+    frame_pipeline = FramePipeline(encoders=4, queue_size=4, timer=frame_timer)
+else:
+    frame_pipeline = open_video_sink(encoder_command, "mandelbrot_zoom_2.y4m", width, height, framerate=60, timer=frame_timer)
+proxy_pipeline = FramePipeline(encoders=2, queue_size=4) if proxy_sizes else None
+
+# Frame path: the fused kernel on the GPU for the plain frames, otherwise escape counts (or the iteration cache)
+# colorized and edge-refined on the host; then the proxies, the downsampling and the pipeline
+frame_renderer = FrameRenderer("mandelbrot", palette_array, backend, frame_buffers, frame_timer, kernel=mandelbrot_kernel,
+                               supersampling=supersampling, iterations=frame_iterations,
+                               engine=lambda scale, max_iterations: frame_formula(scale), interior_stats=interior_stats,
+                               cache=iteration_cache, edge_aa=edge_aa, pipeline=frame_pipeline, written=frame_manifest.record,
+                               proxy_sizes=proxy_sizes, proxy_pipeline=proxy_pipeline, output_folder=output_folder)
 
 # Interpolate scales for smooth zoom
 scales = np.geomspace(initial_scale, final_scale, num_frames)
 
+# Progressive preview for choosing the center: e.g. preview_frame = num_frames - 1 writes that frame coarse-to-fine to
+# <output_folder>_preview.png, refining it pass by pass (Ctrl+C keeps the last pass), and stops before the sequence
+# (None renders the sequence)
+preview_frame = None
+if preview_frame is not None:
+    render_progressive("mandelbrot", center, scales[preview_frame] / supersampling, width * supersampling, height * supersampling,
+                       max_iterations, palette_array, f"{output_folder}_preview.png", backend=backend)
+    raise SystemExit
+
+# Worker processes rendering the frames concurrently, most expensive first by a low-resolution cost probe
+# (1 renders every frame in this process; CPU backend, PNG sequences and exponential_map = False only)
+frame_workers = 1
+if frame_workers > 1 and backend == "cpu" and encoder_command is None and zoom_map is None:
+    run_frame_workers(frame_manifest, range(num_frames),
+                      lambda i: mandelbrot_cost(center, scales[i], width, height, max_iterations),
+                      frame_workers)
+
 # Generate each frame with a fixed center and interpolated scale
-for i in range(num_frames):
+for i in frame_manifest.leased_frames(0, num_frames):
     scale = scales[i]
     filename = os.path.join(output_folder, f"{i:05d}.png")
-    generate_frame(center, scale, width, height, max_iterations, filename)
-    print(f"Generated {filename} at center {center} with scale {scale}")
+    frame_max_iterations = max_iterations
+    if iteration_budget is not None:
+        frame_max_iterations = iteration_budget.frame_cap(center, scale / supersampling, width * supersampling, height * supersampling)
+    frame_manifest.begin(i, filename, center=center, scale=scale, max_iterations=frame_max_iterations,
+                         engine=frame_formula(scale / supersampling))
+    rate = frame_renderer.render(center, scale, width, height, frame_max_iterations, filename)
+    frame_timer.done(f"Generated {filename} at center {center} with scale {scale} and {frame_max_iterations} iterations "
+                     f"({rate:.1f} Mpixel/s, {backend})")
 
+frame_pipeline.close()
+if proxy_pipeline is not None:
+    proxy_pipeline.close()
+print(f"Frame buffers: {frame_buffers.summary()}")
 print("All frames generated.")
+if frame_timer.enabled:
+    print(f"Frame timing: {frame_timer.summary()}")
+if iteration_budget is not None:
+    print(f"Iteration budget: {iteration_budget.summary()}")
+if interior_stats is not None:
+    print(f"Interior checks: {format_interior_stats(interior_stats)}")
+if edge_aa is not None:
+    print(f"Adaptive anti-aliasing: {edge_aa.summary()}")
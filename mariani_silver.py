@@ -0,0 +1,156 @@
+import time
+import numpy as np
+from numba import njit, prange
+from render_backend import (mandelbrot_iterations, julia_iterations, view_symmetry, symmetric_rows, mirror_frame,
+                            mirror_julia_frame)
+
+# Formulas the subdivision renderer understands
+FORMULAS = ("mandelbrot", "julia")
+
+
+# Escape count of a single pixel with the arithmetic of mandelbrot_kernel / julia_kernel
+@njit(cache=True)
+def pixel_escape_count(julia, p_real, p_imag, scale, width, height, x, y, max_iterations):
+    """
+    For the Mandelbrot set p is the view center and the pixel gives c; for Julia sets p is c
+    and the pixel gives the starting z.
+    """
+    if julia:
+        z_real = scale * (x - width / 2)
+        z_imag = scale * (height / 2 - y)
+        c_real = p_real
+        c_imag = p_imag
+    else:
+        c_real = p_real + scale * (x - width / 2)
+        c_imag = p_imag + scale * (height / 2 - y)
+        z_real = 0.0
+        z_imag = 0.0
+    iteration = 0
+    while z_real * z_real + z_imag * z_imag <= 4.0 and iteration < max_iterations:
+        z_real_new = z_real * z_real - z_imag * z_imag + c_real
+        z_imag = 2.0 * z_real * z_imag + c_imag
+        z_real = z_real_new
+        iteration += 1
+    return iteration
+
+
+# CPU kernel: Mariani-Silver subdivision, one tile per parallel iteration
+@njit(parallel=True, cache=True)
+def mariani_silver_kernel(julia, p_real, p_imag, scale, width, height, max_iterations, tile, min_size, counts, iterated):
+    """
+    Iterates only the border of each rectangle. A rectangle whose whole border shares one escape count
+    is filled with it; otherwise it is split into four and the quarters are processed the same way.
+    counts must be -1 on entry; iterated[t] receives the number of pixels tile t actually iterated.
+    Only the first counts.shape[0] rows of the frame are rendered.
+    """
+    rows = counts.shape[0]
+    tiles_x = (width + tile - 1) // tile
+    tiles_y = (rows + tile - 1) // tile
+    for t in prange(tiles_x * tiles_y):
+        stack = np.empty((128, 4), dtype=np.int64)
+        stack[0, 0] = (t % tiles_x) * tile
+        stack[0, 1] = (t // tiles_x) * tile
+        stack[0, 2] = min(stack[0, 0] + tile, width) - 1
+        stack[0, 3] = min(stack[0, 1] + tile, rows) - 1
+        top = 1
+        computed = 0
+        while top > 0:
+            top -= 1
+            x0, y0, x1, y1 = stack[top, 0], stack[top, 1], stack[top, 2], stack[top, 3]
+
+            # Border pixels, skipping the ones a neighbouring rectangle already computed
+            first = -2
+            uniform = True
+            for k in range(2 * (x1 - x0 + 1) + 2 * max(y1 - y0 - 1, 0)):
+                if k <= x1 - x0:
+                    x, y = x0 + k, y0
+                elif k <= 2 * (x1 - x0) + 1:
+                    x, y = x0 + k - (x1 - x0 + 1), y1
+                else:
+                    side = k - 2 * (x1 - x0 + 1)
+                    x = x0 if side % 2 == 0 else x1
+                    y = y0 + 1 + side // 2
+                if counts[y, x] < 0:
+                    counts[y, x] = pixel_escape_count(julia, p_real, p_imag, scale, width, height, x, y, max_iterations)
+                    computed += 1
+                if first == -2:
+                    first = counts[y, x]
+                elif counts[y, x] != first:
+                    uniform = False
+
+            if x1 - x0 < 2 or y1 - y0 < 2:
+                continue
+            if uniform:
+                for y in range(y0 + 1, y1):
+                    for x in range(x0 + 1, x1):
+                        counts[y, x] = first
+            elif x1 - x0 <= min_size or y1 - y0 <= min_size:
+                for y in range(y0 + 1, y1):
+                    for x in range(x0 + 1, x1):
+                        counts[y, x] = pixel_escape_count(julia, p_real, p_imag, scale, width, height, x, y, max_iterations)
+                        computed += 1
+            else:
+                # Quarters share their dividing lines, which are iterated only once
+                mx = (x0 + x1) // 2
+                my = (y0 + y1) // 2
+                for qx0, qy0, qx1, qy1 in ((x0, y0, mx, my), (mx, y0, x1, my), (x0, my, mx, y1), (mx, my, x1, y1)):
+                    stack[top, 0] = qx0
+                    stack[top, 1] = qy0
+                    stack[top, 2] = qx1
+                    stack[top, 3] = qy1
+                    top += 1
+        iterated[t] = computed
+
+
+# Escape counts of a frame with rectangle subdivision
+def mariani_silver_iterations(formula: str, param: complex, scale: float, width: int, height: int, max_iterations: int,
+                              tile: int = 64, min_size: int = 4, stats: dict = None, symmetric: bool = True):
+    """
+    Returns the int32 (height, width) escape counts of a Mandelbrot frame (param = center)
+    or of a Julia set (param = c) using Mariani-Silver subdivision.
+    Symmetric views (see view_symmetry) are subdivided over the upper half only and mirrored.
+    If a stats dict is passed, the number of iterated pixels is added to stats["iterated_pixels"].
+    """
+    if formula not in FORMULAS:
+        raise ValueError(f"Unknown formula '{formula}', expected one of {FORMULAS}")
+    symmetry = view_symmetry(formula, param) if symmetric else None
+    rows = symmetric_rows(height, symmetry)
+    counts = np.full((height, width), -1, dtype=np.int32)
+    iterated = np.zeros(((width + tile - 1) // tile) * ((rows + tile - 1) // tile), dtype=np.int64)
+    mariani_silver_kernel(formula == "julia", param.real, param.imag, scale, width, height, max_iterations,
+                          tile, min_size, counts[:rows], iterated)
+    if symmetry == "point":
+        mirror_julia_frame(counts, param, scale, max_iterations)
+    else:
+        mirror_frame(counts, symmetry)
+    if stats is not None:
+        # Column 0 of the lower half is iterated directly under point symmetry
+        edge_pixels = height - rows if symmetry == "point" else 0
+        stats["iterated_pixels"] = stats.get("iterated_pixels", 0) + int(iterated.sum()) + edge_pixels
+    return counts
+
+
+# Verification against the brute-force kernels
+def verify_subdivision(formula: str, param: complex, scale: float, width: int, height: int, max_iterations: int, **options):
+    """
+    Renders a frame with subdivision and with the per-pixel CPU kernel and returns a report of
+    mismatched pixels, the largest count difference, the fraction of pixels iterated and the speedup.
+    """
+    stats = {}
+    start = time.perf_counter()
+    counts = mariani_silver_iterations(formula, param, scale, width, height, max_iterations, stats=stats, **options)
+    subdivision_time = time.perf_counter() - start
+    start = time.perf_counter()
+    if formula == "julia":
+        reference = julia_iterations(param, scale, width, height, max_iterations)
+    else:
+        reference = mandelbrot_iterations(param, scale, width, height, max_iterations)
+    brute_force_time = time.perf_counter() - start
+    mismatched = int(np.count_nonzero(counts != reference))
+    return {
+        "mismatched_pixels": mismatched,
+        "mismatch_fraction": mismatched / counts.size,
+        "max_difference": int(np.abs(counts.astype(np.int64) - reference).max()),
+        "iterated_fraction": stats["iterated_pixels"] / counts.size,
+        "speedup": brute_force_time / max(subdivision_time, 1e-9),
+    }
@@ -0,0 +1,263 @@
+import argparse
+import time
+import numpy as np
+from PIL import Image
+
+# Pixels iterated together; the scratch arrays of one chunk (about 90 bytes a pixel, 6 MB) stay in the CPU caches
+CHUNK_PIXELS = 64 * 1024
+
+# Iterations run on the active set between two compactions
+BLOCK_STEPS = 16
+
+# Gradient of the command-line renders (the purple palette of the scripts, interpolated linearly without SciPy)
+GRADIENT_COLORS = [(0, 0, 0), (204, 179, 255), (255, 255, 255), (0, 0, 0)]
+PALETTE_SIZE = 256
+
+
+# Pixel coordinates with the arithmetic of the kernels
+def pixel_axes(center: complex, scale: float, width: int, height: int):
+    """
+    Returns the real coordinate of every column and the imaginary coordinate of every row,
+    computed exactly as mandelbrot_kernel does (center + scale * (x - width / 2), center + scale * (height / 2 - y)).
+    """
+    real_axis = center.real + scale * (np.arange(width) - width / 2)
+    imag_axis = center.imag + scale * (height / 2 - np.arange(height))
+    return real_axis, imag_axis
+
+
+# Reference: the textbook vectorized loop over the whole frame
+def naive_iterations(formula: str, param: complex, scale: float, width: int, height: int, max_iterations: int):
+    """
+    Returns the int32 escape counts of a Mandelbrot frame around 'param' or a Julia frame of c = 'param'.
+    Every iteration runs over every pixel, escaped or not, and allocates its temporaries; this is the baseline
+    NumpyEngine is benchmarked against.
+    """
+    real_axis, imag_axis = pixel_axes(param if formula == "mandelbrot" else 0j, scale, width, height)
+    real, imag = np.meshgrid(real_axis, imag_axis)
+    if formula == "mandelbrot":
+        c_real, c_imag, z_real, z_imag = real, imag, np.zeros_like(real), np.zeros_like(imag)
+    else:
+        c_real, c_imag, z_real, z_imag = param.real, param.imag, real, imag
+    counts = np.zeros((height, width), dtype=np.int32)
+    alive = np.ones((height, width), dtype=bool)
+    with np.errstate(over="ignore", invalid="ignore"):
+        for _ in range(max_iterations):
+            alive &= z_real * z_real + z_imag * z_imag <= 4.0
+            counts += alive
+            z_real, z_imag = z_real * z_real - z_imag * z_imag + c_real, 2.0 * z_real * z_imag + c_imag
+    return counts
+
+
+class NumpyEngine:
+    """
+    Escape counts with NumPy alone, for machines where Numba cannot be used. The frame is processed in chunks of
+    CHUNK_PIXELS pixels. Each chunk runs BLOCK_STEPS iterations at a time over its active pixels only; after every
+    block the escaped pixels scatter their counts into the frame and the survivors are compacted to the front of the
+    arrays, so interior-heavy and mostly-escaped frames both stop paying for finished pixels. Every iteration is a fixed
+    sequence of in-place ufuncs on preallocated scratch arrays (no temporaries), with the operations in the order of
+    mandelbrot_kernel and julia_kernel, so the counts are identical to theirs.
+    It is not a render_backend backend: the animation scripts still need Numba, and only the command line below
+    (python numpy_engine.py) runs without it.
+    """
+
+    def __init__(self, chunk_pixels: int = CHUNK_PIXELS, block_steps: int = BLOCK_STEPS):
+        self.chunk_pixels = chunk_pixels
+        self.block_steps = block_steps
+        self.scratch = {name: np.empty(chunk_pixels) for name in
+                        ("z_real", "z_imag", "c_real", "c_imag", "square_real", "square_imag", "product", "spare")}
+        self.alive = np.empty(chunk_pixels, dtype=bool)
+        self.inside = np.empty(chunk_pixels, dtype=bool)
+        self.count = np.empty(chunk_pixels, dtype=np.int32)
+        self.spare_count = np.empty(chunk_pixels, dtype=np.int32)
+        self.index = np.empty(chunk_pixels, dtype=np.int64)
+        self.spare_index = np.empty(chunk_pixels, dtype=np.int64)
+        self.pixel_iterations = 0
+        self.naive_iterations = 0
+
+    def mandelbrot_iterations(self, center: complex, scale: float, width: int, height: int, max_iterations: int, counts=None):
+        """
+        Returns the int32 (height, width) escape counts of a Mandelbrot frame, equal to mandelbrot_kernel's.
+        """
+        return self.iterations("mandelbrot", center, scale, width, height, max_iterations, counts)
+
+    def julia_iterations(self, c: complex, scale: float, width: int, height: int, max_iterations: int, counts=None):
+        """
+        Returns the int32 (height, width) escape counts of a Julia frame centered at the origin, equal to julia_kernel's.
+        """
+        return self.iterations("julia", c, scale, width, height, max_iterations, counts)
+
+    def iterations(self, formula: str, param: complex, scale: float, width: int, height: int, max_iterations: int, counts=None):
+        """
+        Fills 'counts' (allocated when None) chunk by chunk and returns it.
+        """
+        if formula not in ("mandelbrot", "julia"):
+            raise ValueError(f"Unknown formula '{formula}', expected 'mandelbrot' or 'julia'")
+        if counts is None:
+            counts = np.empty((height, width), dtype=np.int32)
+        real_axis, imag_axis = pixel_axes(param if formula == "mandelbrot" else 0j, scale, width, height)
+        flat_counts = counts.reshape(-1)
+        for first in range(0, width * height, self.chunk_pixels):
+            size = min(self.chunk_pixels, width * height - first)
+            index = self.index[:size]
+            index[:] = np.arange(first, first + size)
+            rows, columns = np.divmod(index, width)
+            if formula == "mandelbrot":
+                np.take(real_axis, columns, out=self.scratch["c_real"][:size])
+                np.take(imag_axis, rows, out=self.scratch["c_imag"][:size])
+                self.scratch["z_real"][:size] = 0.0
+                self.scratch["z_imag"][:size] = 0.0
+            else:
+                np.take(real_axis, columns, out=self.scratch["z_real"][:size])
+                np.take(imag_axis, rows, out=self.scratch["z_imag"][:size])
+                self.scratch["c_real"][:size] = param.real
+                self.scratch["c_imag"][:size] = param.imag
+            self.escape_chunk(size, max_iterations, flat_counts)
+        self.naive_iterations += width * height * max_iterations
+        return counts
+
+    def escape_chunk(self, size: int, max_iterations: int, flat_counts):
+        """
+        Iterates the first 'size' scratch pixels in blocks, compacting the active set after each block,
+        and writes every pixel's count to flat_counts at its index.
+        """
+        scratch = self.scratch
+        self.alive[:size] = True
+        self.count[:size] = 0
+        done = 0
+        with np.errstate(over="ignore", invalid="ignore"):
+            while size and done < max_iterations:
+                steps = min(self.block_steps, max_iterations - done)
+                z_real, z_imag = scratch["z_real"][:size], scratch["z_imag"][:size]
+                c_real, c_imag = scratch["c_real"][:size], scratch["c_imag"][:size]
+                square_real, square_imag = scratch["square_real"][:size], scratch["square_imag"][:size]
+                product, alive, inside, count = scratch["product"][:size], self.alive[:size], self.inside[:size], self.count[:size]
+                for _ in range(steps):
+                    # |z|^2 <= 4 before the step, as in the kernels; escaped pixels keep iterating but stop counting
+                    np.multiply(z_real, z_real, out=square_real)
+                    np.multiply(z_imag, z_imag, out=square_imag)
+                    np.add(square_real, square_imag, out=product)
+                    np.less_equal(product, 4.0, out=inside)
+                    np.logical_and(alive, inside, out=alive)
+                    np.add(count, alive, out=count)
+                    # z_imag = 2 z_real z_imag + c_imag, z_real = z_real^2 - z_imag^2 + c_real
+                    np.multiply(z_real, 2.0, out=product)
+                    np.multiply(product, z_imag, out=z_imag)
+                    np.add(z_imag, c_imag, out=z_imag)
+                    np.subtract(square_real, square_imag, out=z_real)
+                    np.add(z_real, c_real, out=z_real)
+                self.pixel_iterations += size * steps
+                done += steps
+                size = self.compact(size, flat_counts)
+        # Pixels still active reached max_iterations
+        flat_counts[self.index[:size]] = self.count[:size]
+
+    def compact(self, size: int, flat_counts):
+        """
+        Scatters the counts of the escaped pixels and moves the active ones to the front of the scratch arrays.
+        Returns the new active size.
+        """
+        alive = self.alive[:size]
+        survivors = np.flatnonzero(alive)
+        active = len(survivors)
+        if active == size:
+            return size
+        finished = np.flatnonzero(~alive)
+        flat_counts[self.index[finished]] = self.count[finished]
+        for name in ("z_real", "z_imag", "c_real", "c_imag"):
+            np.take(self.scratch[name][:size], survivors, out=self.scratch["spare"][:active])
+            self.scratch[name], self.scratch["spare"] = self.scratch["spare"], self.scratch[name]
+        np.take(self.count[:size], survivors, out=self.spare_count[:active])
+        self.count, self.spare_count = self.spare_count, self.count
+        np.take(self.index[:size], survivors, out=self.spare_index[:active])
+        self.index, self.spare_index = self.spare_index, self.index
+        self.alive[:active] = True
+        return active
+
+    def summary(self):
+        """
+        Returns the pixel iterations run on the active sets against the naive loop's width * height * max_iterations.
+        """
+        if not self.naive_iterations:
+            return "no frames"
+        saved = 1 - self.pixel_iterations / self.naive_iterations
+        return (f"{self.pixel_iterations / 1e9:.2f} G pixel iterations on the active sets vs "
+                f"{self.naive_iterations / 1e9:.2f} G for the naive loop ({saved:.0%} saved)")
+
+
+# Palette and colors without Numba or SciPy
+def gradient_palette(colors=GRADIENT_COLORS, size: int = PALETTE_SIZE):
+    """
+    Returns a (size, 3) uint8 palette running linearly through the given 0-255 RGB colors.
+    """
+    positions = np.linspace(0.0, 1.0, len(colors))
+    samples = np.arange(size) / size
+    channels = [np.interp(samples, positions, [color[channel] for color in colors]) for channel in range(3)]
+    return np.clip(np.stack(channels, axis=1), 0, 255).astype(np.uint8)
+
+
+def colorize(counts, max_iterations: int, palette, interior_color, index_offset: int, out=None):
+    """
+    NumPy version of render_backend.colorize: escaped pixels get palette[(iteration % n + index_offset) % n],
+    pixels that reached max_iterations get interior_color. The image is written to 'out' when it is given.
+    """
+    if out is None:
+        out = np.empty(counts.shape + (3,), dtype=np.uint8)
+    num_colors = palette.shape[0]
+    np.take(palette, (counts % num_colors + index_offset) % num_colors, axis=0, out=out)
+    out[counts >= max_iterations] = interior_color
+    return out
+
+
+def colorize_mandelbrot(counts, max_iterations: int, palette, out=None):
+    """
+    Colors Mandelbrot escape counts like mandelbrot_kernel: palette[iteration % n - 1], black inside the set.
+    """
+    return colorize(counts, max_iterations, palette, (0, 0, 0), -1, out)
+
+
+def colorize_julia(counts, max_iterations: int, palette, out=None):
+    """
+    Colors Julia escape counts like julia_kernel: palette[iteration % n], white inside the set.
+    """
+    return colorize(counts, max_iterations, palette, (255, 255, 255), 0, out)
+
+
+# Command-line still renderer for machines without Numba (imports neither numba nor render_backend)
+def parse_complex(text: str):
+    """
+    Parses 'real,imag' into a complex number.
+    """
+    real, imag = text.split(",")
+    return complex(float(real), float(imag))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Renders a Mandelbrot or Julia still with NumPy alone (no Numba needed).")
+    parser.add_argument("formula", choices=("mandelbrot", "julia"))
+    parser.add_argument("--center", type=parse_complex, default=complex(-0.75, 0.0), help="Mandelbrot view center as real,imag")
+    parser.add_argument("--c", type=parse_complex, default=complex(-0.8, 0.156), help="Julia parameter as real,imag")
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--scale", type=float, help="distance between two pixels (default: the whole set fits the height)")
+    parser.add_argument("--max-iterations", type=int, default=1000)
+    parser.add_argument("--output", help="PNG file (default: numpy_<formula>.png)")
+    args = parser.parse_args()
+
+    scale = args.scale or 3.0 / args.height
+    engine = NumpyEngine()
+    start = time.perf_counter()
+    palette = gradient_palette()
+    if args.formula == "mandelbrot":
+        counts = engine.mandelbrot_iterations(args.center, scale, args.width, args.height, args.max_iterations)
+        image = colorize_mandelbrot(counts, args.max_iterations, palette)
+    else:
+        counts = engine.julia_iterations(args.c, scale, args.width, args.height, args.max_iterations)
+        image = colorize_julia(counts, args.max_iterations, palette)
+    seconds = time.perf_counter() - start
+    output = args.output or f"numpy_{args.formula}.png"
+    Image.fromarray(image).save(output)
+    print(f"Wrote {output} in {seconds:.2f} s ({args.width * args.height / seconds / 1e6:.1f} Mpixel/s); {engine.summary()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,484 @@
+import math
+from decimal import Decimal, localcontext
+import numpy as np
+from numba import cuda, njit, prange, parallel_chunksize
+from render_backend import ROW_CHUNK, mandelbrot_iterations, julia_iterations
+
+# Arithmetic tiers from cheapest to most precise
+PRECISION_TIERS = ("float32", "float64", "double-double")
+
+# Unit roundoff of every tier (double-double keeps two float64 significands, about 32 decimal digits)
+TIER_EPSILON = {"float32": 2.0**-24, "float64": 2.0**-53, "double-double": 2.0**-104}
+
+# Pixel spacing a tier must resolve, in units of its rounding error at the frame's coordinates times max_iterations**2:
+# the error of an orbit that escapes late grows about with the square of its length, so the tiers give way sooner
+# as the iteration count grows (at 6000 iterations float32 is never used and float64 gives way around 3e-8;
+# at 100 iterations float64 reaches about 1e-11)
+PRECISION_MARGIN = 4
+
+# Fraction of pixels whose escape count may change one tier up before a validated frame counts as failed
+VALIDATION_TOLERANCE = 0.001
+
+# Pixels of a double-double frame checked against arbitrary-precision Decimal iteration (there is no faster tier above it)
+VALIDATION_SAMPLES = 256
+
+# Decimal digits of the validation reference beyond what the pixel spacing needs
+GUARD_DIGITS = 20
+
+# Views of the scripts that 'python precision_tiers.py' validates: (name, formula, param, pixel scale, max_iterations).
+# The mandelbrot_zoom.py path from its first frame to perturbation_scale, around the float64/double-double boundary,
+# and the view of mandelbrot_increase_iterations_0.py in a float32 frame (up to about 45 iterations) and later ones
+ZOOM_CENTER = ("-1.7891690186048231066744683411888387638173618368159070155822017397181006156270275749142369245820396054",
+               "-0.0000003393685157671825660282302661468127283482188945938569013974696942388736569110136147219176174266")
+CHECKED_VIEWS = tuple(("mandelbrot_zoom", "mandelbrot", ZOOM_CENTER, scale, 6000)
+                      for scale in (1e-3, 1e-4, 1e-5, 1e-6, 1e-7, 3e-8, 1e-8, 1e-10, 1e-12)) + (
+    ("mandelbrot_increase_iterations_0", "mandelbrot", 0j, 1e-3, 40),
+    ("mandelbrot_increase_iterations_0", "mandelbrot", 0j, 1e-3, 100),
+    ("mandelbrot_increase_iterations_0", "mandelbrot", 0j, 1e-3, 3000),
+)
+
+# Frame size of the checked views, which the tier is chosen for, and the central crop that is validated in that tier
+CHECK_FRAME_SIZE = (7680, 4320)
+CHECK_SIZE = (960, 540)
+
+
+# Decimal text -> double-double
+def split_decimal(value):
+    """
+    Returns (high, low) float64 parts whose sum is 'value' (a number or decimal text) to about 32 significant digits.
+    """
+    value = Decimal(value) if isinstance(value, str) else Decimal(float(value))
+    high = float(value)
+    return high, float(value - Decimal(high))
+
+
+# Tier selection
+def precision_tier(scale: float, width: int, height: int, max_iterations: int, center: complex = 0j, c: complex = None,
+                   margin: float = PRECISION_MARGIN):
+    """
+    Returns the cheapest tier whose rounding error at the frame's coordinates, times 'margin' * max_iterations**2,
+    stays below the pixel scale. The coordinates reach |center| plus half the frame; an orbit stops at |z| = 2,
+    and a Julia orbit reaches about |c|. Raises ValueError below the double-double range, where the perturbation
+    engine takes over.
+    """
+    magnitude = max(abs(center.real), abs(center.imag)) + scale * max(width, height) / 2
+    if c is not None:
+        magnitude = max(magnitude, abs(c.real), abs(c.imag))
+    magnitude = min(magnitude, 2.0)
+    for tier in PRECISION_TIERS:
+        if TIER_EPSILON[tier] * magnitude * margin * max_iterations**2 <= scale:
+            return tier
+    raise ValueError(f"Scale {scale:g} is below the double-double range; use perturbation.PerturbationRenderer")
+
+
+# CPU kernel for Mandelbrot escape counts in the precision of the axis arrays (float32), one row per parallel iteration
+@njit(parallel=True, cache=True)
+def mandelbrot_axes_kernel_cpu(real_axis, imag_axis, bailout, max_iterations, counts):
+    """
+    Iterates c = real_axis[x] + i imag_axis[y] entirely in the dtype of the axes; bailout (4) is passed in that dtype
+    and 2 z_real z_imag is formed as a sum, so no float64 constant widens the arithmetic.
+    """
+    for y in prange(counts.shape[0]):
+        c_imag = imag_axis[y]
+        for x in range(real_axis.shape[0]):
+            c_real = real_axis[x]
+            z_real = c_real - c_real
+            z_imag = z_real
+            iteration = 0
+            while z_real * z_real + z_imag * z_imag <= bailout and iteration < max_iterations:
+                z_real_imag = z_real * z_imag
+                z_real = z_real * z_real - z_imag * z_imag + c_real
+                z_imag = z_real_imag + z_real_imag + c_imag
+                iteration += 1
+            counts[y, x] = iteration
+
+
+# CPU kernel for Julia escape counts in the precision of the axis arrays (float32), one row per parallel iteration
+@njit(parallel=True, cache=True)
+def julia_axes_kernel_cpu(real_axis, imag_axis, c_real, c_imag, bailout, max_iterations, counts):
+    """
+    Julia version of mandelbrot_axes_kernel_cpu: z starts at real_axis[x] + i imag_axis[y], c is passed in the axes' dtype.
+    """
+    for y in prange(counts.shape[0]):
+        for x in range(real_axis.shape[0]):
+            z_real = real_axis[x]
+            z_imag = imag_axis[y]
+            iteration = 0
+            while z_real * z_real + z_imag * z_imag <= bailout and iteration < max_iterations:
+                z_real_imag = z_real * z_imag
+                z_real = z_real * z_real - z_imag * z_imag + c_real
+                z_imag = z_real_imag + z_real_imag + c_imag
+                iteration += 1
+            counts[y, x] = iteration
+
+
+# GPU kernel for Mandelbrot escape counts in the precision of the axis arrays
+@cuda.jit
+def mandelbrot_axes_kernel(real_axis, imag_axis, bailout, max_iterations, counts):
+    """
+    Same per-pixel work as mandelbrot_axes_kernel_cpu; float32 runs at the full single-precision rate of the GPU.
+    """
+    x, y = cuda.grid(2)
+    if x < real_axis.shape[0] and y < counts.shape[0]:
+        c_real = real_axis[x]
+        c_imag = imag_axis[y]
+        z_real = c_real - c_real
+        z_imag = z_real
+        iteration = 0
+        while z_real * z_real + z_imag * z_imag <= bailout and iteration < max_iterations:
+            z_real_imag = z_real * z_imag
+            z_real = z_real * z_real - z_imag * z_imag + c_real
+            z_imag = z_real_imag + z_real_imag + c_imag
+            iteration += 1
+        counts[y, x] = iteration
+
+
+# GPU kernel for Julia escape counts in the precision of the axis arrays
+@cuda.jit
+def julia_axes_kernel(real_axis, imag_axis, c_real, c_imag, bailout, max_iterations, counts):
+    """
+    Same per-pixel work as julia_axes_kernel_cpu.
+    """
+    x, y = cuda.grid(2)
+    if x < real_axis.shape[0] and y < counts.shape[0]:
+        z_real = real_axis[x]
+        z_imag = imag_axis[y]
+        iteration = 0
+        while z_real * z_real + z_imag * z_imag <= bailout and iteration < max_iterations:
+            z_real_imag = z_real * z_imag
+            z_real = z_real * z_real - z_imag * z_imag + c_real
+            z_imag = z_real_imag + z_real_imag + c_imag
+            iteration += 1
+        counts[y, x] = iteration
+
+
+# Double-double arithmetic: a value is an unevaluated sum high + low of two float64 with |low| <= ulp(high) / 2
+# (jit functions, which the CUDA kernels can call as device functions too)
+@njit(cache=True)
+def two_sum(a, b):
+    """
+    Returns (s, e) with s = fl(a + b) and s + e = a + b exactly (Knuth).
+    """
+    s = a + b
+    v = s - a
+    return s, (a - (s - v)) + (b - v)
+
+
+@njit(cache=True)
+def quick_two_sum(a, b):
+    """
+    two_sum for |a| >= |b|.
+    """
+    s = a + b
+    return s, b - (s - a)
+
+
+@njit(cache=True)
+def two_product(a, b):
+    """
+    Returns (p, e) with p = fl(a * b) and p + e = a * b exactly (Dekker's splitting, no FMA needed).
+    """
+    p = a * b
+    t = 134217729.0 * a
+    a_high = t - (t - a)
+    a_low = a - a_high
+    t = 134217729.0 * b
+    b_high = t - (t - b)
+    b_low = b - b_high
+    return p, ((a_high * b_high - p) + a_high * b_low + a_low * b_high) + a_low * b_low
+
+
+@njit(cache=True)
+def dd_add(a_high, a_low, b_high, b_low):
+    """
+    Double-double sum.
+    """
+    s, e = two_sum(a_high, b_high)
+    t, f = two_sum(a_low, b_low)
+    s, e = quick_two_sum(s, e + t)
+    return quick_two_sum(s, e + f)
+
+
+@njit(cache=True)
+def dd_multiply(a_high, a_low, b_high, b_low):
+    """
+    Double-double product.
+    """
+    p, e = two_product(a_high, b_high)
+    return quick_two_sum(p, e + (a_high * b_low + a_low * b_high))
+
+
+# Escape loop in double-double, compiled for both the CPU and the GPU kernels below
+def escape_double_double(z_real_high, z_real_low, z_imag_high, z_imag_low, c_real_high, c_real_low, c_imag_high, c_imag_low,
+                         max_iterations):
+    """
+    Returns the escape count of z -> z^2 + c from the given z; the Mandelbrot kernels start at z = 0.
+    The bailout test uses the high parts only, which decides |z|^2 <= 4 exactly enough for the count.
+    """
+    iteration = 0
+    while iteration < max_iterations:
+        real_square_high, real_square_low = dd_multiply(z_real_high, z_real_low, z_real_high, z_real_low)
+        imag_square_high, imag_square_low = dd_multiply(z_imag_high, z_imag_low, z_imag_high, z_imag_low)
+        if real_square_high + imag_square_high > 4.0:
+            break
+        product_high, product_low = dd_multiply(z_real_high, z_real_low, z_imag_high, z_imag_low)
+        z_real_high, z_real_low = dd_add(real_square_high, real_square_low, -imag_square_high, -imag_square_low)
+        z_real_high, z_real_low = dd_add(z_real_high, z_real_low, c_real_high, c_real_low)
+        z_imag_high, z_imag_low = dd_add(2.0 * product_high, 2.0 * product_low, c_imag_high, c_imag_low)
+        iteration += 1
+    return iteration
+
+
+escape_double_double_cpu = njit(cache=True)(escape_double_double)
+escape_double_double_gpu = cuda.jit(device=True)(escape_double_double)
+
+
+# CPU kernel for Mandelbrot escape counts in double-double, one row per parallel iteration
+@njit(parallel=True, cache=True)
+def mandelbrot_double_double_kernel_cpu(center_real_high, center_real_low, center_imag_high, center_imag_low, scale,
+                                        width, height, max_iterations, counts):
+    """
+    The pixel offset scale * (x - width / 2) is exact enough in float64 (it is relative to the pixel spacing);
+    only the sum with the double-double center and the iteration need the extra digits.
+    """
+    for y in prange(counts.shape[0]):
+        c_imag_high, c_imag_low = dd_add(center_imag_high, center_imag_low, scale * (height / 2 - y), 0.0)
+        for x in range(width):
+            c_real_high, c_real_low = dd_add(center_real_high, center_real_low, scale * (x - width / 2), 0.0)
+            counts[y, x] = escape_double_double_cpu(0.0, 0.0, 0.0, 0.0, c_real_high, c_real_low, c_imag_high, c_imag_low,
+                                                    max_iterations)
+
+
+# CPU kernel for Julia escape counts in double-double, one row per parallel iteration
+@njit(parallel=True, cache=True)
+def julia_double_double_kernel_cpu(c_real_high, c_real_low, c_imag_high, c_imag_low, scale, width, height, max_iterations, counts):
+    """
+    Julia version of mandelbrot_double_double_kernel_cpu for a frame centered at the origin.
+    """
+    for y in prange(counts.shape[0]):
+        for x in range(width):
+            counts[y, x] = escape_double_double_cpu(scale * (x - width / 2), 0.0, scale * (height / 2 - y), 0.0,
+                                                    c_real_high, c_real_low, c_imag_high, c_imag_low, max_iterations)
+
+
+# GPU kernel for Mandelbrot escape counts in double-double
+@cuda.jit
+def mandelbrot_double_double_kernel(center_real_high, center_real_low, center_imag_high, center_imag_low, scale,
+                                    width, height, max_iterations, counts):
+    """
+    Same per-pixel work as mandelbrot_double_double_kernel_cpu.
+    """
+    x, y = cuda.grid(2)
+    if x < width and y < counts.shape[0]:
+        c_real_high, c_real_low = dd_add(center_real_high, center_real_low, scale * (x - width / 2), 0.0)
+        c_imag_high, c_imag_low = dd_add(center_imag_high, center_imag_low, scale * (height / 2 - y), 0.0)
+        counts[y, x] = escape_double_double_gpu(0.0, 0.0, 0.0, 0.0, c_real_high, c_real_low, c_imag_high, c_imag_low,
+                                                max_iterations)
+
+
+# GPU kernel for Julia escape counts in double-double
+@cuda.jit
+def julia_double_double_kernel(c_real_high, c_real_low, c_imag_high, c_imag_low, scale, width, height, max_iterations, counts):
+    """
+    Same per-pixel work as julia_double_double_kernel_cpu.
+    """
+    x, y = cuda.grid(2)
+    if x < width and y < counts.shape[0]:
+        counts[y, x] = escape_double_double_gpu(scale * (x - width / 2), 0.0, scale * (height / 2 - y), 0.0,
+                                                c_real_high, c_real_low, c_imag_high, c_imag_low, max_iterations)
+
+
+# Escape counts of a frame in a given or automatically chosen tier
+def tier_iterations(formula: str, param, scale: float, width: int, height: int, max_iterations: int, tier: str = "auto",
+                    backend: str = "cpu", margin: float = PRECISION_MARGIN):
+    """
+    Returns (counts, tier) for a Mandelbrot frame around 'param' or a Julia frame of c = 'param' centered at the origin.
+    'param' is a complex, or a (real, imag) pair of decimal strings whose digits beyond float64 the double-double tier
+    keeps. The float64 tier is the regular mandelbrot_iterations/julia_iterations.
+    """
+    if formula not in ("mandelbrot", "julia"):
+        raise ValueError(f"Unknown formula '{formula}', expected 'mandelbrot' or 'julia'")
+    real, imag = (param.real, param.imag) if isinstance(param, complex) else param
+    (real_high, real_low), (imag_high, imag_low) = split_decimal(real), split_decimal(imag)
+    value = complex(real_high, imag_high)
+    if tier == "auto":
+        if formula == "mandelbrot":
+            tier = precision_tier(scale, width, height, max_iterations, center=value, margin=margin)
+        else:
+            tier = precision_tier(scale, width, height, max_iterations, c=value, margin=margin)
+    if tier not in PRECISION_TIERS:
+        raise ValueError(f"Unknown precision tier '{tier}', expected 'auto' or one of {PRECISION_TIERS}")
+
+    if tier == "float64":
+        if formula == "mandelbrot":
+            return mandelbrot_iterations(value, scale, width, height, max_iterations, backend=backend), tier
+        return julia_iterations(value, scale, width, height, max_iterations, backend=backend), tier
+
+    counts = np.empty((height, width), dtype=np.int32)
+    blockdim = (16, 16)
+    griddim = (width // blockdim[0] + 1, height // blockdim[1] + 1)
+    if tier == "float32":
+        # Pixel coordinates are formed in float64 and rounded once, so only the iteration runs in float32
+        center = value if formula == "mandelbrot" else 0j
+        real_axis = (center.real + scale * (np.arange(width) - width / 2)).astype(np.float32)
+        imag_axis = (center.imag + scale * (height / 2 - np.arange(height))).astype(np.float32)
+        bailout = np.float32(4.0)
+        if backend == "cuda":
+            if formula == "mandelbrot":
+                mandelbrot_axes_kernel[griddim, blockdim](real_axis, imag_axis, bailout, max_iterations, counts)
+            else:
+                julia_axes_kernel[griddim, blockdim](real_axis, imag_axis, np.float32(value.real), np.float32(value.imag),
+                                                     bailout, max_iterations, counts)
+        else:
+            with parallel_chunksize(ROW_CHUNK):
+                if formula == "mandelbrot":
+                    mandelbrot_axes_kernel_cpu(real_axis, imag_axis, bailout, max_iterations, counts)
+                else:
+                    julia_axes_kernel_cpu(real_axis, imag_axis, np.float32(value.real), np.float32(value.imag),
+                                          bailout, max_iterations, counts)
+    elif backend == "cuda":
+        kernel = mandelbrot_double_double_kernel if formula == "mandelbrot" else julia_double_double_kernel
+        kernel[griddim, blockdim](real_high, real_low, imag_high, imag_low, scale, width, height, max_iterations, counts)
+    else:
+        kernel = mandelbrot_double_double_kernel_cpu if formula == "mandelbrot" else julia_double_double_kernel_cpu
+        with parallel_chunksize(ROW_CHUNK):
+            kernel(real_high, real_low, imag_high, imag_low, scale, width, height, max_iterations, counts)
+    return counts, tier
+
+
+# Arbitrary-precision reference for the double-double tier
+def decimal_iterations(formula: str, param, scale: float, width: int, height: int, max_iterations: int, pixels):
+    """
+    Returns the escape counts of the given (y, x) pixels, iterated in Decimal arithmetic with enough digits for the scale.
+    """
+    real, imag = (repr(param.real), repr(param.imag)) if isinstance(param, complex) else param
+    counts = np.empty(len(pixels), dtype=np.int32)
+    with localcontext() as context:
+        context.prec = max(int(-math.log10(scale)), 0) + GUARD_DIGITS
+        param_real, param_imag, step = Decimal(real), Decimal(imag), Decimal(scale)
+        for index, (y, x) in enumerate(pixels):
+            offset_real, offset_imag = step * (Decimal(int(x)) - Decimal(width) / 2), step * (Decimal(height) / 2 - Decimal(int(y)))
+            if formula == "mandelbrot":
+                c_real, c_imag, z_real, z_imag = param_real + offset_real, param_imag + offset_imag, Decimal(0), Decimal(0)
+            else:
+                c_real, c_imag, z_real, z_imag = param_real, param_imag, offset_real, offset_imag
+            iteration = 0
+            while z_real * z_real + z_imag * z_imag <= 4 and iteration < max_iterations:
+                z_real, z_imag = z_real * z_real - z_imag * z_imag + c_real, 2 * z_real * z_imag + c_imag
+                iteration += 1
+            counts[index] = iteration
+    return counts
+
+
+# Validation mode
+def validate_tier(formula: str, param, scale: float, width: int, height: int, max_iterations: int, tier: str = "auto",
+                  backend: str = "cpu", margin: float = PRECISION_MARGIN):
+    """
+    Renders a frame in its tier and in the next tier up and returns (counts, reference counts, result), where result
+    holds both tiers, the fraction of pixels whose escape count differs, the largest difference and whether the fraction
+    is within VALIDATION_TOLERANCE. Double-double frames are checked on a grid of about VALIDATION_SAMPLES pixels
+    against Decimal iteration, and their reference counts are None.
+    """
+    counts, tier = tier_iterations(formula, param, scale, width, height, max_iterations, tier, backend, margin)
+    if tier != "double-double":
+        reference_tier = PRECISION_TIERS[PRECISION_TIERS.index(tier) + 1]
+        reference, _ = tier_iterations(formula, param, scale, width, height, max_iterations, reference_tier, backend, margin)
+        differences = np.abs(counts.astype(np.int64) - reference)
+    else:
+        reference_tier = "decimal"
+        reference = None
+        step = max(1, int(math.sqrt(width * height / VALIDATION_SAMPLES)))
+        pixels = [(y, x) for y in range(step // 2, height, step) for x in range(step // 2, width, step)]
+        samples = decimal_iterations(formula, param, scale, width, height, max_iterations, pixels)
+        differences = np.abs(counts[tuple(np.array(pixels).T)].astype(np.int64) - samples)
+    mismatched = float(np.count_nonzero(differences)) / differences.size
+    result = {"tier": tier, "reference": reference_tier, "mismatched": mismatched, "max_difference": int(differences.max()),
+              "passed": mismatched <= VALIDATION_TOLERANCE}
+    return counts, reference, result
+
+
+class PrecisionTiers:
+    """
+    Per-frame choice of the arithmetic for the zoom scripts: shallow frames with few iterations run in float32 (twice
+    the lanes of float64 on SIMD units and many times the float64 rate on consumer GPUs), frames the float64 kernels
+    resolve stay there, and deeper frames use double-double (down to about 1e-23 at 6000 iterations) instead of
+    needing arbitrary precision. The boundaries move to larger scales as max_iterations grows. With 'validate',
+    every frame is also rendered one tier up and the mismatch is recorded; failed frames keep the reference counts
+    where there are any.
+    """
+
+    def __init__(self, formula: str, param, backend: str = "cpu", margin: float = PRECISION_MARGIN, validate: bool = False):
+        self.formula = formula
+        self.param = param
+        self.backend = backend
+        self.margin = margin
+        self.validate = validate
+        self.frames = {tier: 0 for tier in PRECISION_TIERS}
+        self.validations = []
+
+    def tier(self, scale: float, width: int, height: int, max_iterations: int):
+        """
+        Returns the tier a frame will be rendered in (e.g. for its cache key).
+        """
+        real, imag = (self.param.real, self.param.imag) if isinstance(self.param, complex) else self.param
+        value = complex(float(real), float(imag))
+        if self.formula == "mandelbrot":
+            return precision_tier(scale, width, height, max_iterations, center=value, margin=self.margin)
+        return precision_tier(scale, width, height, max_iterations, c=value, margin=self.margin)
+
+    def iterations(self, scale: float, width: int, height: int, max_iterations: int):
+        """
+        Returns the escape counts of a frame in the tier chosen for it.
+        """
+        tier = self.tier(scale, width, height, max_iterations)
+        self.frames[tier] += 1
+        if not self.validate:
+            return tier_iterations(self.formula, self.param, scale, width, height, max_iterations, tier, self.backend,
+                                   self.margin)[0]
+        counts, reference, result = validate_tier(self.formula, self.param, scale, width, height, max_iterations, tier,
+                                                  self.backend, self.margin)
+        self.validations.append(result)
+        if not result["passed"]:
+            print(f"Precision check failed at scale {scale:g}: {result['mismatched']:.3%} of the pixels differ "
+                  f"between {result['tier']} and {result['reference']} (up to {result['max_difference']} iterations)")
+            if reference is not None:
+                return reference
+        return counts
+
+    def summary(self):
+        """
+        Returns the number of frames per tier and, in validation mode, the worst mismatch.
+        """
+        line = ", ".join(f"{count} {tier}" for tier, count in self.frames.items() if count) or "no frames"
+        if self.validations:
+            failed = sum(not result["passed"] for result in self.validations)
+            worst = max(result["mismatched"] for result in self.validations)
+            line += f"; {len(self.validations)} frames validated, {failed} failed, worst mismatch {worst:.3%}"
+        return line
+
+
+# Check of the tier choice on the views of the scripts
+def check_views(views=CHECKED_VIEWS, frame_size=CHECK_FRAME_SIZE, size=CHECK_SIZE, backend: str = "cpu"):
+    """
+    Chooses the tier of every view for a frame of 'frame_size', validates it on a central crop of 'size' and returns
+    the (name, scale, max_iterations, result) of each; a result whose 'passed' is False means PRECISION_MARGIN is
+    too small for that view.
+    """
+    width, height = size
+    reports = []
+    for name, formula, param, scale, max_iterations in views:
+        tiers = PrecisionTiers(formula, param, backend)
+        tier = tiers.tier(scale, frame_size[0], frame_size[1], max_iterations)
+        _, _, result = validate_tier(formula, param, scale, width, height, max_iterations, tier, backend)
+        reports.append((name, scale, max_iterations, result))
+    return reports
+
+
+if __name__ == "__main__":
+    failed = False
+    for name, scale, max_iterations, result in check_views():
+        failed = failed or not result["passed"]
+        print(f"{name}, scale {scale:g}, {max_iterations} iterations: {result['tier']} vs {result['reference']}, "
+              f"{result['mismatched']:.3%} of the pixels differ (up to {result['max_difference']} iterations)"
+              f"{'' if result['passed'] else ' FAILED'}")
+    raise SystemExit(1 if failed else 0)
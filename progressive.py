@@ -0,0 +1,270 @@
+import os
+import time
+import numpy as np
+from numba import cuda, njit, prange, parallel_chunksize
+from PIL import Image
+from render_backend import ROW_CHUNK, colorize_mandelbrot, colorize_julia, megapixels_per_second
+
+# Most pixels in the first pass (about a 240x135 thumbnail) when no first step is given
+FIRST_PASS_PIXELS = 32 * 1024
+
+# Pixels computed between two checks for cancellation
+CHUNK_PIXELS = 1024**2
+
+
+# CPU kernel for the Mandelbrot escape counts on a lattice of pixels, one lattice row per parallel iteration
+@njit(parallel=True, cache=True)
+def mandelbrot_lattice_kernel_cpu(center_real, center_imag, scale, width, height, x_offset, x_step, y_offset, y_step,
+                                  first_row, last_row, max_iterations, counts):
+    """
+    Fills counts[y, x] for x = x_offset + k * x_step and y = y_offset + r * y_step, first_row <= r < last_row,
+    with the arithmetic of mandelbrot_kernel_cpu, so the finished lattice equals the frame rendered in one piece.
+    """
+    for row in prange(first_row, last_row):
+        y = y_offset + row * y_step
+        for x in range(x_offset, width, x_step):
+            c_real = center_real + scale * (x - width / 2)
+            c_imag = center_imag + scale * (height / 2 - y)
+            z_real = 0.0
+            z_imag = 0.0
+            iteration = 0
+            while z_real * z_real + z_imag * z_imag <= 4.0 and iteration < max_iterations:
+                z_real_new = z_real * z_real - z_imag * z_imag + c_real
+                z_imag = 2.0 * z_real * z_imag + c_imag
+                z_real = z_real_new
+                iteration += 1
+            counts[y, x] = iteration
+
+
+# CPU kernel for the Julia escape counts on a lattice of pixels, one lattice row per parallel iteration
+@njit(parallel=True, cache=True)
+def julia_lattice_kernel_cpu(c_real, c_imag, scale, width, height, x_offset, x_step, y_offset, y_step,
+                             first_row, last_row, max_iterations, counts):
+    """
+    Lattice version of julia_kernel_cpu (see mandelbrot_lattice_kernel_cpu).
+    """
+    for row in prange(first_row, last_row):
+        y = y_offset + row * y_step
+        for x in range(x_offset, width, x_step):
+            z_real = scale * (x - width / 2)
+            z_imag = scale * (height / 2 - y)
+            iteration = 0
+            while z_real * z_real + z_imag * z_imag <= 4.0 and iteration < max_iterations:
+                z_real_new = z_real * z_real - z_imag * z_imag + c_real
+                z_imag = 2.0 * z_real * z_imag + c_imag
+                z_real = z_real_new
+                iteration += 1
+            counts[y, x] = iteration
+
+
+# GPU kernel for the Mandelbrot escape counts on a lattice of pixels
+@cuda.jit
+def mandelbrot_lattice_kernel(center_real, center_imag, scale, width, height, x_offset, x_step, y_offset, y_step,
+                              first_row, last_row, max_iterations, counts):
+    """
+    Same per-pixel work as mandelbrot_lattice_kernel_cpu, one thread per lattice point.
+    """
+    column, row = cuda.grid(2)
+    x = x_offset + column * x_step
+    row += first_row
+    y = y_offset + row * y_step
+    if x < width and row < last_row:
+        c_real = center_real + scale * (x - width / 2)
+        c_imag = center_imag + scale * (height / 2 - y)
+        z_real = 0.0
+        z_imag = 0.0
+        iteration = 0
+        while z_real * z_real + z_imag * z_imag <= 4.0 and iteration < max_iterations:
+            z_real_new = z_real * z_real - z_imag * z_imag + c_real
+            z_imag = 2.0 * z_real * z_imag + c_imag
+            z_real = z_real_new
+            iteration += 1
+        counts[y, x] = iteration
+
+
+# GPU kernel for the Julia escape counts on a lattice of pixels
+@cuda.jit
+def julia_lattice_kernel(c_real, c_imag, scale, width, height, x_offset, x_step, y_offset, y_step,
+                         first_row, last_row, max_iterations, counts):
+    """
+    Same per-pixel work as julia_lattice_kernel_cpu, one thread per lattice point.
+    """
+    column, row = cuda.grid(2)
+    x = x_offset + column * x_step
+    row += first_row
+    y = y_offset + row * y_step
+    if x < width and row < last_row:
+        z_real = scale * (x - width / 2)
+        z_imag = scale * (height / 2 - y)
+        iteration = 0
+        while z_real * z_real + z_imag * z_imag <= 4.0 and iteration < max_iterations:
+            z_real_new = z_real * z_real - z_imag * z_imag + c_real
+            z_imag = 2.0 * z_real * z_imag + c_imag
+            z_real = z_real_new
+            iteration += 1
+        counts[y, x] = iteration
+
+
+# Interlacing order
+def first_pass_step(width: int, height: int):
+    """
+    Returns the smallest power-of-two lattice step whose first pass has at most FIRST_PASS_PIXELS pixels.
+    """
+    step = 1
+    while -(-width // step) * -(-height // step) > FIRST_PASS_PIXELS:
+        step *= 2
+    return step
+
+
+def interlaced_passes(first_step: int):
+    """
+    Returns the passes as (x_offset, x_step, y_offset, y_step) lattices, together with the lattice known after each one.
+    The first pass takes every first_step-th pixel in both directions; every later level halves the step, first between
+    the known columns, then on the rows in between (as Adam7), so no pixel is computed twice.
+    """
+    passes = [((0, first_step, 0, first_step), (first_step, first_step))]
+    step = first_step
+    while step > 1:
+        half = step // 2
+        passes.append(((half, step, 0, step), (half, step)))
+        passes.append(((0, half, half, step), (half, half)))
+        step = half
+    return passes
+
+
+class ProgressiveRender:
+    """
+    Coarse-to-fine render of one Mandelbrot ('c' is the view center) or Julia frame. The first pass computes one pixel
+    in first_step x first_step (a thumbnail of about FIRST_PASS_PIXELS by default), a usable preview within a fraction
+    of a second even for an 8K frame; every following pass doubles the resolution in one direction and computes only
+    the pixels no earlier pass has, so the last pass leaves the exact frame of the brute-force kernels. Every pass is handed to on_pass as an image with the unknown
+    pixels filled from the known ones. Work is done in chunks of about CHUNK_PIXELS between checks of 'cancel';
+    a cancelled render keeps its escape counts and run() continues with the first missing chunk.
+    """
+
+    def __init__(self, formula: str, c: complex, scale: float, width: int, height: int, max_iterations: int, palette,
+                 backend: str = "cpu", first_step: int = None):
+        first_step = first_step or first_pass_step(width, height)
+        if formula not in ("mandelbrot", "julia"):
+            raise ValueError(f"Unknown formula '{formula}', expected 'mandelbrot' or 'julia'")
+        if first_step < 1 or first_step & (first_step - 1):
+            raise ValueError(f"first_step must be a power of two, got {first_step}")
+        self.formula = formula
+        self.c = c
+        self.scale = scale
+        self.width = width
+        self.height = height
+        self.max_iterations = max_iterations
+        self.palette = palette
+        self.backend = backend
+        self.passes = interlaced_passes(first_step)
+        self.counts = np.zeros((height, width), dtype=np.int32)
+        self.pass_index = 0
+        self.next_row = 0
+        self.pixels = 0
+        self.seconds = 0.0
+        if backend == "cuda":
+            self.device_counts = cuda.to_device(self.counts)
+            self.kernel = mandelbrot_lattice_kernel if formula == "mandelbrot" else julia_lattice_kernel
+        else:
+            self.kernel = mandelbrot_lattice_kernel_cpu if formula == "mandelbrot" else julia_lattice_kernel_cpu
+
+    @property
+    def finished(self):
+        return self.pass_index == len(self.passes)
+
+    def image(self, pass_index: int = None):
+        """
+        Returns the (height, width, 3) frame as known after the given pass (the last finished one by default):
+        every computed lattice point is colored and repeated over the cell it stands for.
+        """
+        pass_index = self.pass_index - 1 if pass_index is None else pass_index
+        x_step, y_step = self.passes[max(pass_index, 0)][1]
+        known = self.counts[::y_step, ::x_step]
+        colorize = colorize_mandelbrot if self.formula == "mandelbrot" else colorize_julia
+        colors = colorize(np.ascontiguousarray(known), self.max_iterations, self.palette)
+        return np.repeat(np.repeat(colors, y_step, axis=0), x_step, axis=1)[:self.height, :self.width]
+
+    def render_rows(self, lattice, first_row: int, last_row: int):
+        """
+        Computes the lattice rows [first_row, last_row) of a pass.
+        """
+        x_offset, x_step, y_offset, y_step = lattice
+        if self.backend == "cuda":
+            blockdim = (16, 16)
+            columns = (self.width - x_offset + x_step - 1) // x_step
+            griddim = (columns // blockdim[0] + 1, (last_row - first_row) // blockdim[1] + 1)
+            self.kernel[griddim, blockdim](self.c.real, self.c.imag, self.scale, self.width, self.height,
+                                           x_offset, x_step, y_offset, y_step, first_row, last_row,
+                                           self.max_iterations, self.device_counts)
+            cuda.synchronize()
+        else:
+            with parallel_chunksize(ROW_CHUNK):
+                self.kernel(self.c.real, self.c.imag, self.scale, self.width, self.height,
+                            x_offset, x_step, y_offset, y_step, first_row, last_row, self.max_iterations, self.counts)
+
+    def run(self, on_pass=None, cancel=None):
+        """
+        Renders the remaining passes; on_pass(image, pass_number, num_passes) gets the frame after each one.
+        Returns True once the frame is complete, False when 'cancel' (a threading.Event) stopped it first.
+        """
+        while not self.finished:
+            lattice = self.passes[self.pass_index][0]
+            x_offset, x_step, y_offset, y_step = lattice
+            rows = (self.height - y_offset + y_step - 1) // y_step
+            columns = (self.width - x_offset + x_step - 1) // x_step
+            chunk_rows = max(1, CHUNK_PIXELS // max(columns, 1))
+            while self.next_row < rows:
+                if cancel is not None and cancel.is_set():
+                    return False
+                last_row = min(rows, self.next_row + chunk_rows)
+                start = time.perf_counter()
+                self.render_rows(lattice, self.next_row, last_row)
+                self.seconds += time.perf_counter() - start
+                self.pixels += (last_row - self.next_row) * columns
+                self.next_row = last_row
+            if self.backend == "cuda":
+                self.device_counts.copy_to_host(self.counts)
+            self.pass_index += 1
+            self.next_row = 0
+            if on_pass is not None:
+                on_pass(self.image(), self.pass_index, len(self.passes))
+        return True
+
+    def rate(self):
+        """
+        Returns the throughput of the computed pixels in Mpixel/s.
+        """
+        return megapixels_per_second(self.pixels, 1, self.seconds)
+
+
+# Every pass written over the same PNG, e.g. for an image viewer that reloads on change
+def save_pass(filename: str, image):
+    """
+    Saves an intermediate image atomically (temporary file, then rename), so a viewer never reads a partial PNG.
+    """
+    temp_filename = filename + ".tmp"
+    Image.fromarray(image).save(temp_filename, format="PNG", compress_level=1)
+    os.replace(temp_filename, filename)
+
+
+def render_progressive(formula: str, c: complex, scale: float, width: int, height: int, max_iterations: int, palette,
+                       filename: str, backend: str = "cpu"):
+    """
+    Renders a frame coarse-to-fine into 'filename', rewriting it after every pass and printing the time to each pass.
+    Ctrl+C stops the refinement and leaves the last finished pass in the file. Returns the render throughput in Mpixel/s.
+    """
+    start = time.perf_counter()
+    render = ProgressiveRender(formula, c, scale, width, height, max_iterations, palette, backend=backend)
+
+    def on_pass(image, pass_number, num_passes):
+        save_pass(filename, image)
+        x_step, y_step = render.passes[pass_number - 1][1]
+        print(f"Pass {pass_number}/{num_passes} ({width // x_step}x{height // y_step}) written to {filename} "
+              f"after {time.perf_counter() - start:.2f} s")
+
+    try:
+        render.run(on_pass)
+    except KeyboardInterrupt:
+        print(f"Refinement stopped after pass {render.pass_index}/{len(render.passes)}; {filename} holds the last pass")
+    return render.rate()
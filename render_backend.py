@@ -0,0 +1,483 @@
+import os
+import numpy as np
+from numba import cuda, njit, prange, parallel_chunksize
+
+# Names accepted for the render backend
+BACKENDS = ("auto", "cuda", "cpu")
+
+# Rows handed to a CPU thread at a time; small chunks keep interior-heavy bands from idling other cores
+ROW_CHUNK = 4
+
+# Interior tests, in the order of their counters in an interior_stats array
+INTERIOR_TESTS = ("cardioid", "bulb", "periodicity")
+
+# Largest distance at which a repeated orbit point counts as a cycle (shrunk further with the pixel scale)
+PERIODICITY_EPSILON = 1e-12
+
+
+# Backend selection
+def select_backend(backend: str = "auto"):
+    """
+    Resolves the render backend to use for this run.
+    The FRACTAL_BACKEND environment variable overrides the value set in a script,
+    and "auto" picks CUDA when a GPU is available and the multi-core CPU engine otherwise.
+    """
+    backend = os.environ.get("FRACTAL_BACKEND", backend).lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}', expected one of {BACKENDS}")
+    if backend == "auto":
+        return "cuda" if cuda.is_available() else "cpu"
+    if backend == "cuda" and not cuda.is_available():
+        raise RuntimeError("CUDA backend requested but no CUDA device is available")
+    return backend
+
+
+# CPU kernel for the Mandelbrot set, one row per parallel iteration
+@njit(parallel=True, cache=True)
+def mandelbrot_kernel_cpu(center_real, center_imag, scale, width, height, max_iterations, counts):
+    """
+    Computes the escape count of every pixel with the same arithmetic as the CUDA mandelbrot_kernel.
+    Pixels that reach max_iterations are stored as max_iterations. Only the first counts.shape[0] rows are computed.
+    """
+    for y in prange(counts.shape[0]):
+        for x in range(width):
+            c_real = center_real + scale * (x - width / 2)
+            c_imag = center_imag + scale * (height / 2 - y)
+            z_real = 0.0
+            z_imag = 0.0
+            iteration = 0
+            while z_real * z_real + z_imag * z_imag <= 4.0 and iteration < max_iterations:
+                z_real_new = z_real * z_real - z_imag * z_imag + c_real
+                z_imag = 2.0 * z_real * z_imag + c_imag
+                z_real = z_real_new
+                iteration += 1
+            counts[y, x] = iteration
+
+
+# CPU kernel for Julia sets, one row per parallel iteration
+@njit(parallel=True, cache=True)
+def julia_kernel_cpu(c_real, c_imag, scale, width, height, max_iterations, counts):
+    """
+    Computes the escape count of every pixel with the same arithmetic as the CUDA julia_kernel.
+    Pixels that reach max_iterations are stored as max_iterations. Only the first counts.shape[0] rows are computed.
+    """
+    for y in prange(counts.shape[0]):
+        for x in range(width):
+            z_real = scale * (x - width / 2)
+            z_imag = scale * (height / 2 - y)
+            iteration = 0
+            while z_real * z_real + z_imag * z_imag <= 4.0 and iteration < max_iterations:
+                z_real_new = z_real * z_real - z_imag * z_imag + c_real
+                z_imag = 2.0 * z_real * z_imag + c_imag
+                z_real = z_real_new
+                iteration += 1
+            counts[y, x] = iteration
+
+
+
+# GPU kernel writing raw Mandelbrot escape counts instead of colors
+@cuda.jit
+def mandelbrot_counts_kernel(center_real, center_imag, scale, width, height, max_iterations, counts):
+    """
+    Same iteration as mandelbrot_kernel, but stores the escape count of each pixel of the first counts.shape[0] rows.
+    """
+    x, y = cuda.grid(2)
+    if x < width and y < counts.shape[0]:
+        c_real = center_real + scale * (x - width / 2)
+        c_imag = center_imag + scale * (height / 2 - y)
+        z_real = 0.0
+        z_imag = 0.0
+        iteration = 0
+        while z_real * z_real + z_imag * z_imag <= 4.0 and iteration < max_iterations:
+            z_real_new = z_real * z_real - z_imag * z_imag + c_real
+            z_imag = 2.0 * z_real * z_imag + c_imag
+            z_real = z_real_new
+            iteration += 1
+        counts[y, x] = iteration
+
+
+# GPU kernel writing raw Julia escape counts instead of colors
+@cuda.jit
+def julia_counts_kernel(c_real, c_imag, scale, width, height, max_iterations, counts):
+    """
+    Same iteration as julia_kernel, but stores the escape count of each pixel of the first counts.shape[0] rows.
+    """
+    x, y = cuda.grid(2)
+    if x < width and y < counts.shape[0]:
+        z_real = scale * (x - width / 2)
+        z_imag = scale * (height / 2 - y)
+        iteration = 0
+        while z_real * z_real + z_imag * z_imag <= 4.0 and iteration < max_iterations:
+            z_real_new = z_real * z_real - z_imag * z_imag + c_real
+            z_imag = 2.0 * z_real * z_imag + c_imag
+            z_real = z_real_new
+            iteration += 1
+        counts[y, x] = iteration
+
+
+
+# Escape loop with interior early-outs, compiled for both the CPU and the GPU kernels below
+def escape_with_interior_checks(c_real, c_imag, max_iterations, epsilon):
+    """
+    Returns (iteration, test) for one point. Points in the main cardioid or the period-2 bulb return
+    (max_iterations, 0 or 1) without iterating; orbits that revisit a point within epsilon (Brent's
+    cycle detection with doubling check intervals) return (max_iterations, 2). Otherwise test is -1.
+    """
+    x = c_real - 0.25
+    q = x * x + c_imag * c_imag
+    if q * (q + x) <= 0.25 * c_imag * c_imag:
+        return max_iterations, 0
+    if (c_real + 1.0) * (c_real + 1.0) + c_imag * c_imag <= 0.0625:
+        return max_iterations, 1
+    z_real = 0.0
+    z_imag = 0.0
+    check_real = 0.0
+    check_imag = 0.0
+    check_interval = 1
+    steps = 0
+    iteration = 0
+    epsilon_squared = epsilon * epsilon
+    while z_real * z_real + z_imag * z_imag <= 4.0 and iteration < max_iterations:
+        z_real_new = z_real * z_real - z_imag * z_imag + c_real
+        z_imag = 2.0 * z_real * z_imag + c_imag
+        z_real = z_real_new
+        iteration += 1
+        d_real = z_real - check_real
+        d_imag = z_imag - check_imag
+        if d_real * d_real + d_imag * d_imag <= epsilon_squared:
+            return max_iterations, 2
+        steps += 1
+        if steps == check_interval:
+            check_real = z_real
+            check_imag = z_imag
+            check_interval *= 2
+            steps = 0
+    return iteration, -1
+
+
+escape_with_interior_checks_cpu = njit(cache=True)(escape_with_interior_checks)
+escape_with_interior_checks_gpu = cuda.jit(device=True)(escape_with_interior_checks)
+
+
+# CPU kernel for the Mandelbrot set with interior early-outs
+@njit(parallel=True, cache=True)
+def mandelbrot_interior_kernel_cpu(center_real, center_imag, scale, width, height, max_iterations, epsilon, counts, resolved):
+    """
+    Like mandelbrot_kernel_cpu, but resolves interior points with the cardioid, bulb and periodicity tests.
+    resolved[y, t] counts the pixels of row y that test t settled.
+    """
+    for y in prange(counts.shape[0]):
+        for x in range(width):
+            c_real = center_real + scale * (x - width / 2)
+            c_imag = center_imag + scale * (height / 2 - y)
+            iteration, test = escape_with_interior_checks_cpu(c_real, c_imag, max_iterations, epsilon)
+            counts[y, x] = iteration
+            if test >= 0:
+                resolved[y, test] += 1
+
+
+# GPU kernel for Mandelbrot escape counts with interior early-outs
+@cuda.jit
+def mandelbrot_interior_counts_kernel(center_real, center_imag, scale, width, height, max_iterations, epsilon, counts, resolved):
+    """
+    Like mandelbrot_counts_kernel, but resolves interior points with the cardioid, bulb and periodicity tests.
+    resolved[t] counts the pixels that test t settled.
+    """
+    x, y = cuda.grid(2)
+    if x < width and y < counts.shape[0]:
+        c_real = center_real + scale * (x - width / 2)
+        c_imag = center_imag + scale * (height / 2 - y)
+        iteration, test = escape_with_interior_checks_gpu(c_real, c_imag, max_iterations, epsilon)
+        counts[y, x] = iteration
+        if test >= 0:
+            cuda.atomic.add(resolved, test, 1)
+
+
+# Symmetry of a view, detected from its parameters
+def view_symmetry(formula: str, center: complex = 0j):
+    """
+    Returns "point" for Julia sets (z -> -z), "axis" for Mandelbrot views centered exactly on the real axis and None otherwise.
+    In these cases row height - y has exactly the negated coordinates of row y, so mirrored pixels are bit-identical.
+    """
+    if formula == "julia":
+        return "point"
+    if formula == "mandelbrot" and center.imag == 0.0:
+        return "axis"
+    return None
+
+
+def symmetric_rows(height: int, symmetry):
+    """
+    Returns how many leading rows of a frame have to be computed; mirror_frame fills the others.
+    """
+    return height if symmetry is None else height // 2 + 1
+
+
+# Fill the lower rows of a counts or RGB frame from the upper ones
+def mirror_frame(frame, symmetry):
+    """
+    Row y below the middle takes row height - y; for point symmetry column x also takes column width - x.
+    Column 0 has no partner under point symmetry and is left as is (see julia_edge_column).
+    """
+    if symmetry is None:
+        return frame
+    height = frame.shape[0]
+    first = symmetric_rows(height, symmetry)
+    if symmetry == "point":
+        frame[first:, 1:] = frame[height - first:0:-1, :0:-1]
+    else:
+        frame[first:] = frame[height - first:0:-1]
+    return frame
+
+
+# Escape counts of column 0 of a Julia frame, which point symmetry cannot provide
+@njit(cache=True)
+def julia_edge_column(c_real, c_imag, scale, width, height, max_iterations, first_row):
+    """
+    Returns the int32 escape counts of pixels (0, y) for y from first_row to height - 1, with the arithmetic of julia_kernel.
+    """
+    column = np.empty(height - first_row, dtype=np.int32)
+    for k in range(column.shape[0]):
+        z_real = scale * (0 - width / 2)
+        z_imag = scale * (height / 2 - (first_row + k))
+        iteration = 0
+        while z_real * z_real + z_imag * z_imag <= 4.0 and iteration < max_iterations:
+            z_real_new = z_real * z_real - z_imag * z_imag + c_real
+            z_imag = 2.0 * z_real * z_imag + c_imag
+            z_real = z_real_new
+            iteration += 1
+        column[k] = iteration
+    return column
+
+
+# Complete a Julia frame of which only the leading symmetric_rows rows were computed
+def mirror_julia_frame(frame, c: complex, scale: float, max_iterations: int, palette=None):
+    """
+    Computes column 0 of the lower rows and mirrors the rest. frame holds escape counts,
+    or RGB colors from julia_kernel when the palette is given.
+    """
+    height, width = frame.shape[0], frame.shape[1]
+    first = symmetric_rows(height, "point")
+    column = julia_edge_column(c.real, c.imag, scale, width, height, max_iterations, first)
+    if palette is None:
+        frame[first:, 0] = column
+    else:
+        frame[first:, 0] = colorize_julia(column[:, None], max_iterations, palette)[:, 0]
+    return mirror_frame(frame, "point")
+
+
+# Device buffers of the counts functions, from a FrameBufferPool when one is given
+def device_buffer(buffers, name: str, shape, dtype):
+    """
+    Returns the leading rows of the pool's device buffer 'name' (symmetric views iterate fewer rows than the frame),
+    or a new device array without a pool.
+    """
+    if buffers is None:
+        return cuda.device_array(shape, dtype=dtype)
+    return buffers.device_rows(name, shape, dtype)
+
+
+def copy_to_device(buffers, device_array, host_array):
+    """
+    Copies a contiguous host array into a device buffer of the same shape (counted by the pool) and returns the buffer.
+    """
+    if buffers is None:
+        device_array.copy_to_device(host_array)
+        return device_array
+    return buffers.upload(device_array, host_array)
+
+
+def copy_to_host(buffers, device_array, host_array):
+    """
+    Copies a device buffer into a contiguous host array of the same shape (counted by the pool) and returns the host array.
+    """
+    if buffers is None:
+        device_array.copy_to_host(host_array)
+        return host_array
+    return buffers.copy_to_host(device_array, host_array)
+
+
+# Escape counts for a Mandelbrot frame
+def mandelbrot_iterations(center: complex, scale: float, width: int, height: int, max_iterations: int, counts=None, backend: str = "cpu",
+                          interior_stats=None, symmetric: bool = True, buffers=None):
+    """
+    Returns an int32 (height, width) array of escape counts for a Mandelbrot frame.
+    An existing counts array can be passed in to be filled instead of allocating a new one.
+    Passing interior_stats (an int64 array with one counter per INTERIOR_TESTS entry) switches on the
+    interior early-outs and adds the number of pixels each test resolved to it.
+    Views centered on the real axis compute only the upper half and mirror it (symmetric=False computes every row).
+    On the CUDA backend the kernels write to device buffers that are copied back explicitly; with a FrameBufferPool
+    as 'buffers' those are kept in the pool, so a frame allocates nothing on the device.
+    """
+    if counts is None:
+        counts = np.empty((height, width), dtype=np.int32)
+    symmetry = view_symmetry("mandelbrot", center) if symmetric else None
+    unique = counts[:symmetric_rows(height, symmetry)]
+    blockdim = (16, 16)
+    griddim = (width // blockdim[0] + 1, unique.shape[0] // blockdim[1] + 1)
+    if interior_stats is not None:
+        epsilon = min(PERIODICITY_EPSILON, scale * 1e-3)
+        if backend == "cuda":
+            device_counts = device_buffer(buffers, "counts", unique.shape, np.int32)
+            if buffers is None:
+                resolved = np.zeros(len(INTERIOR_TESTS), dtype=np.int64)
+            else:
+                resolved = buffers.scratch("resolved", (len(INTERIOR_TESTS),), np.int64)
+                resolved[:] = 0
+            device_resolved = copy_to_device(buffers, device_buffer(buffers, "resolved", resolved.shape, np.int64), resolved)
+            mandelbrot_interior_counts_kernel[griddim, blockdim](center.real, center.imag, scale, width, height, max_iterations,
+                                                                 epsilon, device_counts, device_resolved)
+            copy_to_host(buffers, device_counts, unique)
+            interior_stats += copy_to_host(buffers, device_resolved, resolved)
+        else:
+            resolved = np.zeros((unique.shape[0], len(INTERIOR_TESTS)), dtype=np.int64)
+            with parallel_chunksize(ROW_CHUNK):
+                mandelbrot_interior_kernel_cpu(center.real, center.imag, scale, width, height, max_iterations, epsilon, unique, resolved)
+            interior_stats += resolved.sum(axis=0)
+    elif backend == "cuda":
+        device_counts = device_buffer(buffers, "counts", unique.shape, np.int32)
+        mandelbrot_counts_kernel[griddim, blockdim](center.real, center.imag, scale, width, height, max_iterations, device_counts)
+        copy_to_host(buffers, device_counts, unique)
+    else:
+        with parallel_chunksize(ROW_CHUNK):
+            mandelbrot_kernel_cpu(center.real, center.imag, scale, width, height, max_iterations, unique)
+    return mirror_frame(counts, symmetry)
+
+
+# Escape counts for a Julia frame
+def julia_iterations(c: complex, scale: float, width: int, height: int, max_iterations: int, counts=None, backend: str = "cpu",
+                     symmetric: bool = True, buffers=None):
+    """
+    Returns an int32 (height, width) array of escape counts for a Julia set centered at the origin.
+    An existing counts array can be passed in to be filled instead of allocating a new one.
+    Only the upper half is iterated and mirrored through the origin (symmetric=False computes every row).
+    Device buffers are handled as in mandelbrot_iterations.
+    """
+    if counts is None:
+        counts = np.empty((height, width), dtype=np.int32)
+    unique = counts[:symmetric_rows(height, "point")] if symmetric else counts
+    if backend == "cuda":
+        blockdim = (16, 16)
+        griddim = (width // blockdim[0] + 1, unique.shape[0] // blockdim[1] + 1)
+        device_counts = device_buffer(buffers, "counts", unique.shape, np.int32)
+        julia_counts_kernel[griddim, blockdim](c.real, c.imag, scale, width, height, max_iterations, device_counts)
+        copy_to_host(buffers, device_counts, unique)
+    else:
+        with parallel_chunksize(ROW_CHUNK):
+            julia_kernel_cpu(c.real, c.imag, scale, width, height, max_iterations, unique)
+    if symmetric:
+        mirror_julia_frame(counts, c, scale, max_iterations)
+    return counts
+
+
+# CPU kernel mapping escape counts to palette colors, one row per parallel iteration
+@njit(parallel=True, cache=True)
+def colorize_kernel(counts, max_iterations, palette, interior_color, index_offset, image):
+    """
+    Escaped pixels get palette[(iteration % n + index_offset) % n], pixels that reached max_iterations get interior_color.
+    """
+    height, width = counts.shape
+    num_colors = palette.shape[0]
+    for y in prange(height):
+        for x in range(width):
+            iteration = counts[y, x]
+            if iteration >= max_iterations:
+                for channel in range(3):
+                    image[y, x, channel] = interior_color[channel]
+            else:
+                index = (iteration % num_colors + index_offset) % num_colors
+                for channel in range(3):
+                    image[y, x, channel] = palette[index, channel]
+
+
+# Map escape counts to RGB using the palette conventions of the CUDA kernels
+def colorize(counts, max_iterations: int, palette, interior_color, index_offset: int, out=None):
+    """
+    Converts escape counts to an RGB image.
+    Escaped pixels use palette[iteration % len(palette) + index_offset] (wrapping like the kernels do),
+    pixels that reached max_iterations get interior_color. The image is written to 'out' when it is given.
+    """
+    if out is None:
+        out = np.empty(counts.shape + (3,), dtype=np.uint8)
+    colorize_kernel(counts, max_iterations, palette, np.array(interior_color, dtype=np.uint8), index_offset, out)
+    return out
+
+
+def colorize_mandelbrot(counts, max_iterations: int, palette, out=None):
+    """
+    Colors Mandelbrot escape counts like mandelbrot_kernel: palette[iteration % n - 1], black inside the set.
+    """
+    return colorize(counts, max_iterations, palette, (0, 0, 0), -1, out)
+
+
+def colorize_julia(counts, max_iterations: int, palette, out=None):
+    """
+    Colors Julia escape counts like julia_kernel: palette[iteration % n], white inside the set.
+    """
+    return colorize(counts, max_iterations, palette, (255, 255, 255), 0, out)
+
+
+# CPU kernel averaging factor x factor blocks of samples into one pixel, one output row per parallel iteration
+@njit(parallel=True, cache=True)
+def downsample_kernel(samples, factor, image):
+    """
+    Box filter with rounding to the nearest integer, per channel.
+    """
+    height, width, channels = image.shape
+    block = factor * factor
+    for y in prange(height):
+        for x in range(width):
+            for channel in range(channels):
+                total = 0
+                for sy in range(y * factor, y * factor + factor):
+                    for sx in range(x * factor, x * factor + factor):
+                        total += samples[sy, sx, channel]
+                image[y, x, channel] = (total + block // 2) // block
+
+
+# Average a supersampled RGB frame down to the output resolution
+def downsample(samples, factor: int, out=None):
+    """
+    Returns the uint8 image whose pixels average factor x factor blocks of the samples (factor 1 returns them as is).
+    The image is written to 'out' when it is given.
+    """
+    if factor == 1:
+        if out is None:
+            return samples
+        out[:] = samples
+        return out
+    height, width = samples.shape[0] // factor, samples.shape[1] // factor
+    if samples.shape[:2] != (height * factor, width * factor):
+        raise ValueError(f"Sample buffer of shape {samples.shape[:2]} is not a multiple of the factor {factor}")
+    if out is None:
+        out = np.empty((height, width, samples.shape[2]), dtype=np.uint8)
+    downsample_kernel(samples, factor, out)
+    return out
+
+
+# Proxy frame of a given size from the same samples
+def downsample_to(samples, size, out=None):
+    """
+    Returns the samples averaged down to size = (width, height), which must divide the sample resolution.
+    """
+    factor = samples.shape[1] // size[0]
+    if factor < 1 or samples.shape[:2] != (size[1] * factor, size[0] * factor):
+        raise ValueError(f"Proxy size {size} does not divide the sample resolution {samples.shape[1]}x{samples.shape[0]}")
+    return downsample(samples, factor, out)
+
+
+# Human-readable summary of interior test counters
+def format_interior_stats(interior_stats):
+    """
+    Returns a line such as "cardioid 120, bulb 30, periodicity 4000 pixels resolved early".
+    """
+    parts = [f"{name} {int(count)}" for name, count in zip(INTERIOR_TESTS, interior_stats)]
+    return ", ".join(parts) + " pixels resolved early"
+
+
+# Throughput in a unit that is comparable between the GPU and CPU paths
+def megapixels_per_second(width: int, height: int, seconds: float):
+    """
+    Returns the render throughput in Mpixel/s for a frame of the given size.
+    """
+    return width * height / max(seconds, 1e-9) / 1e6
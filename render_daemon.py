@@ -0,0 +1,612 @@
+import argparse
+import glob
+import json
+import os
+import queue
+import re
+import socket
+import socketserver
+import sys
+import threading
+import time
+import numpy as np
+from scipy.interpolate import interp1d
+from frame_pipeline import FramePipeline
+from buffer_pool import FrameBufferPool
+from frame_manifest import FrameManifest, json_value
+from julia_mosaic import julia_mosaic
+from progressive import ProgressiveRender, save_pass
+from render_backend import (select_backend, mandelbrot_iterations, julia_iterations, colorize_mandelbrot, colorize_julia,
+                            downsample, megapixels_per_second)
+
+# Local TCP port of the render service (bound to 127.0.0.1 only)
+DAEMON_PORT = 47110
+
+# Job directory: scene files dropped into <JOBS_FOLDER>/incoming are queued, and every job renders into <JOBS_FOLDER>/<job id>
+JOBS_FOLDER = "render_jobs"
+
+# Seconds between two scans of the incoming folder
+SCAN_SECONDS = 0.25
+
+# Jobs of at most this many output pixels over all their frames are previews and render before queued longer jobs
+PREVIEW_PIXELS = 4 * 1024**2
+
+# Unfinished progressive frames of cancelled jobs kept for a resubmission
+PARTIAL_RENDERS = 4
+
+# Scene kinds and the script each one stands for
+SCENE_KINDS = {
+    "mandelbrot": "mandelbrot_zoom.py / mandelbrot_increase_iterations_*.py",
+    "julia": "julia_change_c_animation.py / julia_fixed_point.py",
+    "julia_grid": "julia_sets_collection.py / julia_sets_collection_zoom.py",
+}
+
+# Events after which a job produces no further output
+FINAL_EVENTS = ("done", "failed", "cancelled")
+
+# Black, purple, white, black: the gradient of mandelbrot_zoom.py, used when a scene gives no palette
+DEFAULT_PALETTE = {"colors": [[0, 0, 0], [204, 179, 255], [255, 255, 255], [0, 0, 0]], "interpolation": "cubic", "size": 256}
+
+
+# Gradient creation function
+def make_gradient(colors, interpolation):
+    """
+    Creates a gradient function based on specified colors and interpolation type.
+    Colors should be given in the 0-255 RGB range.
+    """
+    X = [i / (len(colors) - 1) for i in range(len(colors))]
+    Y = [[color[i] for color in colors] for i in range(3)]
+    channels = [interp1d(X, y, kind=interpolation) for y in Y]
+    return lambda x: [int(np.clip(channel(x), 0, 255)) for channel in channels]
+
+
+# Values that are either fixed or interpolated from a first to a last frame
+def frame_values(value, num_frames: int, geometric: bool = False):
+    """
+    Returns num_frames values: a number is repeated, a [first, last] pair is interpolated
+    (geometrically for scales, linearly otherwise).
+    """
+    if isinstance(value, (int, float)):
+        return np.full(num_frames, float(value))
+    first, last = (float(v) for v in value)
+    return np.geomspace(first, last, num_frames) if geometric else np.linspace(first, last, num_frames)
+
+
+def frame_points(value, num_frames: int):
+    """
+    Returns num_frames complex values from a [real, imag] point or a [[real, imag], [real, imag]] path
+    (coordinates may be given as text, as in the scripts).
+    """
+    if isinstance(value[0], (list, tuple)):
+        start, end = (complex(float(point[0]), float(point[1])) for point in value)
+    else:
+        start = end = complex(float(value[0]), float(value[1]))
+    return start + (end - start) * np.linspace(0.0, 1.0, num_frames)
+
+
+def grid_c_values(grid_size: int):
+    """
+    Returns the c at the center of every cell of a grid over (-2, 2) x (-2, 2), row by row from the top,
+    as generate_c_values of the Julia collection scripts.
+    """
+    step = 4.0 / grid_size
+    values = np.linspace(-2 + step / 2, 2 - step / 2, grid_size)
+    return [complex(r, i) for i in values[::-1] for r in values]
+
+
+# Scene spec -> per-frame parameters
+def scene_frames(scene: dict):
+    """
+    Validates a scene spec and returns the parameters of each of its frames.
+    Raises ValueError with a message for the client on a bad spec.
+    """
+    kind = scene.get("kind", "mandelbrot")
+    if kind not in SCENE_KINDS:
+        raise ValueError(f"Unknown scene kind '{kind}', expected one of {tuple(SCENE_KINDS)}")
+    try:
+        if kind == "julia_grid":
+            grid_sizes = [int(size) for size in scene.get("grid_sizes", range(3, 100))]
+            zooms = frame_values(scene.get("zoom", 1.0), len(grid_sizes), geometric=True)
+            iterations = np.rint(frame_values(scene.get("max_iterations", 1000), len(grid_sizes))).astype(int)
+            return [dict(grid_size=size, zoom=zoom, max_iterations=int(max_iterations))
+                    for size, zoom, max_iterations in zip(grid_sizes, zooms, iterations)]
+        num_frames = int(scene.get("frames", 1))
+        if num_frames < 1:
+            raise ValueError("A scene needs at least one frame")
+        scales = frame_values(scene.get("scale", 0.004), num_frames, geometric=True)
+        iterations = np.rint(frame_values(scene.get("max_iterations", 1000), num_frames)).astype(int)
+        if kind == "mandelbrot":
+            centers = frame_points(scene.get("center", [-0.75, 0.0]), num_frames)
+            return [dict(center=center, scale=scale, max_iterations=int(max_iterations))
+                    for center, scale, max_iterations in zip(centers, scales, iterations)]
+        if "c_circle" in scene:
+            # c on a circle around the origin, as in julia_change_c_animation.py: angle (frame + 1) / n
+            radius, n = float(scene["c_circle"]["radius"]), float(scene["c_circle"]["n"])
+            points = [radius * complex(np.cos((frame + 1) / n), np.sin((frame + 1) / n)) for frame in range(num_frames)]
+        else:
+            points = frame_points(scene.get("c", [-0.8, 0.156]), num_frames)
+        return [dict(c=c, scale=scale, max_iterations=int(max_iterations)) for c, scale, max_iterations in zip(points, scales, iterations)]
+    except (KeyError, TypeError, IndexError) as error:
+        raise ValueError(f"Bad {kind} scene: {error!r}")
+
+
+class RenderJob:
+    """
+    A queued scene: its frames still to render, the frames on their way to disk and the clients following its progress.
+    The frame manifest in the job folder makes a scene submitted again with the same output folder skip finished frames.
+    """
+
+    def __init__(self, job_id: str, scene: dict, folder: str, sequence: int):
+        self.job_id = job_id
+        self.scene = scene
+        self.kind = scene.get("kind", "mandelbrot")
+        self.frames = scene_frames(scene)
+        self.width = int(scene.get("width", 2160 if self.kind == "julia_grid" else 1920))
+        self.height = int(scene.get("height", 2160 if self.kind == "julia_grid" else 1080))
+        self.supersampling = 1 if self.kind == "julia_grid" else int(scene.get("supersampling", 1))
+        if self.width < 1 or self.height < 1 or self.supersampling < 1:
+            raise ValueError("width, height and supersampling must be positive")
+        self.folder = folder
+        self.sequence = sequence
+        preview = self.width * self.height * len(self.frames) <= PREVIEW_PIXELS
+        self.priority = int(scene.get("priority", 0 if preview else 1))
+        os.makedirs(folder, exist_ok=True)
+        self.manifest = FrameManifest(folder, scene, lease_size=1)
+        self.pending = self.manifest.unfinished_frames(0, len(self.frames))
+        self.in_flight = 0
+        self.state = "queued"
+        self.subscribers = []
+        # Progressive scenes write every refinement pass of a frame to its file and can be cancelled within a frame
+        self.progressive = bool(scene.get("progressive", False)) and self.kind != "julia_grid"
+        self.cancelled = threading.Event()
+        self.submitted = time.perf_counter()
+        self.started = None
+        self.frames_done = len(self.frames) - len(self.pending)
+        self.pixels = 0
+        self.render_seconds = 0.0
+
+    def status(self):
+        """
+        Returns the job's state and frame counts.
+        """
+        return {"job": self.job_id, "kind": self.kind, "state": self.state, "priority": self.priority,
+                "frames": len(self.frames), "frames_done": self.frames_done, "folder": self.folder}
+
+
+class RenderDaemon:
+    """
+    Long-lived render service. Python, NumPy, SciPy and Numba are imported and every kernel is compiled once
+    at start-up, palettes are built once per spec and frame buffers stay allocated, so a job only pays for its pixels.
+    Scenes arrive over a local socket or as files in the job directory and are rendered one frame at a time:
+    before every frame the job with the lowest (priority, submission) is picked, so a preview submitted during a long
+    render starts with the next frame. Progress events go to the following clients and to <job folder>/progress.jsonl.
+    """
+
+    def __init__(self, jobs_folder: str = JOBS_FOLDER, port: int = DAEMON_PORT, backend: str = "auto"):
+        self.jobs_folder = jobs_folder
+        self.port = port
+        self.backend = select_backend(backend)
+        self.frame_buffers = FrameBufferPool(self.backend)
+        self.frame_pipeline = FramePipeline(encoders=4, queue_size=4)
+        self.palettes = {}
+        self.partial_renders = {}
+        self.jobs = {}
+        self.sequence = 0
+        self.condition = threading.Condition()
+        self.running = True
+
+    # Palettes and kernels loaded once
+    def palette(self, spec):
+        """
+        Returns the palette array for a {"colors", "interpolation", "size"} spec, building it on first use.
+        """
+        spec = dict(DEFAULT_PALETTE, **(spec or {}))
+        key = json.dumps(spec, sort_keys=True)
+        if key not in self.palettes:
+            gradient = make_gradient(spec["colors"], interpolation=spec["interpolation"])
+            self.palettes[key] = np.array([gradient(i / spec["size"]) for i in range(spec["size"])], dtype=np.uint8)
+        return self.palettes[key]
+
+    def warm_up(self):
+        """
+        Compiles (or loads from the Numba cache) every kernel a job can use by rendering a tiny frame of each scene kind.
+        """
+        start = time.perf_counter()
+        for kind, scene in (("mandelbrot", {"width": 32, "height": 16, "supersampling": 2}),
+                            ("julia", {"width": 32, "height": 16, "supersampling": 2}),
+                            ("julia_grid", {"width": 32, "height": 32, "grid_sizes": [3]})):
+            scene = dict(scene, kind=kind, max_iterations=64)
+            image = self.render_frame(scene, scene_frames(scene)[0], scene["width"], scene["height"], scene.get("supersampling", 1))
+            self.frame_buffers.release(image)
+        print(f"Kernels ready in {time.perf_counter() - start:.1f} s ({self.backend})")
+
+    # One frame of a job
+    def render_frame(self, scene: dict, frame: dict, width: int, height: int, supersampling: int):
+        """
+        Renders one frame into an acquired buffer, with the arithmetic and colors of the corresponding script.
+        """
+        palette = self.palette(scene.get("palette"))
+        kind = scene.get("kind", "mandelbrot")
+        if kind == "julia_grid":
+            grid_size = frame["grid_size"]
+            tile_size = min(width, height) / grid_size
+            # A zoom below 1 magnifies every Julia set inside its tile, as in julia_sets_collection_zoom.py
+            scale = 4.0 / tile_size * frame["zoom"]
+            x_margin, y_margin = (width - tile_size * grid_size) / 2, (height - tile_size * grid_size) / 2
+            return julia_mosaic(grid_c_values(grid_size), grid_size, tile_size, x_margin, y_margin, scale, width, height, frame["max_iterations"], palette, backend=self.backend, buffers=self.frame_buffers)
+        width, height, scale = width * supersampling, height * supersampling, frame["scale"] / supersampling
+        counts = self.frame_buffers.scratch("counts", (height, width))
+        if kind == "mandelbrot":
+            counts = mandelbrot_iterations(frame["center"], scale, width, height, frame["max_iterations"], counts=counts, backend=self.backend,
+                                           buffers=self.frame_buffers)
+            image = colorize_mandelbrot(counts, frame["max_iterations"], palette, out=self.frame_buffers.acquire((height, width, 3)))
+        else:
+            counts = julia_iterations(frame["c"], scale, width, height, frame["max_iterations"], counts=counts, backend=self.backend,
+                                      buffers=self.frame_buffers)
+            image = colorize_julia(counts, frame["max_iterations"], palette, out=self.frame_buffers.acquire((height, width, 3)))
+        return self.frame_buffers.downsample(image, supersampling)
+
+    def render_progressive_frame(self, job: RenderJob, index: int, filename: str):
+        """
+        Renders a frame coarse-to-fine (see ProgressiveRender), writing every pass but the last to its file with a 'pass' event.
+        Returns the finished frame, or None when the job was cancelled; the last PARTIAL_RENDERS unfinished frames keep
+        their escape counts, so the same frame submitted again (even with another palette) continues where it stopped.
+        """
+        frame = job.frames[index]
+        width, height = job.width * job.supersampling, job.height * job.supersampling
+        key = json.dumps([job.kind, {name: json_value(value) for name, value in frame.items()}, width, height])
+        palette = self.palette(job.scene.get("palette"))
+        render = self.partial_renders.pop(key, None)
+        if render is None:
+            point = frame["center"] if job.kind == "mandelbrot" else frame["c"]
+            render = ProgressiveRender(job.kind, point, frame["scale"] / job.supersampling, width, height, frame["max_iterations"],
+                                       palette, backend=self.backend)
+        render.palette = palette
+
+        def on_pass(image, pass_number, num_passes):
+            if pass_number < num_passes:
+                save_pass(filename, downsample(image, job.supersampling) if job.supersampling > 1 else image)
+                with self.condition:
+                    self.publish(job, "pass", index=index, file=filename, pass_number=pass_number, passes=num_passes)
+
+        if not render.run(on_pass, job.cancelled):
+            self.partial_renders[key] = render
+            while len(self.partial_renders) > PARTIAL_RENDERS:
+                self.partial_renders.pop(next(iter(self.partial_renders)))
+            return None
+        image = render.image()
+        return downsample(image, job.supersampling) if job.supersampling > 1 else image
+
+    # Job queue
+    def submit(self, scene: dict, name: str = None, subscriber=None):
+        """
+        Queues a scene and returns its job. A subscriber (a queue.Queue) receives every event of the job from 'queued' on.
+        Raises ValueError for an invalid scene.
+        """
+        with self.condition:
+            self.sequence += 1
+            name = re.sub(r"[^\w.-]", "_", name or scene.get("name") or scene.get("kind", "mandelbrot"))
+            job_id = f"{self.sequence:04d}_{name}"
+            folder = scene.get("output") or os.path.join(self.jobs_folder, job_id)
+            job = RenderJob(job_id, scene, folder, self.sequence)
+            if subscriber is not None:
+                job.subscribers.append(subscriber)
+            self.jobs[job_id] = job
+            self.publish(job, "queued", frames=len(job.frames), pending=len(job.pending), priority=job.priority)
+            if not job.pending:
+                job.state = "done"
+                self.publish(job, "done", frames=len(job.frames), seconds=0.0)
+            self.condition.notify_all()
+        return job
+
+    def cancel(self, job_id: str):
+        """
+        Drops the frames of a job that have not started yet; frames already rendered are still written.
+        A progressive frame stops at its next chunk and keeps its escape counts for the same scene submitted again.
+        """
+        with self.condition:
+            job = self.jobs.get(job_id)
+            if job is None or job.state in FINAL_EVENTS:
+                return False
+            job.cancelled.set()
+            job.pending = []
+            job.state = "cancelled"
+            self.publish(job, "cancelled", frames_done=job.frames_done)
+            return True
+
+    def subscribe(self, job_id: str, subscriber):
+        """
+        Adds a subscriber to a job; returns the job, or None when it is unknown.
+        The subscriber gets the job's status first and the final event directly if the job has already ended.
+        """
+        with self.condition:
+            job = self.jobs.get(job_id)
+            if job is not None:
+                subscriber.put(dict(job.status(), event="status"))
+                if job.state in FINAL_EVENTS:
+                    subscriber.put(dict(job.status(), event=job.state))
+                else:
+                    job.subscribers.append(subscriber)
+            return job
+
+    def publish(self, job: RenderJob, event: str, **fields):
+        """
+        Sends an event to the job's subscribers and appends it to its progress file.
+        """
+        message = dict(job=job.job_id, event=event, time=time.time(), **fields)
+        for subscriber in list(job.subscribers):
+            subscriber.put(message)
+        if event in FINAL_EVENTS:
+            job.subscribers = []
+        with open(os.path.join(job.folder, "progress.jsonl"), "a") as file:
+            file.write(json.dumps(message) + "\n")
+
+    def next_frame(self):
+        """
+        Waits for a runnable job and takes the next frame of the one with the lowest (priority, submission).
+        """
+        with self.condition:
+            while self.running:
+                runnable = [job for job in self.jobs.values() if job.pending]
+                if runnable:
+                    job = min(runnable, key=lambda job: (job.priority, job.sequence))
+                    index = job.pending.pop(0)
+                    job.in_flight += 1
+                    if job.started is None:
+                        job.started = time.perf_counter()
+                        job.state = "rendering"
+                        self.publish(job, "started", latency_ms=round((job.started - job.submitted) * 1000, 1))
+                    return job, index
+                self.condition.wait()
+        return None, None
+
+    def fail(self, job: RenderJob, index: int, error):
+        """
+        Drops the remaining frames of a job after an error in one of its frames and publishes 'failed' once.
+        Call with the condition held.
+        """
+        job.pending = []
+        if job.state not in FINAL_EVENTS:
+            job.state = "failed"
+            self.publish(job, "failed", index=index, error=repr(error))
+
+    def frame_callbacks(self, job: RenderJob, index: int, rate: float):
+        """
+        Returns the FramePipeline 'written' and 'failed' callbacks of a frame: the first records the frame and reports
+        the progress, the second fails the job. Either way the frame leaves job.in_flight exactly once, so the job
+        still ends, and the shared pipeline keeps writing the frames of the other jobs.
+        """
+        settled = False
+
+        def written(filename, data):
+            nonlocal settled
+            job.manifest.record(filename, data)
+            with self.condition:
+                settled = True
+                job.in_flight -= 1
+                job.frames_done += 1
+                self.publish(job, "frame", index=index, file=filename, bytes=len(data), frames_done=job.frames_done,
+                             frames=len(job.frames), mpixel_s=round(rate, 1))
+                if not job.pending and job.in_flight == 0 and job.state == "rendering":
+                    job.state = "done"
+                    self.publish(job, "done", frames=len(job.frames), seconds=round(time.perf_counter() - job.started, 3),
+                                 mpixel_s=round(megapixels_per_second(job.pixels, 1, job.render_seconds), 1))
+
+        def failed(filename, error):
+            nonlocal settled
+            with self.condition:
+                if not settled:
+                    settled = True
+                    job.in_flight -= 1
+                self.fail(job, index, error)
+
+        return written, failed
+
+    # Render thread
+    def render_loop(self):
+        """
+        Renders frames until the daemon stops; a failing frame fails its job and leaves the other jobs running.
+        """
+        while True:
+            job, index = self.next_frame()
+            if job is None:
+                return
+            filename = os.path.join(job.folder, f"{index:05d}.png")
+            try:
+                start = time.perf_counter()
+                job.manifest.begin(index, filename, **job.frames[index])
+                if job.progressive:
+                    image = self.render_progressive_frame(job, index, filename)
+                    if image is None:
+                        with self.condition:
+                            job.in_flight -= 1
+                        continue
+                else:
+                    image = self.render_frame(job.scene, job.frames[index], job.width, job.height, job.supersampling)
+                seconds = time.perf_counter() - start
+                samples = job.width * job.height * job.supersampling**2
+                job.pixels += samples
+                job.render_seconds += seconds
+                written, failed = self.frame_callbacks(job, index, megapixels_per_second(samples, 1, seconds))
+                self.frame_pipeline.submit(filename, image, release=None if job.progressive else self.frame_buffers.release,
+                                           written=written, failed=failed)
+            except Exception as error:
+                if error is self.frame_pipeline.error:
+                    # A failed callback raised inside the pipeline; it is reported with this frame and cleared,
+                    # so the frames of the other jobs can still be submitted
+                    self.frame_pipeline.error = None
+                with self.condition:
+                    job.in_flight -= 1
+                    self.fail(job, index, error)
+
+    # Job directory
+    def scan_loop(self):
+        """
+        Queues every scene file dropped into <jobs_folder>/incoming; accepted files move into their job folder,
+        rejected ones are renamed to '.rejected' next to a '.error' file with the reason.
+        """
+        incoming = os.path.join(self.jobs_folder, "incoming")
+        os.makedirs(incoming, exist_ok=True)
+        while self.running:
+            for path in sorted(glob.glob(os.path.join(incoming, "*.json")), key=os.path.getmtime):
+                name = os.path.splitext(os.path.basename(path))[0]
+                try:
+                    with open(path, "r") as file:
+                        scene = json.load(file)
+                    job = self.submit(scene, name=name)
+                    os.replace(path, os.path.join(job.folder, "scene.json"))
+                    print(f"Queued {job.job_id} from {path}")
+                except (ValueError, OSError) as error:
+                    with open(path[:-len(".json")] + ".error", "w") as file:
+                        file.write(f"{error}\n")
+                    os.replace(path, path[:-len(".json")] + ".rejected")
+                    print(f"Rejected {path}: {error}")
+            time.sleep(SCAN_SECONDS)
+
+    # Local socket
+    def handle(self, connection):
+        """
+        Serves one client connection: JSON request lines, answered with JSON event lines.
+        """
+        reader = connection.makefile("r")
+        writer = connection.makefile("w")
+
+        def send(message):
+            writer.write(json.dumps(message) + "\n")
+            writer.flush()
+
+        for line in reader:
+            request = json.loads(line)
+            command = request.get("command")
+            events = None
+            try:
+                if command == "submit":
+                    if request.get("follow", True):
+                        events = queue.Queue()
+                    job = self.submit(request["scene"], name=request.get("name"), subscriber=events)
+                    if events is None:
+                        send(job.status())
+                elif command == "follow":
+                    events = queue.Queue()
+                    if self.subscribe(request["job"], events) is None:
+                        raise ValueError(f"Unknown job '{request['job']}'")
+                elif command == "status":
+                    with self.condition:
+                        send({"jobs": [job.status() for job in self.jobs.values()]})
+                elif command == "cancel":
+                    send({"job": request["job"], "cancelled": self.cancel(request["job"])})
+                else:
+                    raise ValueError(f"Unknown command '{command}', expected submit, follow, status or cancel")
+            except (ValueError, KeyError) as error:
+                send({"event": "error", "error": str(error)})
+                continue
+            while events is not None:
+                message = events.get()
+                send(message)
+                if message["event"] in FINAL_EVENTS:
+                    break
+
+    def serve(self):
+        """
+        Warms up the kernels, then runs the render and scan threads and the socket server until interrupted.
+        """
+        self.warm_up()
+        threading.Thread(target=self.render_loop, daemon=True).start()
+        threading.Thread(target=self.scan_loop, daemon=True).start()
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                try:
+                    daemon.handle(self.connection)
+                except (ConnectionError, json.JSONDecodeError):
+                    pass
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        with socketserver.ThreadingTCPServer(("127.0.0.1", self.port), Handler) as server:
+            server.daemon_threads = True
+            print(f"Render daemon listening on 127.0.0.1:{self.port}, job directory {os.path.join(self.jobs_folder, 'incoming')}")
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                print("Stopping: waiting for the frames already rendered to be written")
+            finally:
+                with self.condition:
+                    self.running = False
+                    self.condition.notify_all()
+                self.frame_pipeline.close()
+
+
+# Client side
+def request(message: dict, port: int = DAEMON_PORT):
+    """
+    Sends one request to a running daemon and yields its reply lines as dicts until it closes the reply
+    (a final event for a followed job).
+    """
+    with socket.create_connection(("127.0.0.1", port)) as connection:
+        connection.sendall((json.dumps(message) + "\n").encode())
+        connection.shutdown(socket.SHUT_WR)
+        for line in connection.makefile("r"):
+            yield json.loads(line)
+
+
+def print_event(message: dict):
+    """
+    Prints a reply line of the daemon in readable form.
+    """
+    event = message.get("event")
+    if event == "frame":
+        print(f"{message['job']}: frame {message['frames_done']}/{message['frames']} written to {message['file']} "
+              f"({message['mpixel_s']} Mpixel/s)")
+    elif event == "pass":
+        print(f"{message['job']}: frame {message['index']} pass {message['pass_number']}/{message['passes']} written to {message['file']}")
+    elif event == "started":
+        print(f"{message['job']}: started {message['latency_ms']} ms after submission")
+    elif event == "done":
+        print(f"{message['job']}: done, {message['frames']} frames in {message.get('seconds', 0.0)} s")
+    else:
+        print(json.dumps(message))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local render service that keeps the kernels warm and renders queued scenes.")
+    parser.add_argument("--port", type=int, default=DAEMON_PORT, help="local TCP port of the daemon")
+    commands = parser.add_subparsers(dest="command")
+    serve = commands.add_parser("serve", help="run the daemon (the default)")
+    serve.add_argument("--jobs", default=JOBS_FOLDER, help="job directory (scene files go into its 'incoming' folder)")
+    serve.add_argument("--backend", default="auto", help="render backend: auto, cuda or cpu")
+    submit = commands.add_parser("submit", help="queue a scene file and stream its progress")
+    submit.add_argument("scene", help="JSON scene spec, e.g. {\"kind\": \"mandelbrot\", \"center\": [-0.75, 0], \"frames\": 10}")
+    submit.add_argument("--no-follow", action="store_true", help="return once the scene is queued")
+    follow = commands.add_parser("follow", help="stream the progress of a queued job")
+    follow.add_argument("job")
+    commands.add_parser("status", help="list the jobs")
+    cancel = commands.add_parser("cancel", help="drop the frames of a job that have not started")
+    cancel.add_argument("job")
+    args = parser.parse_args()
+
+    if args.command in (None, "serve"):
+        RenderDaemon(getattr(args, "jobs", JOBS_FOLDER), args.port, getattr(args, "backend", "auto")).serve()
+        return
+    if args.command == "submit":
+        with open(args.scene, "r") as file:
+            scene = json.load(file)
+        message = {"command": "submit", "scene": scene, "follow": not args.no_follow,
+                   "name": os.path.splitext(os.path.basename(args.scene))[0]}
+    elif args.command in ("follow", "cancel"):
+        message = {"command": args.command, "job": args.job}
+    else:
+        message = {"command": "status"}
+    failed = False
+    try:
+        for reply in request(message, args.port):
+            print_event(reply)
+            failed = failed or reply.get("event") in ("error", "failed")
+    except ConnectionRefusedError:
+        print(f"No render daemon on port {args.port}; start one with 'python render_daemon.py'")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+import numpy as np
+from render_backend import mandelbrot_iterations, colorize_mandelbrot
+from adaptive_aa import edge_pixels, AdaptiveAntialiasing, EDGE_THRESHOLD
+
+PALETTE = np.random.default_rng(0).integers(0, 256, (256, 3), dtype=np.uint8)
+
+
+def test_edge_pixels_flags_both_sides_of_a_jump():
+    counts = np.array([[5, 5, 5, 5],
+                       [5, 5, 9, 5],
+                       [5, 5, 5, 7]], dtype=np.int32)
+    expected = np.array([[0, 0, 1, 0],
+                         [0, 1, 1, 1],
+                         [0, 0, 1, 0]], dtype=bool)
+    np.testing.assert_array_equal(edge_pixels(counts), expected)
+
+
+def test_edge_pixels_threshold_is_exclusive():
+    counts = np.array([[0, EDGE_THRESHOLD, 2 * EDGE_THRESHOLD + 1]], dtype=np.int32)
+    np.testing.assert_array_equal(edge_pixels(counts), [[False, True, True]])
+    assert not edge_pixels(np.full((4, 4), 17, dtype=np.int32)).any()
+
+
+def test_refine_only_changes_edge_pixels():
+    center, scale, width, height, max_iterations = -0.75 + 0.1j, 0.01, 64, 48, 200
+    counts = mandelbrot_iterations(center, scale, width, height, max_iterations)
+    image = colorize_mandelbrot(counts, max_iterations, PALETTE)
+    refined = image.copy()
+    edge_aa = AdaptiveAntialiasing()
+    assert edge_aa.refine("mandelbrot", center, scale, counts, refined, max_iterations, PALETTE) == edge_pixels(counts).sum()
+    changed = (refined != image).any(axis=-1)
+    assert changed.any() and not (changed & ~edge_pixels(counts)).any()
+    # The jitter is seeded, so a re-rendered frame gets the same samples
+    again = image.copy()
+    AdaptiveAntialiasing().refine("mandelbrot", center, scale, counts, again, max_iterations, PALETTE)
+    np.testing.assert_array_equal(again, refined)
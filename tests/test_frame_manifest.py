@@ -0,0 +1,65 @@
+import os
+from frame_manifest import FrameManifest
+
+SCENE = dict(center=-0.5 + 0j, scale=0.01, width=64, height=48)
+
+
+# Renders the given frames as the scripts do: begin() before the frame, record() once its file is written
+def write_frames(manifest, folder, indices):
+    for index in indices:
+        filename = os.path.join(folder, f"{index:05d}.png")
+        data = f"frame {index}".encode()
+        manifest.begin(index, filename, scale=0.01 * index)
+        with open(filename, "wb") as file:
+            file.write(data)
+        manifest.record(filename, data)
+
+
+def test_restart_skips_finished_frames(tmp_path):
+    folder = str(tmp_path)
+    first = FrameManifest(folder, SCENE, lease_size=2)
+    write_frames(first, folder, [0, 1, 2])
+    restarted = FrameManifest(folder, SCENE, lease_size=2)
+    assert restarted.unfinished_frames(0, 5) == [3, 4]
+    assert list(restarted.leased_frames(0, 5)) == [3, 4]
+
+
+def test_truncated_or_missing_frames_are_rendered_again(tmp_path):
+    folder = str(tmp_path)
+    write_frames(FrameManifest(folder, SCENE), folder, [0, 1, 2])
+    with open(os.path.join(folder, "00001.png"), "wb") as file:
+        file.write(b"fr")
+    os.remove(os.path.join(folder, "00002.png"))
+    assert FrameManifest(folder, SCENE).unfinished_frames(0, 3) == [1, 2]
+
+
+def test_changed_scene_starts_over(tmp_path):
+    folder = str(tmp_path)
+    write_frames(FrameManifest(folder, SCENE), folder, [0, 1])
+    assert FrameManifest(folder, dict(SCENE, supersampling=2)).unfinished_frames(0, 2) == [0, 1]
+
+
+def test_workers_lease_disjoint_ranges(tmp_path):
+    folder = str(tmp_path)
+    first = FrameManifest(folder, SCENE, lease_size=2)
+    second = FrameManifest(folder, SCENE, lease_size=2)
+    second.worker = "other-host:1"
+    assert first.lease(0, 4) == ([0, 1], None)
+    assert second.lease(0, 4) == ([2, 3], None)
+    frames, wait = second.lease(0, 4)
+    assert frames is None and wait > 0
+
+
+def test_expired_lease_is_taken_over(tmp_path):
+    folder = str(tmp_path)
+    dead = FrameManifest(folder, SCENE, lease_size=2, lease_seconds=0)
+    assert dead.lease(0, 4) == ([0, 1], None)
+    survivor = FrameManifest(folder, SCENE, lease_size=2)
+    survivor.worker = "other-host:1"
+    assert survivor.lease(0, 4) == ([0, 1], None)
+
+
+def test_without_resume_every_frame_is_rendered(tmp_path):
+    folder = str(tmp_path)
+    write_frames(FrameManifest(folder, SCENE), folder, [0, 1])
+    assert list(FrameManifest(folder, SCENE, resume=False).leased_frames(0, 3)) == [0, 1, 2]
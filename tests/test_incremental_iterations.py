@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+from render_backend import mandelbrot_iterations
+from incremental_iterations import IncrementalMandelbrot
+
+
+# Axis-symmetric view (mirrored state) and an off-axis view
+@pytest.mark.parametrize("center", [complex(-0.5, 0), complex(-0.745, 0.11)])
+def test_rising_cap_matches_full_render(center):
+    engine = IncrementalMandelbrot()
+    scale = 3.0 / 80 if center.imag == 0 else 0.0004
+    for max_iterations in (5, 20, 21, 80, 250):
+        counts = engine.iterations(center, scale, 80, 61, max_iterations)
+        np.testing.assert_array_equal(counts, mandelbrot_iterations(center, scale, 80, 61, max_iterations))
+    assert engine.resets == 1
+
+
+def test_lower_cap_clamps_known_counts():
+    engine = IncrementalMandelbrot()
+    engine.iterations(-0.5 + 0j, 0.04, 64, 48, 200)
+    counts = engine.iterations(-0.5 + 0j, 0.04, 64, 48, 50)
+    np.testing.assert_array_equal(counts, mandelbrot_iterations(-0.5 + 0j, 0.04, 64, 48, 50))
+    assert engine.resets == 1
+
+
+def test_new_view_starts_over():
+    engine = IncrementalMandelbrot()
+    engine.iterations(-0.5 + 0j, 0.04, 64, 48, 100)
+    counts = engine.iterations(-0.5 + 0j, 0.02, 64, 48, 100)
+    np.testing.assert_array_equal(counts, mandelbrot_iterations(-0.5 + 0j, 0.02, 64, 48, 100))
+    assert engine.resets == 2
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+from PIL import Image
+from render_backend import julia_iterations, colorize_julia
+from julia_mosaic import tile_lookup, julia_mosaic
+
+PALETTE = np.random.default_rng(0).integers(0, 256, (256, 3), dtype=np.uint8)
+
+
+# Grid of c values as generated by julia_sets_collection.py (tile centers over [-2, 2] x [-2, 2], row by row)
+def grid_c_values(grid_size: int):
+    step = 4.0 / grid_size
+    return [complex(-2 + (j + 0.5) * step, 2 - (i + 0.5) * step) for i in range(grid_size) for j in range(grid_size)]
+
+
+# Reference: every tile rendered on its own and pasted onto a black frame
+def pasted_mosaic(c_values, grid_size: int, tile_size: float, x_margin: float, y_margin: float, scale: float,
+                  width: int, height: int, max_iterations: int):
+    image = Image.new("RGB", (width, height))
+    for index, c in enumerate(c_values):
+        tile = colorize_julia(julia_iterations(c, scale, int(tile_size + 1), int(tile_size + 1), max_iterations, symmetric=False),
+                              max_iterations, PALETTE)
+        image.paste(Image.fromarray(tile), (int(x_margin + (index % grid_size) * tile_size), int(y_margin + (index // grid_size) * tile_size)))
+    return np.asarray(image)
+
+
+def test_tile_lookup_covers_pasted_positions():
+    tiles, local = tile_lookup(2.5, 10.4, 3, 40)
+    # Tiles are 11 pixels wide at int(2.5 + j * 10.4) = 2, 12, 23; a later tile covers the overlap
+    assert list(tiles[:2]) == [-1, -1]
+    assert list(tiles[2:12]) == [0] * 10 and list(local[2:12]) == list(range(10))
+    assert list(tiles[12:23]) == [1] * 11 and list(local[12:23]) == list(range(11))
+    assert list(tiles[23:34]) == [2] * 11 and list(local[23:34]) == list(range(11))
+    assert list(tiles[34:]) == [-1] * 6
+
+
+def test_tile_lookup_clips_at_frame_edge():
+    tiles, local = tile_lookup(0.0, 7.0, 3, 20)
+    assert len(tiles) == 20 and list(tiles[14:]) == [2] * 6 and list(local[14:]) == list(range(6))
+
+
+@pytest.mark.parametrize("grid_size, width", [(3, 96), (4, 90), (5, 101)])
+@pytest.mark.parametrize("symmetric", [True, False])
+def test_mosaic_matches_pasted_tiles(grid_size, width, symmetric):
+    tile_size = width / grid_size * 0.99
+    x_margin = y_margin = (width - tile_size * grid_size) / 2
+    scale = 4.0 / tile_size
+    c_values = grid_c_values(grid_size)
+    image = julia_mosaic(c_values, grid_size, tile_size, x_margin, y_margin, scale, width, width, 200, PALETTE,
+                         symmetric=symmetric)
+    expected = pasted_mosaic(c_values, grid_size, tile_size, x_margin, y_margin, scale, width, width, 200)
+    np.testing.assert_array_equal(image, expected)
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+import numpy_engine
+import render_backend
+from numpy_engine import NumpyEngine, naive_iterations
+
+PALETTE = np.random.default_rng(0).integers(0, 256, (256, 3), dtype=np.uint8)
+
+# Views of the scripts' kinds: a whole-set frame, a detailed off-axis frame and a Julia set
+VIEWS = [("mandelbrot", -0.5 + 0j, 3.0 / 90, 300), ("mandelbrot", -0.7453 + 0.1127j, 6e-5, 500),
+         ("julia", -0.8 + 0.156j, 3.0 / 90, 300)]
+
+
+def kernel_counts(formula, param, scale, width, height, max_iterations):
+    if formula == "mandelbrot":
+        return render_backend.mandelbrot_iterations(param, scale, width, height, max_iterations, symmetric=False)
+    return render_backend.julia_iterations(param, scale, width, height, max_iterations, symmetric=False)
+
+
+# Default chunks, and chunks smaller than a row with a block length that does not divide the cap
+@pytest.mark.parametrize("chunk_pixels, block_steps", [(numpy_engine.CHUNK_PIXELS, numpy_engine.BLOCK_STEPS), (700, 7)])
+@pytest.mark.parametrize("formula, param, scale, max_iterations", VIEWS)
+def test_counts_match_kernels(formula, param, scale, max_iterations, chunk_pixels, block_steps):
+    engine = NumpyEngine(chunk_pixels=chunk_pixels, block_steps=block_steps)
+    counts = engine.iterations(formula, param, scale, 90, 61, max_iterations)
+    np.testing.assert_array_equal(counts, kernel_counts(formula, param, scale, 90, 61, max_iterations))
+
+
+@pytest.mark.parametrize("formula, param, scale, max_iterations", VIEWS)
+def test_naive_loop_matches_kernels(formula, param, scale, max_iterations):
+    np.testing.assert_array_equal(naive_iterations(formula, param, scale, 40, 30, max_iterations),
+                                  kernel_counts(formula, param, scale, 40, 30, max_iterations))
+
+
+def test_colors_match_kernels():
+    counts = kernel_counts("mandelbrot", -0.5 + 0j, 3.0 / 90, 90, 61, 300)
+    np.testing.assert_array_equal(numpy_engine.colorize_mandelbrot(counts, 300, PALETTE),
+                                  render_backend.colorize_mandelbrot(counts, 300, PALETTE))
+    counts = kernel_counts("julia", -0.8 + 0.156j, 3.0 / 90, 90, 61, 300)
+    np.testing.assert_array_equal(numpy_engine.colorize_julia(counts, 300, PALETTE),
+                                  render_backend.colorize_julia(counts, 300, PALETTE))
+
+
+def test_unknown_formula_is_rejected():
+    with pytest.raises(ValueError):
+        NumpyEngine().iterations("burning_ship", 0j, 0.01, 8, 8, 10)
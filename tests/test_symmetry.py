@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+from render_backend import (mandelbrot_iterations, julia_iterations, view_symmetry, symmetric_rows, mirror_frame,
+                            mirror_julia_frame, colorize_julia)
+
+PALETTE = np.random.default_rng(0).integers(0, 256, (256, 3), dtype=np.uint8)
+
+
+def test_view_symmetry():
+    assert view_symmetry("julia", 0.3 + 0.5j) == "point"
+    assert view_symmetry("mandelbrot", -0.75 + 0j) == "axis"
+    assert view_symmetry("mandelbrot", -0.75 + 1e-12j) is None
+    assert symmetric_rows(9, None) == 9 and symmetric_rows(9, "axis") == 5 and symmetric_rows(10, "point") == 6
+
+
+# Even and odd frame sizes
+@pytest.mark.parametrize("width, height", [(64, 48), (65, 49)])
+def test_mirrored_mandelbrot_matches_full_frame(width, height):
+    mirrored = mandelbrot_iterations(-0.5 + 0j, 3.0 / width, width, height, 150)
+    full = mandelbrot_iterations(-0.5 + 0j, 3.0 / width, width, height, 150, symmetric=False)
+    np.testing.assert_array_equal(mirrored, full)
+
+
+@pytest.mark.parametrize("width, height", [(64, 48), (65, 49)])
+def test_mirrored_julia_matches_full_frame(width, height):
+    c = -0.8 + 0.156j
+    mirrored = julia_iterations(c, 3.0 / width, width, height, 150)
+    full = julia_iterations(c, 3.0 / width, width, height, 150, symmetric=False)
+    np.testing.assert_array_equal(mirrored, full)
+
+
+def test_mirror_julia_frame_fills_rgb_frame():
+    c, width, height = 0.285 + 0.01j, 40, 30
+    full = colorize_julia(julia_iterations(c, 0.1, width, height, 100, symmetric=False), 100, PALETTE)
+    frame = full.copy()
+    frame[symmetric_rows(height, "point"):] = 0
+    np.testing.assert_array_equal(mirror_julia_frame(frame, c, 0.1, 100, PALETTE), full)
+
+
+def test_off_axis_view_is_not_mirrored():
+    frame = np.arange(12).reshape(4, 3)
+    np.testing.assert_array_equal(mirror_frame(frame.copy(), None), frame)
@@ -0,0 +1,370 @@
+import argparse
+import io
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import numpy as np
+from numba import cuda, njit, prange, parallel_chunksize
+from PIL import Image
+from scipy.interpolate import interp1d
+from iteration_cache import IterationCache
+from render_backend import ROW_CHUNK, select_backend, mandelbrot_iterations, colorize_mandelbrot, colorize_julia
+
+# Local port of the tile server (bound to 127.0.0.1 only)
+TILE_PORT = 47120
+
+# Pixels per side of a tile
+TILE_SIZE = 256
+
+# Deepest zoom level: tiles of level z are 2**-z of the plane wide, and float64 runs out of digits around level 40
+MAX_LEVEL = 40
+
+# Square of the plane covered by the single tile of level 0: (left, top, side)
+PLANE_BOUNDS = {"mandelbrot": (-2.5, 2.0, 4.0), "julia": (-2.0, 2.0, 4.0)}
+
+# PNG tiles kept in memory
+MEMORY_TILES = 4096
+
+# Escape counts of rendered tiles kept on disk (compressed, so a palette change only recolors)
+DISK_CACHE_FOLDER = "tile_cache"
+DISK_CACHE_BYTES = 4 * 1024**3
+
+# Threads rendering the neighbors of requested tiles ahead of time
+PREFETCH_WORKERS = 2
+
+# Gradient of the README images
+colors = [(0, 0, 0), (204, 179, 255), (255, 255, 255), (0, 0, 0)]
+
+
+# Gradient creation function
+def make_gradient(colors, interpolation):
+    """
+    Creates a gradient function based on specified colors and interpolation type.
+    Colors should be given in the 0-255 RGB range.
+    """
+    X = [i / (len(colors) - 1) for i in range(len(colors))]
+    Y = [[color[i] for color in colors] for i in range(3)]
+    channels = [interp1d(X, y, kind=interpolation) for y in Y]
+    return lambda x: [int(np.clip(channel(x), 0, 255)) for channel in channels]
+
+
+# CPU kernel for the Julia escape counts of a window centered anywhere in the plane, one row per parallel iteration
+@njit(parallel=True, cache=True)
+def julia_window_kernel_cpu(c_real, c_imag, center_real, center_imag, scale, width, height, max_iterations, counts):
+    """
+    julia_kernel_cpu with the starting point z offset by the window center, the way the Mandelbrot kernels offset c.
+    """
+    for y in prange(height):
+        for x in range(width):
+            z_real = center_real + scale * (x - width / 2)
+            z_imag = center_imag + scale * (height / 2 - y)
+            iteration = 0
+            while z_real * z_real + z_imag * z_imag <= 4.0 and iteration < max_iterations:
+                z_real_new = z_real * z_real - z_imag * z_imag + c_real
+                z_imag = 2.0 * z_real * z_imag + c_imag
+                z_real = z_real_new
+                iteration += 1
+            counts[y, x] = iteration
+
+
+# GPU kernel for the Julia escape counts of a window centered anywhere in the plane
+@cuda.jit
+def julia_window_kernel(c_real, c_imag, center_real, center_imag, scale, width, height, max_iterations, counts):
+    """
+    Same per-pixel work as julia_window_kernel_cpu.
+    """
+    x, y = cuda.grid(2)
+    if x < width and y < height:
+        z_real = center_real + scale * (x - width / 2)
+        z_imag = center_imag + scale * (height / 2 - y)
+        iteration = 0
+        while z_real * z_real + z_imag * z_imag <= 4.0 and iteration < max_iterations:
+            z_real_new = z_real * z_real - z_imag * z_imag + c_real
+            z_imag = 2.0 * z_real * z_imag + c_imag
+            z_real = z_real_new
+            iteration += 1
+        counts[y, x] = iteration
+
+
+def julia_window_iterations(c: complex, center: complex, scale: float, width: int, height: int, max_iterations: int,
+                            backend: str = "cpu"):
+    """
+    Returns the int32 (height, width) escape counts of a Julia window around 'center'.
+    """
+    counts = np.empty((height, width), dtype=np.int32)
+    if backend == "cuda":
+        blockdim = (16, 16)
+        griddim = (width // blockdim[0] + 1, height // blockdim[1] + 1)
+        julia_window_kernel[griddim, blockdim](c.real, c.imag, center.real, center.imag, scale, width, height, max_iterations, counts)
+    else:
+        with parallel_chunksize(ROW_CHUNK):
+            julia_window_kernel_cpu(c.real, c.imag, center.real, center.imag, scale, width, height, max_iterations, counts)
+    return counts
+
+
+# Tile address -> view of the plane
+def tile_view(formula: str, level: int, x: int, y: int):
+    """
+    Returns the center and pixel scale of tile (x, y) of a zoom level, x to the right and y downwards from the top left.
+    Tile edges fall exactly between the pixels of neighboring tiles, so the tiles of a level join without seams.
+    """
+    left, top, side = PLANE_BOUNDS[formula]
+    tile_side = side / 2**level
+    center = complex(left + (x + 0.5) * tile_side, top - (y + 0.5) * tile_side)
+    return center, tile_side / TILE_SIZE
+
+
+def tile_key(formula: str, c: complex, level: int, x: int, y: int, max_iterations: int):
+    """
+    Builds the text key of a tile; c is ignored (None) for the Mandelbrot plane.
+    """
+    c = "" if c is None else f"{c.real!r},{c.imag!r}"
+    return f"tile|{formula}|{c}|{level}|{x}|{y}|{max_iterations}"
+
+
+class TilePyramid:
+    """
+    Quadtree of TILE_SIZE x TILE_SIZE tiles of the Mandelbrot plane and of Julia planes, rendered with the existing kernels.
+    Tiles are kept as PNG bytes in an in-memory LRU of MEMORY_TILES tiles, and their escape counts in an on-disk
+    IterationCache, so a restarted server or a new palette only recolors. Concurrent requests for a tile that is being
+    rendered wait for the same render instead of starting another one. After every requested tile its neighbors are
+    queued on a pool of PREFETCH_WORKERS threads, so panning over an explored region only hits the cache.
+    Kernels run one at a time (each uses every core); prefetches give way to tiles a client is waiting for.
+    """
+
+    def __init__(self, palette, backend: str = "cpu", cache_folder: str = DISK_CACHE_FOLDER, memory_tiles: int = MEMORY_TILES,
+                 prefetch_workers: int = PREFETCH_WORKERS):
+        self.palette = palette
+        self.backend = backend
+        self.disk_cache = IterationCache(cache_folder, max_bytes=DISK_CACHE_BYTES)
+        self.memory = OrderedDict()
+        self.memory_tiles = memory_tiles
+        self.in_flight = {}
+        self.lock = threading.Lock()
+        self.render_lock = threading.Condition()
+        self.waiting = 0
+        self.prefetcher = ThreadPoolExecutor(max_workers=prefetch_workers, thread_name_prefix="prefetch")
+        self.stats = dict(requests=0, memory_hits=0, disk_hits=0, renders=0, joined=0, prefetched=0, render_seconds=0.0)
+
+    # Cache lookup, de-duplicated render
+    def tile(self, formula: str, c: complex, level: int, x: int, y: int, max_iterations: int, prefetch: bool = False):
+        """
+        Returns the PNG bytes of a tile. A prefetch returns None when the tile is already cached or being rendered.
+        """
+        key = tile_key(formula, c, level, x, y, max_iterations)
+        with self.lock:
+            if not prefetch:
+                self.stats["requests"] += 1
+            data = self.memory.get(key)
+            if data is not None:
+                self.memory.move_to_end(key)
+                if not prefetch:
+                    self.stats["memory_hits"] += 1
+                return None if prefetch else data
+            future = self.in_flight.get(key)
+            if future is not None:
+                if prefetch:
+                    return None
+                self.stats["joined"] += 1
+                owner = False
+            else:
+                future = Future()
+                self.in_flight[key] = future
+                owner = True
+        if not owner:
+            return future.result()
+        try:
+            data = self.load_or_render(key, formula, c, level, x, y, max_iterations, prefetch)
+            future.set_result(data)
+        except Exception as error:
+            future.set_exception(error)
+            raise
+        finally:
+            with self.lock:
+                del self.in_flight[key]
+        with self.lock:
+            self.memory[key] = data
+            while len(self.memory) > self.memory_tiles:
+                self.memory.popitem(last=False)
+        return data
+
+    def load_or_render(self, key: str, formula: str, c: complex, level: int, x: int, y: int, max_iterations: int, prefetch: bool):
+        """
+        Returns the PNG bytes of a tile from its cached escape counts, rendering them first when they are not on disk.
+        """
+        counts = self.disk_cache.get(key)
+        if counts is not None:
+            with self.lock:
+                self.stats["prefetched" if prefetch else "disk_hits"] += 1
+        else:
+            counts = self.render_counts(formula, c, level, x, y, max_iterations, prefetch)
+            self.disk_cache.put(key, counts)
+        colorize = colorize_mandelbrot if formula == "mandelbrot" else colorize_julia
+        buffer = io.BytesIO()
+        Image.fromarray(colorize(counts, max_iterations, self.palette)).save(buffer, format="PNG", compress_level=1)
+        return buffer.getvalue()
+
+    def render_counts(self, formula: str, c: complex, level: int, x: int, y: int, max_iterations: int, prefetch: bool):
+        """
+        Runs the kernel for a tile; a prefetch waits while a requested tile is waiting for the kernels.
+        """
+        center, scale = tile_view(formula, level, x, y)
+        if not prefetch:
+            with self.lock:
+                self.waiting += 1
+        try:
+            with self.render_lock:
+                # Tiles a client is waiting for go first
+                while prefetch and self.waiting:
+                    self.render_lock.wait(0.005)
+                start = time.perf_counter()
+                if formula == "mandelbrot":
+                    counts = mandelbrot_iterations(center, scale, TILE_SIZE, TILE_SIZE, max_iterations, backend=self.backend)
+                else:
+                    counts = julia_window_iterations(c, center, scale, TILE_SIZE, TILE_SIZE, max_iterations, backend=self.backend)
+                seconds = time.perf_counter() - start
+        finally:
+            if not prefetch:
+                with self.lock:
+                    self.waiting -= 1
+        with self.lock:
+            self.stats["prefetched" if prefetch else "renders"] += 1
+            self.stats["render_seconds"] += seconds
+        return counts
+
+    # Neighbors ahead of time
+    def prefetch_neighbors(self, formula: str, c: complex, level: int, x: int, y: int, max_iterations: int):
+        """
+        Queues the eight neighbors of a tile on the same level and its parent on the prefetch pool.
+        """
+        neighbors = [(level, x + dx, y + dy) for dy in (-1, 0, 1) for dx in (-1, 0, 1) if dx or dy]
+        if level > 0:
+            neighbors.append((level - 1, x // 2, y // 2))
+        for neighbor_level, neighbor_x, neighbor_y in neighbors:
+            if 0 <= neighbor_x < 2**neighbor_level and 0 <= neighbor_y < 2**neighbor_level and neighbor_level <= MAX_LEVEL:
+                self.prefetcher.submit(self.tile, formula, c, neighbor_level, neighbor_x, neighbor_y, max_iterations, True)
+
+    def summary(self):
+        """
+        Returns the counters and the memory hit rate of the requests.
+        """
+        with self.lock:
+            stats = dict(self.stats, memory_tiles=len(self.memory))
+        stats["render_seconds"] = round(stats["render_seconds"], 3)
+        stats["hit_rate"] = round((stats["memory_hits"] + stats["disk_hits"] + stats["joined"]) / max(stats["requests"], 1), 3)
+        return stats
+
+
+# Minimal slippy-map page: drag to pan, wheel to zoom; formula, c and max_iterations come from the page's query string
+VIEWER_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Fractal tiles</title>
+<style>html, body, #map { margin: 0; width: 100%; height: 100%; overflow: hidden; background: #000; cursor: grab; }
+#map img { position: absolute; width: 256px; height: 256px; user-select: none; -webkit-user-drag: none; }
+#info { position: absolute; left: 8px; top: 8px; color: #fff; font: 13px monospace; background: rgba(0,0,0,.6); padding: 4px; }</style>
+</head><body><div id="map"></div><div id="info"></div><script>
+const query = new URLSearchParams(location.search);
+const formula = query.get("formula") || "mandelbrot", c = query.get("c") || "", iterations = query.get("max_iterations") || "1000";
+const size = 256, map = document.getElementById("map"), info = document.getElementById("info");
+let level = 2, x = 2, y = 2, drag = null;  // x, y: tile coordinates of the view center
+function draw() {
+  const tiles = 2 ** level, width = map.clientWidth, height = map.clientHeight, wanted = new Set();
+  for (let ty = Math.floor(y - height / 2 / size); ty <= y + height / 2 / size; ty++)
+    for (let tx = Math.floor(x - width / 2 / size); tx <= x + width / 2 / size; tx++) {
+      if (tx < 0 || ty < 0 || tx >= tiles || ty >= tiles) continue;
+      const src = `/tiles/${formula}/${level}/${tx}/${ty}.png?max_iterations=${iterations}` + (c ? `&c=${c}` : "");
+      wanted.add(src);
+      let img = map.querySelector(`img[src="${CSS.escape(src)}"]`);
+      if (!img) { img = document.createElement("img"); img.src = src; map.appendChild(img); }
+      img.style.left = `${Math.round(width / 2 + (tx - x) * size)}px`;
+      img.style.top = `${Math.round(height / 2 + (ty - y) * size)}px`;
+    }
+  for (const img of [...map.querySelectorAll("img")]) if (!wanted.has(img.getAttribute("src"))) img.remove();
+  info.textContent = `${formula} ${c} level ${level} tile ${x.toFixed(2)}, ${y.toFixed(2)}`;
+}
+map.onmousedown = e => { drag = [e.clientX, e.clientY]; };
+onmouseup = () => { drag = null; };
+onmousemove = e => { if (!drag) return; x -= (e.clientX - drag[0]) / size; y -= (e.clientY - drag[1]) / size; drag = [e.clientX, e.clientY]; draw(); };
+map.onwheel = e => {
+  e.preventDefault();
+  const step = e.deltaY < 0 ? 1 : -1;
+  if (level + step < 0 || level + step > MAX_LEVEL) return;
+  level += step; x = step > 0 ? x * 2 : x / 2; y = step > 0 ? y * 2 : y / 2; draw();
+};
+onresize = draw; draw();
+</script></body></html>
+""".replace("MAX_LEVEL", str(MAX_LEVEL))
+
+
+class TileRequestHandler(BaseHTTPRequestHandler):
+    """
+    GET /tiles/<formula>/<level>/<x>/<y>.png?c=<real>,<imag>&max_iterations=<n>, /stats and the viewer page at /.
+    """
+    pyramid = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        parts = url.path.strip("/").split("/")
+        if url.path == "/":
+            return self.reply(200, "text/html; charset=utf-8", VIEWER_PAGE.encode())
+        if url.path == "/stats":
+            return self.reply(200, "application/json", json.dumps(self.pyramid.summary()).encode())
+        try:
+            if len(parts) != 5 or parts[0] != "tiles" or not parts[4].endswith(".png"):
+                raise ValueError("expected /tiles/<formula>/<level>/<x>/<y>.png")
+            formula, level, x, y = parts[1], int(parts[2]), int(parts[3]), int(parts[4][:-len(".png")])
+            if formula not in PLANE_BOUNDS:
+                raise ValueError(f"unknown formula '{formula}', expected one of {tuple(PLANE_BOUNDS)}")
+            if not (0 <= level <= MAX_LEVEL and 0 <= x < 2**level and 0 <= y < 2**level):
+                raise ValueError(f"no tile ({x}, {y}) on level {level}")
+            max_iterations = int(query.get("max_iterations", ["1000"])[0])
+            if max_iterations < 1:
+                raise ValueError("max_iterations must be at least 1")
+            c = None
+            if formula == "julia":
+                values = query.get("c", ["-0.8,0.156"])[0].split(",")
+                if len(values) != 2:
+                    raise ValueError("expected c=<real>,<imag>")
+                c = complex(float(values[0]), float(values[1]))
+        except (ValueError, TypeError, IndexError) as error:
+            return self.reply(400, "text/plain", f"{error}\n".encode())
+        data = self.pyramid.tile(formula, c, level, x, y, max_iterations)
+        self.reply(200, "image/png", data)
+        self.pyramid.prefetch_neighbors(formula, c, level, x, y, max_iterations)
+
+    def reply(self, status: int, content_type: str, body: bytes):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local tile server for exploring the Mandelbrot and Julia planes.")
+    parser.add_argument("--port", type=int, default=TILE_PORT, help="local TCP port")
+    parser.add_argument("--cache", default=DISK_CACHE_FOLDER, help="folder of the on-disk tile cache")
+    parser.add_argument("--backend", default="auto", help="render backend: auto, cuda or cpu")
+    args = parser.parse_args()
+
+    num_colors = 256
+    gradient = make_gradient(colors, interpolation="cubic")
+    palette_array = np.array([gradient(i / num_colors) for i in range(num_colors)], dtype=np.uint8)
+    TileRequestHandler.pyramid = TilePyramid(palette_array, backend=select_backend(args.backend), cache_folder=args.cache)
+    with ThreadingHTTPServer(("127.0.0.1", args.port), TileRequestHandler) as server:
+        print(f"Serving tiles on http://127.0.0.1:{args.port}/ (Julia planes: /?formula=julia&c=-0.8,0.156)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print(f"Tile statistics: {TileRequestHandler.pyramid.summary()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+import json
+import os
+import struct
+import time
+import zlib
+import numpy as np
+from numba import cuda, njit, prange, parallel_chunksize
+from render_backend import ROW_CHUNK, colorize_mandelbrot, colorize_julia, megapixels_per_second
+
+# Memory for one strip (escape counts and colors) when no strip height is given
+STRIP_BYTES = 256 * 1024**2
+
+# Uncompressed bytes fed to zlib at a time while writing the PNG
+PNG_BLOCK_BYTES = 64 * 1024**2
+
+
+# CPU kernel for the Mandelbrot escape counts of a strip of rows, one row per parallel iteration
+@njit(parallel=True, cache=True)
+def mandelbrot_strip_kernel_cpu(center_real, center_imag, scale, width, height, first_row, max_iterations, counts):
+    """
+    Row r of counts is row first_row + r of the full width x height frame, with the arithmetic of mandelbrot_kernel_cpu,
+    so the strips of a frame are identical to the frame rendered in one piece.
+    """
+    for row in prange(counts.shape[0]):
+        y = first_row + row
+        for x in range(width):
+            c_real = center_real + scale * (x - width / 2)
+            c_imag = center_imag + scale * (height / 2 - y)
+            z_real = 0.0
+            z_imag = 0.0
+            iteration = 0
+            while z_real * z_real + z_imag * z_imag <= 4.0 and iteration < max_iterations:
+                z_real_new = z_real * z_real - z_imag * z_imag + c_real
+                z_imag = 2.0 * z_real * z_imag + c_imag
+                z_real = z_real_new
+                iteration += 1
+            counts[row, x] = iteration
+
+
+# CPU kernel for the Julia escape counts of a strip of rows, one row per parallel iteration
+@njit(parallel=True, cache=True)
+def julia_strip_kernel_cpu(c_real, c_imag, scale, width, height, first_row, max_iterations, counts):
+    """
+    Row r of counts is row first_row + r of the full width x height frame, with the arithmetic of julia_kernel_cpu.
+    """
+    for row in prange(counts.shape[0]):
+        y = first_row + row
+        for x in range(width):
+            z_real = scale * (x - width / 2)
+            z_imag = scale * (height / 2 - y)
+            iteration = 0
+            while z_real * z_real + z_imag * z_imag <= 4.0 and iteration < max_iterations:
+                z_real_new = z_real * z_real - z_imag * z_imag + c_real
+                z_imag = 2.0 * z_real * z_imag + c_imag
+                z_real = z_real_new
+                iteration += 1
+            counts[row, x] = iteration
+
+
+# GPU kernel for the Mandelbrot escape counts of a strip of rows
+@cuda.jit
+def mandelbrot_strip_kernel(center_real, center_imag, scale, width, height, first_row, max_iterations, counts):
+    """
+    Same per-pixel work as mandelbrot_strip_kernel_cpu.
+    """
+    x, row = cuda.grid(2)
+    if x < width and row < counts.shape[0]:
+        y = first_row + row
+        c_real = center_real + scale * (x - width / 2)
+        c_imag = center_imag + scale * (height / 2 - y)
+        z_real = 0.0
+        z_imag = 0.0
+        iteration = 0
+        while z_real * z_real + z_imag * z_imag <= 4.0 and iteration < max_iterations:
+            z_real_new = z_real * z_real - z_imag * z_imag + c_real
+            z_imag = 2.0 * z_real * z_imag + c_imag
+            z_real = z_real_new
+            iteration += 1
+        counts[row, x] = iteration
+
+
+# GPU kernel for the Julia escape counts of a strip of rows
+@cuda.jit
+def julia_strip_kernel(c_real, c_imag, scale, width, height, first_row, max_iterations, counts):
+    """
+    Same per-pixel work as julia_strip_kernel_cpu.
+    """
+    x, row = cuda.grid(2)
+    if x < width and row < counts.shape[0]:
+        y = first_row + row
+        z_real = scale * (x - width / 2)
+        z_imag = scale * (height / 2 - y)
+        iteration = 0
+        while z_real * z_real + z_imag * z_imag <= 4.0 and iteration < max_iterations:
+            z_real_new = z_real * z_real - z_imag * z_imag + c_real
+            z_imag = 2.0 * z_real * z_imag + c_imag
+            z_real = z_real_new
+            iteration += 1
+        counts[row, x] = iteration
+
+
+# PNG written row block by row block, so the image never has to be in memory as a whole
+def write_png(filename: str, image, compress_level: int = 6):
+    """
+    Writes a (height, width, 3) uint8 array (typically a memory map) as an RGB PNG, reading about
+    PNG_BLOCK_BYTES of rows at a time. The file is written atomically (temporary file, then rename).
+    """
+    height, width = image.shape[0], image.shape[1]
+    rows_per_block = max(1, PNG_BLOCK_BYTES // (3 * width + 1))
+
+    def chunk(file, kind: bytes, data: bytes):
+        file.write(struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data)))
+
+    temp_filename = filename + ".tmp"
+    with open(temp_filename, "wb") as file:
+        file.write(b"\x89PNG\r\n\x1a\n")
+        chunk(file, b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        compressor = zlib.compressobj(compress_level)
+        for first_row in range(0, height, rows_per_block):
+            block = np.asarray(image[first_row:first_row + rows_per_block]).reshape(-1, 3 * width)
+            # Every scanline starts with its filter type (0 = none)
+            scanlines = np.zeros((block.shape[0], 3 * width + 1), dtype=np.uint8)
+            scanlines[:, 1:] = block
+            data = compressor.compress(scanlines.tobytes())
+            if data:
+                chunk(file, b"IDAT", data)
+        chunk(file, b"IDAT", compressor.flush())
+        chunk(file, b"IEND", b"")
+    os.replace(temp_filename, filename)
+
+
+# Out-of-core still renderer for prints far beyond the size of the RAM
+def render_still(formula: str, c: complex, scale: float, width: int, height: int, max_iterations: int, palette,
+                 filename: str, backend: str = "cpu", strip_rows: int = None, keep_raw: bool = False):
+    """
+    Renders a Mandelbrot ('c' is the view center) or Julia still of any size in strips of strip_rows rows
+    (sized to STRIP_BYTES by default) into a memory-mapped RGB file next to 'filename', then writes the PNG.
+    Finished strips are recorded in a checkpoint file, so an interrupted render resumes with the first missing strip;
+    a checkpoint for other parameters starts over. The raw file and the checkpoint are deleted at the end
+    unless keep_raw is set. Returns the render throughput in Mpixel/s of the strips rendered in this run.
+    """
+    if formula not in ("mandelbrot", "julia"):
+        raise ValueError(f"Unknown formula '{formula}', expected 'mandelbrot' or 'julia'")
+    strip_rows = strip_rows or max(1, min(height, STRIP_BYTES // (7 * width)))
+    raw_filename = filename + ".rgb.npy"
+    checkpoint_filename = filename + ".strips.json"
+    scene = {"formula": formula, "c": [c.real, c.imag], "scale": scale, "width": width, "height": height,
+             "max_iterations": max_iterations, "strip_rows": strip_rows,
+             "palette": zlib.crc32(np.ascontiguousarray(palette).tobytes())}
+    finished = []
+    try:
+        with open(checkpoint_filename, "r") as file:
+            checkpoint = json.load(file)
+        if checkpoint["scene"] == scene and os.path.exists(raw_filename):
+            finished = checkpoint["strips"]
+    except (FileNotFoundError, json.JSONDecodeError, KeyError):
+        pass
+    if finished:
+        image = np.load(raw_filename, mmap_mode="r+")
+        print(f"Resuming {filename}: {len(finished)} strips already rendered")
+    else:
+        image = np.lib.format.open_memmap(raw_filename, mode="w+", dtype=np.uint8, shape=(height, width, 3))
+    colorize_strip = colorize_mandelbrot if formula == "mandelbrot" else colorize_julia
+    num_strips = (height + strip_rows - 1) // strip_rows
+    counts = np.empty((strip_rows, width), dtype=np.int32)
+    if backend == "cuda":
+        device_counts = cuda.device_array((strip_rows, width), dtype=np.int32)
+        kernel = mandelbrot_strip_kernel if formula == "mandelbrot" else julia_strip_kernel
+    else:
+        kernel = mandelbrot_strip_kernel_cpu if formula == "mandelbrot" else julia_strip_kernel_cpu
+    start = time.perf_counter()
+    rendered_pixels = 0
+    skipped = set(finished)
+    for strip in range(num_strips):
+        if strip in skipped:
+            continue
+        first_row = strip * strip_rows
+        rows = min(strip_rows, height - first_row)
+        if backend == "cuda":
+            blockdim = (16, 16)
+            griddim = (width // blockdim[0] + 1, rows // blockdim[1] + 1)
+            kernel[griddim, blockdim](c.real, c.imag, scale, width, height, first_row, max_iterations, device_counts[:rows])
+            device_counts[:rows].copy_to_host(counts[:rows])
+        else:
+            with parallel_chunksize(ROW_CHUNK):
+                kernel(c.real, c.imag, scale, width, height, first_row, max_iterations, counts[:rows])
+        colorize_strip(counts[:rows], max_iterations, palette, out=np.asarray(image[first_row:first_row + rows]))
+        # The strip is on disk before the checkpoint says so
+        image.flush()
+        finished.append(strip)
+        temp_filename = checkpoint_filename + ".tmp"
+        with open(temp_filename, "w") as file:
+            json.dump({"scene": scene, "strips": finished}, file)
+        os.replace(temp_filename, checkpoint_filename)
+        rendered_pixels += rows * width
+        print(f"Strip {len(finished)}/{num_strips} of {filename} rendered")
+    rate = megapixels_per_second(rendered_pixels, 1, time.perf_counter() - start)
+    write_png(filename, image)
+    del image
+    if not keep_raw:
+        os.remove(raw_filename)
+        os.remove(checkpoint_filename)
+    return rate